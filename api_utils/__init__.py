@@ -19,6 +19,12 @@ from .routes import (
     chat_completions,
     cancel_request,
     get_queue_status,
+    get_queue_item_status,
+    create_batch,
+    list_batches,
+    get_batch,
+    get_batch_output,
+    cancel_batch,
     websocket_log_endpoint
 )
 
@@ -59,6 +65,12 @@ __all__ = [
     'chat_completions',
     'cancel_request',
     'get_queue_status',
+    'get_queue_item_status',
+    'create_batch',
+    'list_batches',
+    'get_batch',
+    'get_batch_output',
+    'cancel_batch',
     'websocket_log_endpoint',
     # Yardımcı fonksiyonlar
     'generate_sse_chunk',
@@ -0,0 +1,124 @@
+"""
+Kabul kontrolü modülü
+İstek başına hizmet süresinin EWMA'sını (akış/akış dışı ve model bazında) tutar,
+yeni bir isteğin kuyruk bekleme süresini tahmin eder ve bütçe aşılıyorsa isteği
+kuyruğa almadan reddeder.
+"""
+
+import math
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config import (
+    ADMISSION_CONTROL_ENABLED,
+    ADMISSION_MAX_QUEUE_WAIT_SECONDS,
+    ADMISSION_EWMA_ALPHA,
+    ADMISSION_DEFAULT_SERVICE_TIME,
+)
+
+ServiceKey = Tuple[bool, str]
+
+
+class ServiceTimeEstimator:
+    """(akış, model) anahtarı başına üstel ağırlıklı hareketli ortalama"""
+
+    def __init__(self, alpha: float = ADMISSION_EWMA_ALPHA, default_seconds: float = ADMISSION_DEFAULT_SERVICE_TIME):
+        self.alpha = min(1.0, max(0.01, alpha))
+        self.default_seconds = default_seconds
+        self._ewma: Dict[ServiceKey, float] = {}
+        self._samples: Dict[ServiceKey, int] = {}
+        self._by_stream: Dict[bool, float] = {}
+
+    def record(self, key: ServiceKey, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        previous = self._ewma.get(key)
+        self._ewma[key] = seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous
+        self._samples[key] = self._samples.get(key, 0) + 1
+        stream_prev = self._by_stream.get(key[0])
+        self._by_stream[key[0]] = seconds if stream_prev is None else self.alpha * seconds + (1 - self.alpha) * stream_prev
+
+    def estimate(self, key: ServiceKey) -> float:
+        """Modelin kendi ölçümü yoksa aynı moddaki ortalamaya, o da yoksa varsayılana düşer"""
+        if key in self._ewma:
+            return self._ewma[key]
+        if key[0] in self._by_stream:
+            return self._by_stream[key[0]]
+        return self.default_seconds
+
+    def snapshot(self) -> list:
+        return [
+            {"stream": stream, "model": model, "ewma_seconds": round(value, 2), "samples": self._samples.get((stream, model), 0)}
+            for (stream, model), value in sorted(self._ewma.items(), key=lambda kv: (kv[0][0], kv[0][1]))
+        ]
+
+
+class AdmissionDecision:
+    def __init__(self, admitted: bool, predicted_wait: float, service_estimate: float, retry_after: int = 0):
+        self.admitted = admitted
+        self.predicted_wait = predicted_wait
+        self.service_estimate = service_estimate
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Tahmini bekleme süresine göre istekleri kabul eder veya reddeder"""
+
+    def __init__(self, enabled: bool = ADMISSION_CONTROL_ENABLED,
+                 max_queue_wait: float = ADMISSION_MAX_QUEUE_WAIT_SECONDS,
+                 estimator: Optional[ServiceTimeEstimator] = None):
+        self.enabled = enabled
+        self.max_queue_wait = max_queue_wait
+        self.estimator = estimator or ServiceTimeEstimator()
+        self._inflight: Dict[str, Tuple[float, float]] = {}
+        self.rejected_count = 0
+
+    @staticmethod
+    def service_key(request_data: Any, fallback_model: Optional[str] = None) -> ServiceKey:
+        stream = bool(getattr(request_data, "stream", False))
+        model = getattr(request_data, "model", None) or fallback_model or "default"
+        return stream, model
+
+    def estimate_request(self, request_data: Any, fallback_model: Optional[str] = None) -> float:
+        return self.estimator.estimate(self.service_key(request_data, fallback_model))
+
+    def predict_wait(self, queued_items: Iterable[Dict[str, Any]], workers: int,
+                     fallback_model: Optional[str] = None) -> float:
+        """Kuyruktaki işlerin ve devam eden işlerin kalan tahmini süresinin worker sayısına bölümü"""
+        now = time.time()
+        pending = sum(
+            self.estimate_request(item.get("request_data"), fallback_model)
+            for item in queued_items
+            if not item.get("cancelled", False)
+        )
+        remaining = sum(max(0.0, estimate - (now - started)) for started, estimate in self._inflight.values())
+        return (pending + remaining) / max(1, workers)
+
+    def check(self, request_data: Any, queued_items: Iterable[Dict[str, Any]], workers: int,
+              fallback_model: Optional[str] = None) -> AdmissionDecision:
+        predicted_wait = self.predict_wait(queued_items, workers, fallback_model)
+        service_estimate = self.estimate_request(request_data, fallback_model)
+        if not self.enabled or predicted_wait <= self.max_queue_wait:
+            return AdmissionDecision(True, predicted_wait, service_estimate)
+        # Yeni iş gelmezse tahmini bekleme süresi saniyede bir saniye azalır
+        retry_after = max(1, int(math.ceil(predicted_wait - self.max_queue_wait)))
+        self.rejected_count += 1
+        return AdmissionDecision(False, predicted_wait, service_estimate, retry_after)
+
+    def begin(self, req_id: str, request_data: Any, fallback_model: Optional[str] = None) -> None:
+        self._inflight[req_id] = (time.time(), self.estimate_request(request_data, fallback_model))
+
+    def finish(self, req_id: str, request_data: Any, record: bool, fallback_model: Optional[str] = None) -> None:
+        started = self._inflight.pop(req_id, None)
+        if started and record:
+            self.estimator.record(self.service_key(request_data, fallback_model), time.time() - started[0])
+
+    def snapshot(self, queued_items: Iterable[Dict[str, Any]], workers: int) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_queue_wait_seconds": self.max_queue_wait,
+            "predicted_wait_seconds": round(self.predict_wait(queued_items, workers), 2),
+            "in_flight": len(self._inflight),
+            "rejected_count": self.rejected_count,
+            "service_times": self.estimator.snapshot(),
+        }
@@ -6,9 +6,9 @@ import asyncio
 import multiprocessing
 import os
 import sys
-import queue  # <-- FIX: Added missing import for queue.Empty
+from urllib.parse import urlparse
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
@@ -32,12 +32,24 @@ from browser_utils import (
     _close_page_logic,
     load_excluded_models,
     _handle_initial_model_state_and_storage,
-    enable_temporary_chat_mode
+    enable_temporary_chat_mode,
+    OverlaySuppressor
 )
 
 import stream
-from asyncio import Queue, Lock
+from stream.ipc import READY_SIGNAL, create_channel_pair, StreamChannel
+from asyncio import Lock
 from . import auth_utils
+from .page_pool import PagePool
+from .fair_queue import FairRequestQueue
+from .admission import AdmissionController
+from .prefetch import RequestPrefetcher
+from .coalesce import RequestCoalescer
+from .response_cache import ResponseCache
+from .batches import BatchManager
+from .model_affinity import ModelAffinity
+from .deadlines import DeadlineStats
+from .http_backend import HttpChatBackend
 
 # Global durum değişkenleri (bunlar server.py'de referans alınacak)
 playwright_manager: Optional[AsyncPlaywright] = None
@@ -58,7 +70,17 @@ model_switching_lock = None
 excluded_model_ids = set()
 
 request_queue = None
-processing_lock = None
+page_pool = None
+admission_controller = None
+request_prefetcher = None
+request_coalescer = None
+response_cache = None
+batch_manager = None
+model_affinity = None
+deadline_stats = None
+http_backend = None
+overlay_suppressor = None
+extra_browsers = []
 worker_task = None
 
 page_params_cache = {}
@@ -67,6 +89,7 @@ params_cache_lock = None
 log_ws_manager = None
 
 STREAM_QUEUE = None
+STREAM_CHANNEL = None
 STREAM_PROCESS = None
 
 # --- Lifespan Context Manager ---
@@ -84,8 +107,17 @@ def _setup_logging():
 
 def _initialize_globals():
     import server
-    server.request_queue = Queue()
-    server.processing_lock = Lock()
+    server.request_queue = FairRequestQueue()
+    server.admission_controller = AdmissionController()
+    server.request_prefetcher = RequestPrefetcher()
+    server.request_coalescer = RequestCoalescer()
+    server.response_cache = ResponseCache()
+    server.model_affinity = ModelAffinity()
+    server.deadline_stats = DeadlineStats()
+    server.http_backend = HttpChatBackend()
+    server.overlay_suppressor = OverlaySuppressor()
+    server.batch_manager = BatchManager()
+    server.batch_manager.load()
     server.model_switching_lock = Lock()
     server.params_cache_lock = Lock()
     auth_utils.initialize_keys()
@@ -114,24 +146,69 @@ async def _start_stream_proxy():
         port = int(STREAM_PORT or 3120)
         STREAM_PROXY_SERVER_ENV = os.environ.get('UNIFIED_PROXY_CONFIG') or os.environ.get('HTTPS_PROXY') or os.environ.get('HTTP_PROXY')
         server.logger.info(f"Starting STREAM proxy on port {port} with upstream proxy: {STREAM_PROXY_SERVER_ENV}")
-        server.STREAM_QUEUE = multiprocessing.Queue()
-        server.STREAM_PROCESS = multiprocessing.Process(target=stream.start, args=(server.STREAM_QUEUE, port, STREAM_PROXY_SERVER_ENV))
+        # Length-prefixed frames over a socket pair; the event loop wakes the reader as soon as a frame arrives
+        server_sock, proxy_sock = create_channel_pair()
+        server.STREAM_PROCESS = multiprocessing.Process(target=stream.start, args=(proxy_sock, port, STREAM_PROXY_SERVER_ENV))
         server.STREAM_PROCESS.start()
+        proxy_sock.close()
+        server.STREAM_CHANNEL = StreamChannel(server_sock)
+        await server.STREAM_CHANNEL.start()
+        server.STREAM_QUEUE = server.STREAM_CHANNEL.queue
+        # Etiketsiz kareler yalnızca tek bir sayfa üretim yaparken açık akışa bağlanır
+        server.STREAM_CHANNEL.adopt_unkeyed = lambda: server.page_pool is None or server.page_pool.busy_count <= 1
         server.logger.info("STREAM proxy process started. Waiting for 'READY' signal...")
 
         # --- FIX: Wait for the proxy to be ready ---
         try:
-            # Use asyncio.to_thread to wait for the blocking queue.get()
             # Set a timeout to avoid waiting forever
-            ready_signal = await asyncio.to_thread(server.STREAM_QUEUE.get, timeout=15)
-            if ready_signal == "READY":
+            ready_signal = await asyncio.wait_for(server.STREAM_QUEUE.get(), timeout=15)
+            if ready_signal == READY_SIGNAL:
                 server.logger.info("✅ Received 'READY' signal from STREAM proxy.")
             else:
                 server.logger.warning(f"Received unexpected signal from proxy: {ready_signal}")
-        except queue.Empty:
+        except asyncio.TimeoutError:
             server.logger.error("❌ Timed out waiting for STREAM proxy to become ready. Startup will likely fail.")
             raise RuntimeError("STREAM proxy failed to start in time.")
 
+def _get_ws_endpoints() -> List[str]:
+    """Returns CAMOUFOX_WS_ENDPOINT followed by the extra CAMOUFOX_WS_ENDPOINTS entries, without duplicates."""
+    endpoints = []
+    primary = os.environ.get('CAMOUFOX_WS_ENDPOINT', '').strip()
+    if primary:
+        endpoints.append(primary)
+    for endpoint in os.environ.get('CAMOUFOX_WS_ENDPOINTS', '').split(','):
+        endpoint = endpoint.strip()
+        if endpoint and endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+def _is_loopback_endpoint(ws_endpoint: str) -> bool:
+    host = (urlparse(ws_endpoint).hostname or '').lower()
+    return host in ('localhost', '::1') or host.startswith('127.')
+
+async def _connect_additional_browsers(ws_endpoints: List[str]) -> List[Tuple[str, AsyncBrowser]]:
+    """Connects to the extra Camoufox endpoints; unreachable ones are skipped."""
+    import server
+    connected = []
+    if not ws_endpoints:
+        return connected
+    for index, ws_endpoint in enumerate(ws_endpoints, start=1):
+        # Frames are correlated per request, so any page can use the stream proxy; a browser on another
+        # host cannot reach the proxy, which only listens on this machine's loopback address.
+        if os.environ.get('STREAM_PORT') != '0' and not _is_loopback_endpoint(ws_endpoint):
+            server.logger.warning(
+                f"Additional browser #{index} ({ws_endpoint}) ignored: it runs on another host and cannot reach the "
+                "auxiliary stream proxy on 127.0.0.1. Set STREAM_PORT=0 to use remote browsers."
+            )
+            continue
+        try:
+            browser = await server.playwright_manager.firefox.connect(ws_endpoint, timeout=30000)
+            connected.append((ws_endpoint, browser))
+            server.logger.info(f"Connected to additional browser #{index}: {browser.version}")
+        except Exception as connect_err:
+            server.logger.error(f"Could not connect to additional browser #{index}: {connect_err}")
+    return connected
+
 async def _initialize_browser_and_page():
     import server
     from playwright.async_api import async_playwright
@@ -141,7 +218,8 @@ async def _initialize_browser_and_page():
     server.is_playwright_ready = True
     server.logger.info("Playwright started.")
 
-    ws_endpoint = os.environ.get('CAMOUFOX_WS_ENDPOINT')
+    ws_endpoints = _get_ws_endpoints()
+    ws_endpoint = ws_endpoints[0] if ws_endpoints else None
     launch_mode = os.environ.get('LAUNCH_MODE', 'unknown')
 
     if not ws_endpoint and launch_mode != "direct_debug_no_browser":
@@ -160,6 +238,8 @@ async def _initialize_browser_and_page():
             server.logger.info("Page initialized successfully.")
         else:
             server.logger.error("Page initialization failed.")
+
+        server.extra_browsers = await _connect_additional_browsers(ws_endpoints[1:])
     
     if not server.model_list_fetch_event.is_set():
         server.model_list_fetch_event.set()
@@ -173,6 +253,15 @@ async def _shutdown_resources():
         server.STREAM_PROCESS.terminate()
         logger.info("STREAM proxy terminated.")
 
+    if server.STREAM_CHANNEL:
+        await server.STREAM_CHANNEL.close()
+
+    if server.batch_manager:
+        await server.batch_manager.stop()
+
+    if server.page_pool:
+        await server.page_pool.stop()
+
     if server.worker_task and not server.worker_task.done():
         server.worker_task.cancel()
         try:
@@ -187,16 +276,30 @@ async def _shutdown_resources():
     if server.browser_instance and server.browser_instance.is_connected():
         await server.browser_instance.close()
         logger.info("Browser connection closed.")
+
+    for _, extra_browser in server.extra_browsers:
+        try:
+            if extra_browser.is_connected():
+                await extra_browser.close()
+        except Exception as close_err:
+            logger.warning(f"Error while closing additional browser connection: {close_err}")
+    if server.extra_browsers:
+        logger.info(f"{len(server.extra_browsers)} additional browser connection(s) closed.")
     
     if server.playwright_manager:
         await server.playwright_manager.stop()
         logger.info("Playwright stopped.")
 
+    if server.response_cache:
+        server.response_cache.close()
+
+    if server.http_backend:
+        await server.http_backend.close()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """FastAPI application life cycle management"""
     import server
-    from server import queue_worker
 
     original_streams = sys.stdout, sys.stderr
     initial_stdout, initial_stderr = _setup_logging()
@@ -215,8 +318,15 @@ async def lifespan(app: FastAPI):
         
         launch_mode = os.environ.get('LAUNCH_MODE', 'unknown')
         if server.is_page_ready or launch_mode == "direct_debug_no_browser":
-            server.worker_task = asyncio.create_task(queue_worker())
-            logger.info("Request processing worker started.")
+            server.page_pool = PagePool()
+            ws_endpoints = _get_ws_endpoints()
+            server.worker_task = await server.page_pool.start(
+                server.page_instance, server.browser_instance, server.current_ai_studio_model_id,
+                primary_ws_endpoint=ws_endpoints[0] if ws_endpoints else None,
+                extra_browsers=server.extra_browsers
+            )
+            logger.info("Request processing worker pool started.")
+            server.batch_manager.start()
         else:
             raise RuntimeError("Failed to initialize browser/page, worker not started.")
 
@@ -261,17 +371,8 @@ class APIKeyAuthMiddleware(BaseHTTPMiddleware):
             if request.url.path == excluded_path or request.url.path.startswith(excluded_path + "/"):
                 return await call_next(request)
 
-        # OpenAI standartlarıyla uyum için birden fazla kimlik doğrulama başlığını destekle
-        api_key = None
-
-        # 1. Öncelikle Authorization: Bearer <token> başlığını kontrol et
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            api_key = auth_header[7:]  # "Bearer " önekini çıkar
-
-        # 2. Geriye dönük uyumluluk için X-API-Key başlığını dene
-        if not api_key:
-            api_key = request.headers.get("X-API-Key")
+        # OpenAI standartlarıyla uyum için Authorization: Bearer ve X-API-Key başlıklarını destekle
+        api_key = auth_utils.extract_api_key(request.headers)
 
         if not api_key or not auth_utils.verify_api_key(api_key):
             return JSONResponse(
@@ -303,7 +404,8 @@ def create_app() -> FastAPI:
     from .routes import (
         read_index, get_css, get_js, get_api_info,
         health_check, list_models, chat_completions,
-        cancel_request, get_queue_status, websocket_log_endpoint,
+        cancel_request, get_queue_status, get_queue_item_status, websocket_log_endpoint,
+        create_batch, list_batches, get_batch, get_batch_output, cancel_batch,
         get_api_keys, add_api_key, test_api_key, delete_api_key
     )
     from fastapi.responses import FileResponse
@@ -317,6 +419,12 @@ def create_app() -> FastAPI:
     app.post("/v1/chat/completions")(chat_completions)
     app.post("/v1/cancel/{req_id}")(cancel_request)
     app.get("/v1/queue")(get_queue_status)
+    app.get("/v1/queue/{req_id}")(get_queue_item_status)
+    app.post("/v1/batches")(create_batch)
+    app.get("/v1/batches")(list_batches)
+    app.get("/v1/batches/{batch_id}")(get_batch)
+    app.get("/v1/batches/{batch_id}/output")(get_batch_output)
+    app.post("/v1/batches/{batch_id}/cancel")(cancel_batch)
     app.websocket("/ws/logs")(websocket_log_endpoint)
 
     # API anahtarı yönetim uç noktaları
@@ -1,19 +1,45 @@
 import os
-from typing import Set
+from typing import Dict, Optional, Set, Tuple
 
 API_KEYS: Set[str] = set()
+API_KEY_WEIGHTS: Dict[str, float] = {}
+DEFAULT_KEY_WEIGHT = 1.0
 KEY_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "auth_profiles", "key.txt")
 
+def parse_key_line(line: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    Parses one key.txt line of the form `<key> [name=value ...]`.
+    Returns the key (or None for blank/comment lines) and its metadata.
+    """
+    parts = line.strip().split()
+    if not parts or parts[0].startswith("#"):
+        return None, {}
+    metadata = {}
+    for part in parts[1:]:
+        name, sep, value = part.partition("=")
+        if sep:
+            metadata[name.lower()] = value
+    return parts[0], metadata
+
+def _parse_weight(value: Optional[str]) -> float:
+    try:
+        weight = float(value) if value is not None else DEFAULT_KEY_WEIGHT
+    except ValueError:
+        return DEFAULT_KEY_WEIGHT
+    return weight if weight > 0 else DEFAULT_KEY_WEIGHT
+
 def load_api_keys():
-    """Loads API keys from the key file into the API_KEYS set."""
+    """Loads API keys and their scheduling weights from the key file."""
     global API_KEYS
     API_KEYS.clear()
+    API_KEY_WEIGHTS.clear()
     if os.path.exists(KEY_FILE_PATH):
         with open(KEY_FILE_PATH, "r") as f:
             for line in f:
-                key = line.strip()
+                key, metadata = parse_key_line(line)
                 if key:
                     API_KEYS.add(key)
+                    API_KEY_WEIGHTS[key] = _parse_weight(metadata.get("weight"))
 
 def initialize_keys():
     """Initializes API keys. Ensures key.txt exists and loads keys."""
@@ -29,4 +55,21 @@ def verify_api_key(api_key_from_header: str) -> bool:
     """
     if not API_KEYS:
         return True
-    return api_key_from_header in API_KEYS
\ No newline at end of file
+    return api_key_from_header in API_KEYS
+
+def get_key_weight(api_key: Optional[str]) -> float:
+    """Returns the fair-queue weight of a key (`weight=` in key.txt, default 1)."""
+    if not api_key:
+        return DEFAULT_KEY_WEIGHT
+    return API_KEY_WEIGHTS.get(api_key, DEFAULT_KEY_WEIGHT)
+
+def extract_api_key(headers) -> Optional[str]:
+    """Reads the API key from `Authorization: Bearer` or, for backward compatibility, `X-API-Key`."""
+    auth_header = headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        return auth_header[7:]
+    return headers.get("X-API-Key")
+
+def mask_key(api_key: str) -> str:
+    """Shortens a key for logs and status output."""
+    return f"{api_key[:4]}...{api_key[-4:]}" if len(api_key) > 8 else "****"
@@ -0,0 +1,403 @@
+"""
+Çevrimdışı toplu iş (batch) modülü
+JSONL biçiminde yüklenen sohbet isteklerini, etkileşimli kuyruk boşken düşük öncelikle
+tek tek çalıştırır ve sonuçları satır satır çıktı JSONL dosyasına yazar. Her toplu işin
+girdi, çıktı ve durum dosyaları diskte tutulur; sunucu yeniden başlatıldığında işlem
+son tamamlanan satırdan devam eder.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from asyncio import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from config import BATCH_STORAGE_DIR, BATCH_IDLE_POLL_INTERVAL, RESPONSE_COMPLETION_TIMEOUT
+from models import ChatCompletionRequest
+from .disconnect import ClientDisconnectWatcher
+from .prefetch import discard_prepared
+
+logger = logging.getLogger("AIStudioProxyServer")
+
+BATCH_CLIENT_PREFIX = "batch:"
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+ACTIVE_STATUSES = ("in_progress", "cancelling")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def parse_batch_line(raw: str, line_no: int) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Bir girdi satırını (custom_id, istek gövdesi) olarak döndürür. OpenAI batch biçimi
+    ({"custom_id", "method", "url", "body"}) ve doğrudan sohbet isteği gövdesi kabul edilir.
+    """
+    try:
+        payload = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"Satır {line_no}: geçersiz JSON ({e})")
+    if not isinstance(payload, dict):
+        raise ValueError(f"Satır {line_no}: JSON nesnesi bekleniyor")
+    if "body" in payload:
+        url = payload.get("url", CHAT_COMPLETIONS_URL)
+        if url != CHAT_COMPLETIONS_URL:
+            raise ValueError(f"Satır {line_no}: desteklenmeyen url '{url}'")
+        body = payload["body"]
+        custom_id = payload.get("custom_id")
+    else:
+        body = payload
+        custom_id = None
+    if not isinstance(body, dict) or not body.get("messages"):
+        raise ValueError(f"Satır {line_no}: 'messages' alanı eksik")
+    return (str(custom_id) if custom_id is not None else None), body
+
+
+class BatchJob:
+    """Tek bir toplu işin durumu ve dosya yolları"""
+
+    def __init__(self, batch_id: str, directory: str):
+        self.id = batch_id
+        self.directory = directory
+        self.status = "in_progress"
+        self.created_at = int(time.time())
+        self.completed_at: Optional[int] = None
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.next_line = 0
+        self.metadata: Dict[str, Any] = {}
+        self.current_req_id: Optional[str] = None
+        self._lines: Optional[List[str]] = None
+
+    @property
+    def input_path(self) -> str:
+        return os.path.join(self.directory, "input.jsonl")
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.directory, "output.jsonl")
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.directory, "state.json")
+
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            with open(self.input_path, "r", encoding="utf-8") as f:
+                self._lines = [line for line in f.read().splitlines() if line.strip()]
+        return self._lines
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "batch",
+            "endpoint": CHAT_COMPLETIONS_URL,
+            "status": self.status,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "request_counts": {"total": self.total, "completed": self.completed, "failed": self.failed},
+            "next_line": self.next_line,
+            "current_req_id": self.current_req_id,
+            "metadata": self.metadata,
+        }
+
+    def save_state(self) -> None:
+        state = self.to_dict()
+        state.pop("current_req_id", None)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    @classmethod
+    def load(cls, directory: str) -> "BatchJob":
+        with open(os.path.join(directory, "state.json"), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        job = cls(state["id"], directory)
+        job.status = state.get("status", "in_progress")
+        job.created_at = state.get("created_at", job.created_at)
+        job.completed_at = state.get("completed_at")
+        job.total = state.get("request_counts", {}).get("total", 0)
+        job.metadata = state.get("metadata") or {}
+        job.recount_output()
+        return job
+
+    def recount_output(self) -> None:
+        """Çıktı dosyası tek doğruluk kaynağıdır: yazılmış her satır tamamlanmış sayılır"""
+        self.completed = self.failed = self.next_line = 0
+        if not os.path.exists(self.output_path):
+            return
+        valid_bytes = 0
+        with open(self.output_path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Yarım kalmış son satır; yeniden çalıştırılacak
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    break
+                valid_bytes += len(raw)
+                self.next_line += 1
+                if record.get("error"):
+                    self.failed += 1
+                else:
+                    self.completed += 1
+        if valid_bytes < os.path.getsize(self.output_path):
+            with open(self.output_path, "rb+") as f:
+                f.truncate(valid_bytes)
+
+    def append_output(self, record: Dict[str, Any]) -> None:
+        with open(self.output_path, "a", encoding="utf-8", newline="\n") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class BatchManager:
+    """Toplu işleri saklar ve etkileşimli kuyruk boşken sırayla çalıştırır"""
+
+    def __init__(self, storage_dir: str = BATCH_STORAGE_DIR, poll_interval: float = BATCH_IDLE_POLL_INTERVAL):
+        self.storage_dir = storage_dir
+        self.poll_interval = poll_interval
+        self.jobs: Dict[str, BatchJob] = {}
+        self._runner_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def load(self) -> None:
+        """Diskteki toplu işleri yükler; yarım kalanlar son tamamlanan satırdan devam eder"""
+        if not os.path.isdir(self.storage_dir):
+            return
+        for name in sorted(os.listdir(self.storage_dir)):
+            directory = os.path.join(self.storage_dir, name)
+            if not os.path.isfile(os.path.join(directory, "state.json")):
+                continue
+            try:
+                job = BatchJob.load(directory)
+            except (OSError, ValueError, KeyError) as load_err:
+                logger.error(f"[Batch] {name} yüklenemedi: {load_err}")
+                continue
+            if job.status == "cancelling":
+                job.status = "cancelled"
+                job.save_state()
+            self.jobs[job.id] = job
+            if job.status == "in_progress":
+                logger.info(f"[Batch] {job.id} satır {job.next_line}/{job.total} üzerinden devam edecek.")
+
+    def create(self, raw: bytes, metadata: Optional[Dict[str, Any]] = None) -> BatchJob:
+        text = raw.decode("utf-8-sig")
+        lines = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            parse_batch_line(line, line_no)
+            lines.append(line.strip())
+        if not lines:
+            raise ValueError("Girdi dosyasında istek satırı yok")
+
+        batch_id = f"batch_{int(time.time())}_{''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=6))}"
+        job = BatchJob(batch_id, os.path.join(self.storage_dir, batch_id))
+        os.makedirs(job.directory, exist_ok=True)
+        with open(job.input_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(lines) + "\n")
+        open(job.output_path, "a").close()
+        job.total = len(lines)
+        job.metadata = metadata or {}
+        job.save_state()
+        self.jobs[job.id] = job
+        self._wake()
+        logger.info(f"[Batch] {job.id} oluşturuldu ({job.total} istek).")
+        return job
+
+    def get(self, batch_id: str) -> Optional[BatchJob]:
+        return self.jobs.get(batch_id)
+
+    def list(self) -> List[BatchJob]:
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, batch_id: str) -> Optional[BatchJob]:
+        """
+        Toplu işi iptal eder. Kuyrukta bekleyen satır kuyruktan çekilir; bir sayfaya veya HTTP arka ucuna
+        dağıtılmış satır durdurulamaz, bitmesi beklenir ve sonucu çıktıya yazılmadan iş "cancelled" olur.
+        """
+        job = self.jobs.get(batch_id)
+        if job is None or job.status in FINAL_STATUSES:
+            return job
+        if job.current_req_id:
+            import server
+            job.status = "cancelling"
+            if server.request_queue is not None:
+                entry = server.request_queue.get_entry(job.current_req_id)
+                if server.request_queue.cancel(job.current_req_id):
+                    discard_prepared(entry)
+        else:
+            job.status = "cancelled"
+            job.completed_at = int(time.time())
+        job.save_state()
+        return job
+
+    # ------------------------------------------------------------------
+    # Çalıştırıcı
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._runner_task is None or self._runner_task.done():
+            self._wakeup = asyncio.Event()
+            self._runner_task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        if self._runner_task and not self._runner_task.done():
+            self._runner_task.cancel()
+            try:
+                await self._runner_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _next_job(self) -> Optional[BatchJob]:
+        pending = [job for job in self.jobs.values() if job.status == "in_progress"]
+        return min(pending, key=lambda job: job.created_at) if pending else None
+
+    @staticmethod
+    def _interactive_idle(request: ChatCompletionRequest) -> bool:
+        """
+        Etkileşimli kuyruk boşsa ve satırı işleyecek kaynak hazırsa toplu iş satırı gönderilebilir.
+        HTTP arka ucunun işlediği satırlar sayfa kullanmadığından boşta sayfa beklemez.
+        """
+        import server
+        if server.is_initializing or server.request_queue is None or server.page_pool is None:
+            return False
+        if not server.request_queue.empty():
+            return False
+        if server.http_backend is not None and server.http_backend.handles(request):
+            return True
+        return server.page_pool.idle_count > 0
+
+    async def _wait_until_idle(self, job: BatchJob, request: ChatCompletionRequest) -> bool:
+        """Satır gönderilebilene kadar bekler; iş bu sırada iptal edilirse False döner"""
+        import server
+        while job.status == "in_progress" and not self._interactive_idle(request):
+            if server.page_pool is not None and server.request_queue is not None:
+                # Kuyruğun boşalması ayrıca bildirilmediğinden bekleme poll_interval ile sınırlanır
+                await server.page_pool.wait_for_change(timeout=self.poll_interval)
+            else:
+                await asyncio.sleep(self.poll_interval)
+        return job.status == "in_progress"
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                job = self._next_job()
+                if job is None:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                await self._run_line(job)
+            except asyncio.CancelledError:
+                break
+            except Exception as run_err:
+                logger.error(f"[Batch] Çalıştırıcı hatası: {run_err}", exc_info=True)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run_line(self, job: BatchJob) -> None:
+        line_no = job.next_line
+        if line_no >= job.total:
+            self._finish(job)
+            return
+        try:
+            raw_line = job.lines()[line_no]
+        except (OSError, IndexError) as read_err:
+            logger.error(f"[Batch] {job.id} girdi dosyası okunamadı: {read_err}")
+            job.status = "failed"
+            job.completed_at = int(time.time())
+            job.save_state()
+            return
+        req_id = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=7))
+        custom_id = None
+        status_code, body, error = 200, None, None
+        try:
+            custom_id, request_body = parse_batch_line(raw_line, line_no + 1)
+            request = ChatCompletionRequest(**{**request_body, "stream": False})
+        except (ValueError, ValidationError) as parse_err:
+            status_code, error = 400, {"code": "invalid_request", "message": str(parse_err)}
+        else:
+            if not await self._wait_until_idle(job, request):
+                return
+            job.current_req_id = req_id
+            logger.info(f"[{req_id}] (Batch) {job.id} satır {line_no + 1}/{job.total} kuyruğa alınıyor.")
+            status_code, body, error = await self._execute(job, req_id, request)
+            job.current_req_id = None
+
+        if job.status == "cancelling":
+            job.status = "cancelled"
+            job.completed_at = int(time.time())
+            job.save_state()
+            logger.info(f"[Batch] {job.id} iptal edildi ({job.next_line}/{job.total} satır tamamlandı).")
+            return
+
+        record = {
+            "id": f"batch_req_{req_id}",
+            "custom_id": custom_id,
+            "line": line_no + 1,
+            "response": {"status_code": status_code, "request_id": req_id, "body": body} if body is not None else None,
+            "error": error,
+        }
+        await asyncio.to_thread(job.append_output, record)
+        job.next_line += 1
+        if error:
+            job.failed += 1
+        else:
+            job.completed += 1
+        if job.next_line >= job.total:
+            self._finish(job)
+        else:
+            job.save_state()
+
+    async def _execute(self, job: BatchJob, req_id: str, request: ChatCompletionRequest) -> Tuple[int, Any, Optional[Dict[str, Any]]]:
+        import server
+
+        result_future = Future()
+        deadline = time.time() + request.request_timeout if request.request_timeout and request.request_timeout > 0 else None
+        request_item = {
+            "req_id": req_id, "request_data": request, "http_request": None,
+            "result_future": result_future, "enqueue_time": time.time(), "cancelled": False,
+            "client_key": f"{BATCH_CLIENT_PREFIX}{job.id}", "batch_id": job.id,
+            "disconnect_watcher": ClientDisconnectWatcher(req_id, None).set_deadline(deadline), "deadline": deadline,
+        }
+        await server.request_queue.put(request_item)
+        if server.request_prefetcher:
+            server.request_prefetcher.ensure(request_item)
+        try:
+            response = await asyncio.wait_for(result_future, timeout=RESPONSE_COMPLETION_TIMEOUT / 1000 + 120)
+        except asyncio.TimeoutError:
+            server.request_queue.cancel(req_id)
+            discard_prepared(request_item)
+            return 504, None, {"code": "timeout", "message": f"[{req_id}] İstek işlenirken zaman aşımı oluştu."}
+        except HTTPException as http_err:
+            return http_err.status_code, None, {"code": str(http_err.status_code), "message": str(http_err.detail)}
+        except Exception as exec_err:
+            return 500, None, {"code": "server_error", "message": str(exec_err)}
+        try:
+            return response.status_code, json.loads(response.body), None
+        except (AttributeError, ValueError) as decode_err:
+            return 500, None, {"code": "server_error", "message": f"Yanıt çözümlenemedi: {decode_err}"}
+
+    @staticmethod
+    def _finish(job: BatchJob) -> None:
+        job.status = "completed"
+        job.completed_at = int(time.time())
+        job.save_state()
+        logger.info(f"[Batch] {job.id} tamamlandı (başarılı: {job.completed}, hatalı: {job.failed}).")
+
+    def snapshot(self) -> Dict[str, Any]:
+        active = [job for job in self.jobs.values() if job.status in ACTIVE_STATUSES]
+        return {
+            "active": len(active),
+            "pending_lines": sum(job.total - job.next_line for job in active),
+            "total": len(self.jobs),
+        }
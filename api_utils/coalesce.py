@@ -0,0 +1,284 @@
+"""
+İstek birleştirme (singleflight) modülü
+Kuyrukta bekleyen veya işlenmekte olan bir istekle birebir aynı olan yeni istekler
+tarayıcıda yeniden üretilmez; ilk isteğe ("lider") bağlanıp onun sonucunu alırlar.
+Akış yanıtları tek bir kaynak üreticiden tüm abonelere çoğaltılır (tee).
+
+Paylaşılan kaynak, istemciye özel sarmalayıcılardan (son tarih bildirimi, önbelleğe yazma)
+önce yayınlanır. Takipçiler beklerken liderin bağlantı izleyicisi tutulur; böylece liderin
+istemcisi koptuğunda veya son tarihi dolduğunda takipçilerin akışı yarıda kesilmez. Her takipçinin
+kendi izleyicisi de beklemeye bağlanır; takipçi koptuğunda veya son tarihi dolduğunda hemen ayrılır.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+from config import MODEL_NAME, REQUEST_COALESCING_ENABLED
+from models import ChatCompletionRequest
+
+logger = logging.getLogger("AIStudioProxyServer")
+
+# Çıktıyı etkileyen istek alanları; `stream` yalnızca birleştirme anahtarına eklenir
+OUTPUT_AFFECTING_FIELDS = (
+    "messages", "model", "tools", "temperature", "max_output_tokens", "stop", "top_p", "reasoning_effort",
+)
+
+
+def _normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    normalized = []
+    for message in messages:
+        message = dict(message)
+        content = message.get("content")
+        # Tek bir metin parçasından oluşan içerik düz metinle eşdeğerdir
+        if isinstance(content, list) and all(part.get("type") == "text" for part in content):
+            message["content"] = "".join(part.get("text") or "" for part in content)
+        normalized.append(message)
+    return normalized
+
+
+def request_fingerprint(request: ChatCompletionRequest, include_stream: bool = True,
+                        default_model: Optional[str] = None) -> str:
+    """İsteğin çıktıyı etkileyen alanlarının kanonik JSON'undan SHA-256 özeti üretir"""
+    payload = request.model_dump(include=set(OUTPUT_AFFECTING_FIELDS), exclude_none=True)
+    payload["messages"] = _normalize_messages(payload.get("messages") or [])
+    model = payload.get("model")
+    # Model belirtilmemişse isteği sayfadaki aktif model karşılar
+    payload["model"] = model.split('/')[-1] if model and model != MODEL_NAME else default_model
+    if include_stream:
+        payload["stream"] = bool(request.stream)
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LeaderAbandoned(Exception):
+    """Lider istek sonuç üretmeden bitti (ör. istemci bağlantısı koptu); takipçi kendi başına denemeli"""
+
+
+class StreamBroadcast:
+    """Tek bir SSE kaynak üreticisini baştan itibaren yeniden oynatarak birden fazla aboneye dağıtır"""
+
+    def __init__(self, source: AsyncIterator[Any], on_complete=None):
+        self._source = source
+        self._chunks: List[Any] = []
+        self._done = False
+        self._condition = asyncio.Condition()
+        self._on_complete = on_complete
+        self._pump_task = asyncio.create_task(self._pump())
+
+    async def _pump(self) -> None:
+        # Kaynak, abonelerden bağımsız tüketilir; böylece worker'ın tamamlanma sinyali her durumda tetiklenir
+        try:
+            async for chunk in self._source:
+                self._chunks.append(chunk)
+                async with self._condition:
+                    self._condition.notify_all()
+        except Exception as pump_err:
+            logger.error(f"Akış çoğaltıcısı kaynak hatası: {pump_err}")
+        finally:
+            self._done = True
+            async with self._condition:
+                self._condition.notify_all()
+            if self._on_complete:
+                self._on_complete()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            while index < len(self._chunks):
+                yield self._chunks[index]
+                index += 1
+            if self._done:
+                return
+            async with self._condition:
+                await self._condition.wait_for(lambda: index < len(self._chunks) or self._done)
+
+
+class _Flight:
+    def __init__(self, key: str, leader_req_id: str):
+        self.key = key
+        self.leader_req_id = leader_req_id
+        self.followers = 0
+        self.settled = asyncio.Event()
+        self.body: Optional[Tuple[bytes, int, Optional[str]]] = None
+        self.broadcast: Optional[StreamBroadcast] = None
+        self.status_code = 200
+        self.headers: Dict[str, str] = {}
+        self.error: Optional[HTTPException] = None
+        self.watcher = None  # liderin ClientDisconnectWatcher'ı
+
+    def join(self) -> None:
+        self.followers += 1
+        if self.watcher is not None:
+            self.watcher.hold()
+
+    def leave(self) -> None:
+        self.followers = max(0, self.followers - 1)
+        if self.watcher is not None:
+            self.watcher.release()
+
+    def bind(self, watcher) -> None:
+        """Liderin izleyicisini bağlar; bekleyen her takipçi için izleyici tutulur"""
+        self.watcher = watcher
+        for _ in range(self.followers):
+            watcher.hold()
+
+    def unbind(self) -> None:
+        """Üretim bittiğinde kalan tutmaları bırakır"""
+        watcher, self.watcher = self.watcher, None
+        if watcher is not None:
+            for _ in range(self.followers):
+                watcher.release()
+
+
+def _forwarded_headers(response: Response) -> Dict[str, str]:
+    # İçerik uzunluğu yeni yanıtta yeniden hesaplanır
+    return {name: value for name, value in response.headers.items() if name.lower() != "content-length"}
+
+
+async def _wait_unless_stopped(awaitable, watcher, timeout: Optional[float] = None) -> bool:
+    """
+    awaitable tamamlanana kadar bekler; watcher'ın olayı önce ayarlanırsa awaitable iptal edilir ve False döner.
+    timeout aşılırsa asyncio.TimeoutError yükseltilir.
+    """
+    task = asyncio.ensure_future(awaitable)
+    if watcher is None:
+        await asyncio.wait_for(task, timeout=timeout)
+        return True
+    stop = asyncio.ensure_future(watcher.wait())
+    try:
+        done, _ = await asyncio.wait({task, stop}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop.cancel()
+    if task in done:
+        task.result()
+        return True
+    task.cancel()
+    # İptal edilen bekleme bitmeden kaynağa (ör. abone üreticisine) yeniden dokunulmamalı
+    await asyncio.wait({task})
+    if stop in done:
+        return False
+    raise asyncio.TimeoutError
+
+
+class RequestCoalescer:
+    """Aynı parmak izine sahip eşzamanlı istekleri tek bir tarayıcı üretimine bağlar"""
+
+    def __init__(self, enabled: bool = REQUEST_COALESCING_ENABLED):
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self.coalesced_count = 0
+
+    def acquire(self, request: ChatCompletionRequest, req_id: str,
+                default_model: Optional[str] = None) -> Tuple[_Flight, bool]:
+        """
+        Aynı istek uçuştaysa ona bağlanır (False), değilse yeni lider olarak kaydeder (True).
+        Model belirtmeyen istekler, önbellek anahtarında olduğu gibi default_model ile eşleştirilir.
+        """
+        key = request_fingerprint(request, default_model=default_model)
+        flight = self._flights.get(key)
+        if flight is not None and flight.watcher is not None and flight.watcher.disconnected:
+            # Liderin üretimi zaten durduruluyor; yarım kalacak akışa bağlanmak yerine yeni lider ol
+            self._release(flight)
+            flight = None
+        if flight is not None:
+            flight.join()
+            self.coalesced_count += 1
+            return flight, False
+        flight = _Flight(key, req_id)
+        self._flights[key] = flight
+        return flight, True
+
+    def bind(self, flight: _Flight, watcher) -> None:
+        """Liderin bağlantı izleyicisini uçuşa bağlar (takipçiler varken kopma ertelenir)"""
+        flight.bind(watcher)
+
+    def publish(self, flight: _Flight, response: Response) -> Response:
+        """
+        Liderin ham yanıtını takipçilerle paylaşır ve liderin kendi yanıtını döndürür.
+        İstemciye özel sarmalayıcılar, dönen yanıtın üzerine eklenmelidir.
+        """
+        flight.status_code = response.status_code
+        flight.headers = _forwarded_headers(response)
+        if isinstance(response, StreamingResponse):
+            flight.broadcast = StreamBroadcast(response.body_iterator, on_complete=lambda: self._release(flight))
+            flight.settled.set()
+            return StreamingResponse(flight.broadcast.subscribe(), status_code=flight.status_code,
+                                     headers=flight.headers, media_type=response.media_type)
+        flight.body = (bytes(response.body), response.status_code, response.media_type)
+        flight.settled.set()
+        self._release(flight)
+        return response
+
+    def fail(self, flight: _Flight, error: Optional[BaseException]) -> None:
+        """Lider sonuçsuz bittiğinde çağrılır; istemci kopmaları dışındaki HTTP hataları takipçilere de iletilir"""
+        if isinstance(error, HTTPException) and error.status_code != 499:
+            flight.error = error
+        flight.settled.set()
+        self._release(flight)
+
+    async def follow(self, flight: _Flight, timeout: float, watcher=None) -> Response:
+        """
+        Liderin sonucunu bekler. watcher (takipçinin ClientDisconnectWatcher'ı) verilirse takipçi
+        koptuğunda veya son tarihi dolduğunda bekleme hemen bırakılır ve izleyicinin hatası yükseltilir.
+        """
+        try:
+            if not await _wait_unless_stopped(flight.settled.wait(), watcher, timeout):
+                raise watcher.error(f"[{watcher.req_id}] İstemci birleştirilmiş isteği beklerken bağlantıyı kesti")
+        except BaseException:
+            flight.leave()
+            if watcher is not None:
+                watcher.close()
+            raise
+        if flight.broadcast is not None:
+            # Takipçi, akışının sonuna kadar uçuşta sayılır
+            return StreamingResponse(self._follower_stream(flight, watcher), status_code=flight.status_code,
+                                     headers=flight.headers, media_type="text/event-stream")
+        flight.leave()
+        if watcher is not None:
+            watcher.close()
+        if flight.body is not None:
+            body, status_code, media_type = flight.body
+            return Response(content=body, status_code=status_code, headers=flight.headers, media_type=media_type)
+        if flight.error is not None:
+            raise HTTPException(status_code=flight.error.status_code, detail=flight.error.detail,
+                                headers=getattr(flight.error, "headers", None))
+        raise LeaderAbandoned(flight.leader_req_id)
+
+    @staticmethod
+    async def _follower_stream(flight: _Flight, watcher=None) -> AsyncIterator[Any]:
+        chunks = flight.broadcast.subscribe()
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+                try:
+                    if not await _wait_unless_stopped(next_chunk, watcher):
+                        # Takipçinin son tarih bildirimi ve [DONE] işareti route sarmalayıcısında eklenir
+                        return
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            await chunks.aclose()
+            flight.leave()
+            if watcher is not None:
+                watcher.close()
+
+    def _release(self, flight: _Flight) -> None:
+        flight.unbind()
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "followers_waiting": sum(flight.followers for flight in self._flights.values()),
+            "coalesced_count": self.coalesced_count,
+        }
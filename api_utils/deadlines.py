@@ -0,0 +1,49 @@
+"""
+İstek son tarihi (deadline) modülü
+İstemcinin beklemeye razı olduğu süre `X-Request-Timeout` başlığından veya gövdedeki
+`request_timeout` alanından okunur ve kuyruk öğesine mutlak bir son tarih olarak yazılır.
+Süresi dolan istekler sayfaya dokunulmadan düşürülür; sayılar kuyruk durumunda gösterilir.
+"""
+
+import math
+from typing import Any, Dict, Mapping, Optional
+
+from config import DEFAULT_REQUEST_TIMEOUT_SECONDS
+
+REQUEST_TIMEOUT_HEADER = "x-request-timeout"
+
+
+def parse_request_timeout(headers: Optional[Mapping[str, str]], request: Any) -> Optional[float]:
+    """İstek başına zaman aşımını saniye cinsinden döndürür; geçersiz değerde ValueError fırlatır"""
+    raw = headers.get(REQUEST_TIMEOUT_HEADER) if headers is not None else None
+    if raw is None:
+        raw = getattr(request, "request_timeout", None)
+    if raw is None:
+        return DEFAULT_REQUEST_TIMEOUT_SECONDS if DEFAULT_REQUEST_TIMEOUT_SECONDS > 0 else None
+    try:
+        timeout = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{raw}' geçerli bir saniye değeri değil")
+    if not math.isfinite(timeout) or timeout <= 0:
+        raise ValueError(f"zaman aşımı pozitif olmalı ({raw})")
+    return timeout
+
+
+class DeadlineStats:
+    """Son tarihi dolan isteklerin hangi aşamada durdurulduğunu sayar"""
+
+    STAGES = ("queued", "dispatched", "in_flight")
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {stage: 0 for stage in self.STAGES}
+
+    def record(self, stage: str) -> None:
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "default_timeout_seconds": DEFAULT_REQUEST_TIMEOUT_SECONDS or None,
+            "expired_before_dispatch": self.counts["queued"],
+            "expired_before_start": self.counts["dispatched"],
+            "expired_in_flight": self.counts["in_flight"],
+        }
@@ -2,7 +2,7 @@
 FastAPI bağımlılıkları modülü
 """
 import logging
-from asyncio import Queue, Lock, Event
+from asyncio import Queue, Event
 from typing import Dict, Any, List, Set
 
 from fastapi import Request
@@ -19,9 +19,49 @@ def get_request_queue() -> Queue:
     from server import request_queue
     return request_queue
 
-def get_processing_lock() -> Lock:
-    from server import processing_lock
-    return processing_lock
+def get_page_pool():
+    from server import page_pool
+    return page_pool
+
+def get_admission_controller():
+    from server import admission_controller
+    return admission_controller
+
+def get_request_prefetcher():
+    from server import request_prefetcher
+    return request_prefetcher
+
+def get_request_coalescer():
+    from server import request_coalescer
+    return request_coalescer
+
+def get_response_cache():
+    from server import response_cache
+    return response_cache
+
+def get_batch_manager():
+    from server import batch_manager
+    return batch_manager
+
+def get_model_affinity():
+    from server import model_affinity
+    return model_affinity
+
+def get_deadline_stats():
+    from server import deadline_stats
+    return deadline_stats
+
+def get_http_backend():
+    from server import http_backend
+    return http_backend
+
+def get_overlay_suppressor():
+    from server import overlay_suppressor
+    return overlay_suppressor
+
+def get_stream_channel():
+    from server import STREAM_CHANNEL
+    return STREAM_CHANNEL
 
 def get_worker_task():
     from server import worker_task
@@ -0,0 +1,146 @@
+"""
+İstemci bağlantı kopması izleme modülü
+Her istek için ASGI alım kanalını dinleyen tek bir görev çalıştırır; `http.disconnect`
+mesajı geldiğinde tek bir olayı ayarlar ve kayıtlı geri çağırmaları çalıştırır.
+Kuyruk, worker ve akış üreticisi aynı olayı paylaşır; periyodik yoklama yapılmaz.
+
+İsteğin bir son tarihi (deadline) varsa aynı olay o anda da ayarlanır; böylece süresi dolan
+istekler kuyrukta, worker'da ve akış sırasında bağlantısı kopmuş gibi durdurulur.
+
+Birleştirilmiş (coalesced) isteklerde takipçiler liderin üretimini beklerken izleyici
+"tutulur" (hold); liderin kopması veya son tarihi son takipçi ayrılana kadar ertelenir.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger("AIStudioProxyServer")
+
+
+class ClientDisconnectWatcher:
+    """İstek başına bağlantı kopması izleyicisi"""
+
+    def __init__(self, req_id: str, http_request: Optional[Request]):
+        self.req_id = req_id
+        self.http_request = http_request
+        self.event = asyncio.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.deadline: Optional[float] = None
+        self.deadline_exceeded = False
+        self._deadline_handle: Optional[asyncio.TimerHandle] = None
+        self._holds = 0
+        self._deferred: Optional[Callable[[], None]] = None
+
+    @property
+    def disconnected(self) -> bool:
+        return self.event.is_set()
+
+    def start(self) -> "ClientDisconnectWatcher":
+        """İstek gövdesi okunduktan sonra çağrılmalıdır; kalan tek mesaj `http.disconnect` olur"""
+        if self._task is None and self.http_request is not None:
+            self._task = asyncio.create_task(self._watch())
+        return self
+
+    async def _watch(self) -> None:
+        receive = self.http_request.receive
+        try:
+            while not self._closed:
+                message = await receive()
+                if message.get("type") == "http.disconnect":
+                    self._fire()
+                    return
+        except asyncio.CancelledError:
+            pass
+        except Exception as watch_err:
+            # Alım kanalı bozulduysa bağlantı kopmuş kabul edilir
+            logger.debug(f"[{self.req_id}] Bağlantı izleyicisi hatası: {watch_err}")
+            self._fire()
+
+    def set_deadline(self, deadline: Optional[float]) -> "ClientDisconnectWatcher":
+        """Mutlak son tarihi (time.time() cinsinden) ayarlar; süre dolduğunda olay ayarlanır"""
+        if deadline is None or self._closed:
+            return self
+        self.deadline = deadline
+        if self._deadline_handle:
+            self._deadline_handle.cancel()
+        self._deadline_handle = asyncio.get_running_loop().call_later(max(0.0, deadline - time.time()), self._expire)
+        return self
+
+    @property
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def hold(self) -> None:
+        """Başka istemciler bu isteğin üretimini paylaşırken kopmayı ve son tarihi erteler"""
+        self._holds += 1
+
+    def release(self) -> None:
+        """hold() karşılığı; son tutma bırakıldığında ertelenen kopma/son tarih uygulanır"""
+        self._holds = max(0, self._holds - 1)
+        if not self._holds and self._deferred is not None:
+            deferred, self._deferred = self._deferred, None
+            deferred()
+
+    def _expire(self) -> None:
+        if self._closed or self.event.is_set():
+            return
+        if self._holds:
+            self._deferred = self._expire
+            return
+        self.deadline_exceeded = True
+        logger.info(f"[{self.req_id}] İsteğin son tarihi doldu; istek durduruluyor.")
+        self._fire()
+
+    def error(self, detail: str) -> HTTPException:
+        """Olay ayarlandığında istemciye iletilecek hata: son tarih dolduysa 504, bağlantı koptuysa 499"""
+        if self.deadline_exceeded:
+            return HTTPException(status_code=504, detail=f"[{self.req_id}] Request deadline exceeded.")
+        return HTTPException(status_code=499, detail=detail)
+
+    def _fire(self) -> None:
+        if self._closed or self.event.is_set():
+            return
+        if self._holds:
+            self._deferred = self._deferred or self._fire
+            return
+        if not self.deadline_exceeded:
+            logger.info(f"[{self.req_id}] İstemci bağlantısı kesildi (http.disconnect).")
+        self.event.set()
+        for callback in list(self._callbacks):
+            try:
+                callback()
+            except Exception as cb_err:
+                logger.error(f"[{self.req_id}] Bağlantı kopması geri çağırmasında hata: {cb_err}")
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Bağlantı koptuğunda çağrılacak eşzamanlı fonksiyonu kaydeder; zaten koptuysa hemen çağırır"""
+        if self.event.is_set():
+            callback()
+        else:
+            self._callbacks.append(callback)
+        return callback
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        try:
+            self._callbacks.remove(callback)
+        except ValueError:
+            pass
+
+    async def wait(self) -> None:
+        await self.event.wait()
+
+    def close(self) -> None:
+        """Yanıt tamamlandıktan sonra çağrılır; sonraki `http.disconnect` mesajları yok sayılır"""
+        self._closed = True
+        self._callbacks.clear()
+        if self._deadline_handle:
+            self._deadline_handle.cancel()
+            self._deadline_handle = None
+        if self._task and not self._task.done():
+            self._task.cancel()
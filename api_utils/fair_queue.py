@@ -0,0 +1,321 @@
+"""
+Adil kuyruk modülü
+İstekleri API anahtarı başına alt kuyruklarda tutar ve ağırlıklı Deficit Round Robin
+(DRR) ile sırayla çıkarır. asyncio.Queue ile aynı temel arayüzü sunar; böylece tek bir
+istemcinin art arda gönderdiği çok sayıda istek diğer anahtarları aç bırakmaz.
+
+req_id -> istek indeksi sayesinde arama ve iptal sabit zamanda yapılır; iptal edilen
+istekler yerinde "mezar taşı" olarak işaretlenir ve kuyruktan çıkarılırken atlanır. İptal edilen
+istek iptal anında tamamlanmış sayılır (task_done), böylece akışta kalan mezar taşları join()'i
+bekletmez; iptal edildikten sonra kuyruğa geri konan istekler ise hiç eklenmez.
+
+get() isteğe bağlı bir tercih yüklemi alabilir: DRR sırası gelen istek tercihe uymuyorsa
+tercihe uyan en eski istek öne alınır. Sırası gelen istek en fazla max_skips kez atlanabilir.
+"""
+
+import asyncio
+import collections
+import heapq
+import time
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from . import auth_utils
+
+ANONYMOUS_FLOW = "anonymous"
+
+
+class _Flow:
+    """Tek bir istemci anahtarına ait alt kuyruk"""
+
+    def __init__(self, key: str, weight: float):
+        self.key = key
+        self.weight = weight
+        self.deficit = 0.0
+        self.in_turn = False
+        self.items: Deque[Dict[str, Any]] = collections.deque()
+        self.served_count = 0
+
+
+class FairRequestQueue:
+    """API anahtarı başına ağırlıklı DRR zamanlayıcısı"""
+
+    def __init__(self, weight_resolver: Optional[Callable[[Optional[str]], float]] = None, quantum: float = 1.0):
+        self._weight_resolver = weight_resolver or auth_utils.get_key_weight
+        self._quantum = quantum
+        self._flows: Dict[str, _Flow] = {}
+        self._active: Deque[_Flow] = collections.deque()
+        self._size = 0
+        self._tombstones = 0
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._getters: Deque[asyncio.Future] = collections.deque()
+        self._put_waiters: List[asyncio.Future] = []
+        self._unfinished_tasks = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    # ------------------------------------------------------------------
+    # asyncio.Queue uyumlu arayüz
+    # ------------------------------------------------------------------
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return False
+
+    def put_nowait(self, item: Dict[str, Any]) -> None:
+        if item.get("cancelled"):
+            # Dağıtılmışken iptal edilip geri konan istek (ör. kapanan sayfadan); yanıtı iptal eden tarafından verildi
+            item["state"] = "cancelled"
+            self._index.pop(item.get("req_id"), None)
+            return
+        flow_key = item.get("client_key") or ANONYMOUS_FLOW
+        flow = self._flows.get(flow_key)
+        if flow is None:
+            flow = _Flow(flow_key, self._resolve_weight(flow_key))
+            self._flows[flow_key] = flow
+        if not flow.items:
+            self._active.append(flow)
+        flow.items.append(item)
+        item["state"] = "queued"
+        if item.get("req_id"):
+            self._index[item["req_id"]] = item
+        self._size += 1
+        self._unfinished_tasks += 1
+        self._finished.clear()
+        self._wakeup_next()
+        for waiter in self._put_waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._put_waiters.clear()
+
+    async def put(self, item: Dict[str, Any]) -> None:
+        self.put_nowait(item)
+
+    def get_nowait(self, prefer: Optional[Callable[[Dict[str, Any]], bool]] = None, max_skips: int = 0) -> Dict[str, Any]:
+        if self.empty():
+            raise asyncio.QueueEmpty
+        return self._pop(prefer, max_skips)
+
+    async def get(self, prefer: Optional[Callable[[Dict[str, Any]], bool]] = None, max_skips: int = 0) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        while self.empty():
+            getter = loop.create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except BaseException:
+                getter.cancel()
+                try:
+                    self._getters.remove(getter)
+                except ValueError:
+                    pass
+                if not self.empty() and not getter.cancelled():
+                    self._wakeup_next()
+                raise
+        return self.get_nowait(prefer, max_skips)
+
+    def get_matching_nowait(self, predicate: Callable[[Dict[str, Any]], bool]) -> Optional[Dict[str, Any]]:
+        """
+        Yalnızca yüklemi sağlayan bir isteği çıkarır: DRR sırası gelen istek uyuyorsa o, aksi halde
+        uyan en eski istek. Uyan istek yoksa None döner ve kuyruk değişmez.
+        """
+        if self.empty():
+            return None
+        flow = self._next_flow()
+        head = flow.items[0]
+        if predicate(head):
+            flow.items.popleft()
+            return self._take(flow, head)
+        matching = self._find_preferred(predicate)
+        if matching is None:
+            return None
+        owner = self._flows[matching.get("client_key") or ANONYMOUS_FLOW]
+        owner.items.remove(matching)
+        return self._take(owner, matching)
+
+    async def wait_for_put(self) -> None:
+        """Kuyruğa bir sonraki istek eklenene kadar bekler"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._put_waiters.append(waiter)
+        try:
+            await waiter
+        finally:
+            if waiter in self._put_waiters:
+                self._put_waiters.remove(waiter)
+
+    def task_done(self) -> None:
+        if self._unfinished_tasks <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished_tasks -= 1
+        if self._unfinished_tasks == 0:
+            self._finished.set()
+
+    async def join(self) -> None:
+        if self._unfinished_tasks > 0:
+            await self._finished.wait()
+
+    # ------------------------------------------------------------------
+    # İndeks ve iptal
+    # ------------------------------------------------------------------
+    def get_entry(self, req_id: str) -> Optional[Dict[str, Any]]:
+        """Kuyrukta bekleyen veya işlenmekte olan isteği sabit zamanda döndürür"""
+        return self._index.get(req_id)
+
+    def cancel(self, req_id: str) -> bool:
+        """
+        İsteği kuyruk sırasına dokunmadan iptal eder.
+        Kuyruktaki istek mezar taşına dönüşür; dağıtılmış ama henüz başlamamış istek
+        yalnızca işaretlenir ve worker tarafından atlanır. İşlenmekte olan istek iptal edilemez.
+        """
+        entry = self._index.get(req_id)
+        if entry is None or entry.get("cancelled"):
+            return False
+        state = entry.get("state")
+        if state == "queued":
+            entry["cancelled"] = True
+            entry["state"] = "cancelled"
+            self._size -= 1
+            self._tombstones += 1
+            self.task_done()
+            return True
+        if state == "dispatched":
+            entry["cancelled"] = True
+            return True
+        return False
+
+    def mark_processing(self, req_id: str, **details: Any) -> None:
+        entry = self._index.get(req_id)
+        if entry is not None:
+            entry["state"] = "processing"
+            entry.update(details)
+
+    def complete(self, req_id: str) -> None:
+        """Worker işi bitirdiğinde isteği indeksten çıkarır"""
+        self._index.pop(req_id, None)
+
+    # ------------------------------------------------------------------
+    # Durum bilgileri
+    # ------------------------------------------------------------------
+    def items(self) -> List[Dict[str, Any]]:
+        """Kuyruktaki tüm istekleri (kuyruktan çıkarmadan) geliş sırasına göre döndürür"""
+        return list(self.iter_oldest())
+
+    def iter_oldest(self) -> Iterator[Dict[str, Any]]:
+        """
+        Canlı istekleri geliş sırasına göre tembel olarak üretir.
+        Her akış zaten geliş sırasında olduğundan yalnızca akış başları birleştirilir; ilk K istek
+        için tüm kuyruğu sıralamak gerekmez.
+        """
+        live_flows = [
+            (item for item in flow.items if not item.get("cancelled")) for flow in self._flows.values()
+        ]
+        return heapq.merge(*live_flows, key=lambda item: item.get("enqueue_time", 0))
+
+    @property
+    def tombstone_count(self) -> int:
+        return self._tombstones
+
+    def flows_snapshot(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        snapshot = []
+        for flow in self._flows.values():
+            live_items = [item for item in flow.items if not item.get("cancelled")]
+            oldest = live_items[0].get("enqueue_time", now) if live_items else now
+            snapshot.append({
+                "client": self._display_key(flow.key),
+                "weight": flow.weight,
+                "queued": len(live_items),
+                "served": flow.served_count,
+                "oldest_wait_seconds": round(now - oldest, 2),
+            })
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # DRR
+    # ------------------------------------------------------------------
+    def _pop(self, prefer: Optional[Callable[[Dict[str, Any]], bool]] = None, max_skips: int = 0) -> Dict[str, Any]:
+        flow = self._next_flow()
+        head = flow.items[0]
+        if prefer is not None and head.get("affinity_skips", 0) < max_skips and not prefer(head):
+            preferred = self._find_preferred(prefer)
+            if preferred is not None:
+                head["affinity_skips"] = head.get("affinity_skips", 0) + 1
+                preferred["affinity_reordered"] = True
+                owner = self._flows[preferred.get("client_key") or ANONYMOUS_FLOW]
+                owner.items.remove(preferred)
+                return self._take(owner, preferred)
+        flow.items.popleft()
+        return self._take(flow, head)
+
+    def _next_flow(self) -> _Flow:
+        """DRR sırası gelen ve başında canlı bir istek bulunan akışı döndürür (istek çıkarılmaz)"""
+        while True:
+            flow = self._active[0]
+            self._discard_tombstones(flow)
+            if not flow.items:
+                self._deactivate(flow)
+                continue
+            if not flow.in_turn:
+                flow.deficit += self._quantum * flow.weight
+                flow.in_turn = True
+            if flow.deficit >= 1.0:
+                return flow
+            # Bu turdaki kredi bitti; sıradaki akışa geç
+            flow.in_turn = False
+            self._active.rotate(-1)
+
+    def _find_preferred(self, prefer: Callable[[Dict[str, Any]], bool]) -> Optional[Dict[str, Any]]:
+        for item in self.iter_oldest():
+            if prefer(item):
+                return item
+        return None
+
+    def _take(self, flow: _Flow, item: Dict[str, Any]) -> Dict[str, Any]:
+        # Öne alınan istek kendi akışının kredisinden düşülür; kredi eksiye inerse akış sonraki turlarda bekler
+        item["state"] = "dispatched"
+        flow.deficit -= 1.0
+        flow.served_count += 1
+        self._size -= 1
+        self._discard_tombstones(flow)
+        if not flow.items:
+            self._deactivate(flow)
+        return item
+
+    def _discard_tombstones(self, flow: _Flow) -> None:
+        """Akışın başındaki iptal edilmiş istekleri DRR kredisi harcamadan atar (task_done iptal anında çağrıldı)"""
+        while flow.items and flow.items[0].get("cancelled") and flow.items[0].get("state") == "cancelled":
+            tombstone = flow.items.popleft()
+            self._tombstones -= 1
+            self._index.pop(tombstone.get("req_id"), None)
+
+    def _deactivate(self, flow: _Flow) -> None:
+        # Boşalan akış kredisini biriktirmez
+        self._active.remove(flow)
+        flow.deficit = 0.0
+        flow.in_turn = False
+        # Ağırlıklar key.txt'den yeniden okunabilsin diye boş akışlar bir sonraki istekte yeniden oluşturulur
+        self._flows.pop(flow.key, None)
+
+    def _resolve_weight(self, flow_key: str) -> float:
+        if flow_key == ANONYMOUS_FLOW or flow_key.startswith(("ip:", "batch:")):
+            return auth_utils.DEFAULT_KEY_WEIGHT
+        try:
+            return max(0.01, float(self._weight_resolver(flow_key)))
+        except Exception:
+            return auth_utils.DEFAULT_KEY_WEIGHT
+
+    def _wakeup_next(self) -> None:
+        while self._getters:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                break
+
+    @staticmethod
+    def _display_key(flow_key: str) -> str:
+        if flow_key == ANONYMOUS_FLOW or flow_key.startswith(("ip:", "batch:")):
+            return flow_key
+        return auth_utils.mask_key(flow_key)
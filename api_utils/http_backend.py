@@ -0,0 +1,370 @@
+"""
+Başsız HTTP arka uç modülü
+Tarayıcı bağlamından (context.storage_state(), _save_auth_state'in yazdığı veriyle aynı) alınan
+çerez ve belirteçlerle sohbet API'sini havuzlanmış bir aiohttp oturumu üzerinden doğrudan çağırır.
+Yanıt, akış proxy'sinin ürettiği sürümlü delta mesajlarına çevrilir. Tarayıcıya yalnızca kimlik
+bilgileri eksik, süresi dolmak üzere veya üst sunucu tarafından reddedilmişse dokunulur; sayfa da
+yalnızca bu durumda ödünç alınır.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import time
+import uuid
+from typing import Any, AsyncContextManager, AsyncGenerator, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import (
+    HTTP_BACKEND_ENABLED,
+    HTTP_BACKEND_BASE_URL,
+    HTTP_BACKEND_MAX_CONNECTIONS,
+    HTTP_BACKEND_READ_TIMEOUT_SECONDS,
+    HTTP_BACKEND_CREDENTIAL_MARGIN_SECONDS,
+    PAGE_API_NEW_CHAT_PATH,
+    PAGE_API_COMPLETIONS_PATH,
+)
+from models import ChatCompletionRequest
+from stream.ipc import STREAM_MESSAGE_VERSION
+from stream.parsers import QwenSSEParser
+
+logger = logging.getLogger("AIStudioProxyServer")
+
+AUTH_TOKEN_KEY = "token"
+
+# Çağrıldığında bir tarayıcı sayfası (veya uygun sayfa yoksa None) veren bağlam yöneticisi döndürür
+PageSource = Callable[[], AsyncContextManager[Optional[Any]]]
+
+
+class HttpBackendError(Exception):
+    """Üst sunucu isteği yanıt üretmeden önce reddetti veya ulaşılamadı"""
+
+    def __init__(self, message: str, status: int = 0):
+        super().__init__(message)
+        self.status = status
+
+
+class HttpBackendAuthError(HttpBackendError):
+    """Kimlik bilgileri reddedildi (401/403); yenilendikten sonra bir kez yeniden denenir"""
+
+
+def _jwt_expiry(token: Optional[str]) -> Optional[float]:
+    """JWT belirtecinin exp alanını döndürür; çözülemezse None"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+
+def _domain_matches(host: str, cookie_domain: str) -> bool:
+    domain = (cookie_domain or "").lstrip(".").lower()
+    return bool(domain) and (host == domain or host.endswith("." + domain))
+
+
+class SessionCredentials:
+    """Tek bir storage_state anlık görüntüsünden çıkarılan çerezler ve yetkilendirme belirteci"""
+
+    def __init__(self, cookies: Dict[str, str], token: Optional[str], expires_at: Optional[float],
+                 user_agent: Optional[str] = None):
+        self.cookies = cookies
+        self.token = token
+        self.expires_at = expires_at
+        self.user_agent = user_agent
+        self.obtained_at = time.time()
+
+    @classmethod
+    def from_storage_state(cls, state: Dict[str, Any], base_url: str = HTTP_BACKEND_BASE_URL) -> "SessionCredentials":
+        host = (urlsplit(base_url).hostname or "").lower()
+        now = time.time()
+        cookies: Dict[str, str] = {}
+        cookie_expiry: Dict[str, float] = {}
+        for cookie in state.get("cookies") or []:
+            expires = cookie.get("expires") or -1
+            if not _domain_matches(host, cookie.get("domain", "")) or 0 < expires <= now:
+                continue
+            cookies[cookie["name"]] = cookie.get("value", "")
+            if expires > 0:
+                cookie_expiry[cookie["name"]] = expires
+
+        token = None
+        for origin in state.get("origins") or []:
+            if (urlsplit(origin.get("origin", "")).hostname or "").lower() != host:
+                continue
+            for item in origin.get("localStorage") or []:
+                if item.get("name") == AUTH_TOKEN_KEY and item.get("value"):
+                    token = item["value"]
+        token = token or cookies.get(AUTH_TOKEN_KEY)
+        expires_at = _jwt_expiry(token) or cookie_expiry.get(AUTH_TOKEN_KEY)
+        return cls(cookies, token, expires_at)
+
+    def expired(self, margin: float = 0.0) -> bool:
+        return self.expires_at is not None and self.expires_at - margin <= time.time()
+
+    def headers(self, accept: str = "application/json") -> Dict[str, str]:
+        headers = {"Accept": accept, "Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if self.user_agent:
+            headers["User-Agent"] = self.user_agent
+        return headers
+
+
+def build_completion_payload(chat_id: str, model_id: str, prompt: str) -> Dict[str, Any]:
+    """Web istemcisinin gönderdiği biçimde tek kullanıcı mesajlı akış isteği"""
+    now = int(time.time())
+    return {
+        "stream": True,
+        "incremental_output": True,
+        "chat_id": chat_id,
+        "chat_mode": "normal",
+        "model": model_id,
+        "parent_id": None,
+        "messages": [{
+            "fid": str(uuid.uuid4()),
+            "parentId": None,
+            "childrenIds": [],
+            "role": "user",
+            "content": prompt,
+            "user_action": "chat",
+            "files": [],
+            "timestamp": now,
+            "models": [model_id],
+            "chat_type": "t2t",
+            "sub_chat_type": "t2t",
+            "feature_config": {"thinking_enabled": False, "output_schema": "phase"},
+            "extra": {"meta": {"subChatType": "t2t"}},
+        }],
+        "timestamp": now,
+    }
+
+
+def request_has_images(request: ChatCompletionRequest) -> bool:
+    for message in request.messages:
+        if isinstance(message.content, list):
+            if any(item.type == "image_url" or item.image_url is not None for item in message.content):
+                return True
+    return False
+
+
+class HttpChatBackend:
+    """Tarayıcı kimlik bilgileriyle sohbet API'sini doğrudan çağıran havuzlanmış istemci"""
+
+    def __init__(self, enabled: bool = HTTP_BACKEND_ENABLED, base_url: str = HTTP_BACKEND_BASE_URL,
+                 max_connections: int = HTTP_BACKEND_MAX_CONNECTIONS,
+                 read_timeout: float = HTTP_BACKEND_READ_TIMEOUT_SECONDS,
+                 credential_margin: float = HTTP_BACKEND_CREDENTIAL_MARGIN_SECONDS):
+        self.enabled = enabled
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max(1, max_connections)
+        self.read_timeout = read_timeout
+        self.credential_margin = credential_margin
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._credentials: Optional[SessionCredentials] = None
+        self._refresh_lock = asyncio.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.auth_retries = 0
+        self.credential_refreshes = 0
+        self.page_reloads = 0
+        self.active_streams = 0
+
+    def handles(self, request: ChatCompletionRequest) -> bool:
+        """Görsel yükleme tarayıcı gerektirdiğinden yalnızca metin istekleri bu arka uçla işlenir"""
+        return self.enabled and not request_has_images(request)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=self.read_timeout),
+                # Çerezler her istekte güncel kimlik bilgilerinden gönderilir; yanıtlarla gelenler paylaşılmaz
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trust_env=True,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ------------------------------------------------------------------
+    # Kimlik bilgileri
+    # ------------------------------------------------------------------
+    async def _read_credentials(self, page) -> SessionCredentials:
+        state = await page.context.storage_state()
+        credentials = SessionCredentials.from_storage_state(state, self.base_url)
+        try:
+            credentials.user_agent = await page.evaluate("() => navigator.userAgent")
+        except Exception:
+            pass
+        return credentials
+
+    async def ensure_credentials(self, page_source: PageSource,
+                                 rejected: Optional[SessionCredentials] = None) -> SessionCredentials:
+        """
+        Geçerli kimlik bilgilerini döndürür; yalnızca eksik, süresi dolmak üzere veya reddedilmişse
+        page_source'tan ödünç alınan sayfa üzerinden tarayıcıdan yeniler
+        """
+        async with self._refresh_lock:
+            current = self._credentials
+            if current is not None and current is not rejected and not current.expired(self.credential_margin):
+                return current
+            async with page_source() as page:
+                return await self._refresh_credentials(page, rejected)
+
+    async def _refresh_credentials(self, page, rejected: Optional[SessionCredentials]) -> SessionCredentials:
+        if page is None or page.is_closed():
+            raise HttpBackendError("Kimlik bilgilerini yenilemek için açık bir tarayıcı sayfası yok", status=503)
+
+        credentials = await self._read_credentials(page)
+        stale = credentials.expired(self.credential_margin) or (
+            rejected is not None and credentials.token == rejected.token and credentials.cookies == rejected.cookies
+        )
+        if stale:
+            # Bağlamdaki oturum da eskiyse sayfanın kendi belirteç yenilemesini tetikle
+            logger.info("HTTP arka ucu: tarayıcı oturumu eskimiş, belirteç yenilemesi için sayfa yeniden yükleniyor.")
+            await page.reload(wait_until="domcontentloaded")
+            self.page_reloads += 1
+            credentials = await self._read_credentials(page)
+        if not credentials.token and not credentials.cookies:
+            raise HttpBackendError("Tarayıcı bağlamında oturum bilgisi bulunamadı", status=401)
+
+        self._credentials = credentials
+        self.credential_refreshes += 1
+        logger.info(
+            f"HTTP arka ucu: kimlik bilgileri yenilendi ({len(credentials.cookies)} çerez, "
+            f"belirteç {'var' if credentials.token else 'yok'})."
+        )
+        return credentials
+
+    # ------------------------------------------------------------------
+    # İstekler
+    # ------------------------------------------------------------------
+    async def _raise_for_response(self, response: aiohttp.ClientResponse, stage: str) -> None:
+        detail = (await response.text())[:500]
+        if response.status in (401, 403):
+            raise HttpBackendAuthError(f"{stage}: {response.status} {detail}", status=response.status)
+        code = ""
+        try:
+            payload = json.loads(detail)
+            data = payload.get("data") if isinstance(payload, dict) else None
+            code = str((data or {}).get("code", "")) if isinstance(data, dict) else ""
+        except ValueError:
+            pass
+        if code.lower() in ("unauthorized", "forbidden", "token_expired"):
+            raise HttpBackendAuthError(f"{stage}: {code} {detail}", status=401)
+        raise HttpBackendError(f"{stage}: {response.status} {detail}", status=response.status)
+
+    async def _open_completion(self, credentials: SessionCredentials, model_id: str, prompt: str) -> aiohttp.ClientResponse:
+        session = self._get_session()
+        new_chat = {"title": "New Chat", "models": [model_id], "chat_mode": "normal", "chat_type": "t2t",
+                    "timestamp": int(time.time() * 1000)}
+        async with session.post(self.base_url + PAGE_API_NEW_CHAT_PATH, json=new_chat, headers=credentials.headers()) as response:
+            if response.status != 200:
+                await self._raise_for_response(response, "new-chat")
+            try:
+                chat_id = ((await response.json(content_type=None)) or {}).get("data", {}).get("id")
+            except (ValueError, AttributeError):
+                chat_id = None
+            if not chat_id:
+                await self._raise_for_response(response, "new-chat")
+
+        response = await session.post(
+            self.base_url + PAGE_API_COMPLETIONS_PATH,
+            params={"chat_id": chat_id},
+            json=build_completion_payload(chat_id, model_id, prompt),
+            headers=credentials.headers(accept="text/event-stream"),
+        )
+        if response.status != 200 or "text/event-stream" not in response.headers.get("Content-Type", ""):
+            try:
+                await self._raise_for_response(response, "completion")
+            finally:
+                response.release()
+        return response
+
+    async def stream_messages(self, prompt: str, model_id: str, page_source: PageSource,
+                              req_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        İstemi gönderir ve yanıtı akış proxy'siyle aynı sürümlü delta mesajları olarak üretir.
+        Çıktıdan önceki hatalar HttpBackendError olarak yükseltilir; akış başladıktan sonraki hatalar
+        son mesajın error alanında bildirilir.
+        """
+        self.requests += 1
+        credentials = await self.ensure_credentials(page_source)
+        try:
+            try:
+                response = await self._open_completion(credentials, model_id, prompt)
+            except HttpBackendAuthError as auth_err:
+                logger.info(f"[{req_id}] HTTP arka ucu kimlik bilgileri reddedildi ({auth_err}); yenilenip yeniden deneniyor.")
+                self.auth_retries += 1
+                credentials = await self.ensure_credentials(page_source, rejected=credentials)
+                response = await self._open_completion(credentials, model_id, prompt)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as conn_err:
+            self.failures += 1
+            raise HttpBackendError(f"Üst sunucuya ulaşılamadı: {conn_err}", status=502) from conn_err
+        except HttpBackendError:
+            self.failures += 1
+            raise
+
+        parser = QwenSSEParser()
+        seq = 0
+        error: Optional[str] = None
+        self.active_streams += 1
+        try:
+            async for chunk in response.content.iter_any():
+                delta = parser.feed(chunk)
+                if parser.error and not seq:
+                    raise HttpBackendError(f"Üst sunucu hatası: {parser.error}", status=502)
+                if delta["reason"] or delta["body"] or delta["function"]:
+                    yield {"v": STREAM_MESSAGE_VERSION, "seq": seq, **delta, "done": False}
+                    seq += 1
+                if parser.finished:
+                    break
+            if not seq and not parser.finished:
+                raise HttpBackendError("Üst sunucu akışı çıktı üretmeden kapandı", status=502)
+            error = parser.error
+        except (aiohttp.ClientError, asyncio.TimeoutError) as read_err:
+            if not seq:
+                self.failures += 1
+                raise HttpBackendError(f"Yanıt akışı okunamadı: {read_err}", status=502) from read_err
+            logger.warning(f"[{req_id}] HTTP arka ucu yanıt akışı yarıda kesildi: {read_err}")
+            error = f"stream interrupted: {read_err}"
+        except HttpBackendError:
+            self.failures += 1
+            raise
+        finally:
+            self.active_streams -= 1
+            response.release()
+
+        if error:
+            self.failures += 1
+        final = {"v": STREAM_MESSAGE_VERSION, "seq": seq, "reason": "", "body": "", "function": [], "done": True}
+        if error:
+            final["error"] = error
+        yield final
+
+    def snapshot(self) -> Dict[str, Any]:
+        credentials = self._credentials
+        return {
+            "enabled": self.enabled,
+            "base_url": self.base_url,
+            "requests": self.requests,
+            "failures": self.failures,
+            "active_streams": self.active_streams,
+            "auth_retries": self.auth_retries,
+            "credential_refreshes": self.credential_refreshes,
+            "page_reloads": self.page_reloads,
+            "credentials_expire_in": (
+                round(credentials.expires_at - time.time(), 1)
+                if credentials is not None and credentials.expires_at is not None else None
+            ),
+        }
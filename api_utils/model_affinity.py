@@ -0,0 +1,95 @@
+"""
+Model yakınlığı (affinity) modülü
+Her model değişimi açılır menüyü açıp öğeleri tek tek okuduğu için birkaç saniye sürer.
+Dağıtıcı, boşta bir sayfanın aktif modeliyle aynı modeli isteyen kuyruktaki istekleri
+öne alır; sırası gelen isteğin atlanma sayısı sınırlıdır, böylece hiçbir istek aç kalmaz.
+Kuyruk boşken en olası sonraki model tahmin edilir ve boşta bir sayfa önceden o modele geçirilir.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+from config import (
+    MODEL_NAME,
+    MODEL_AFFINITY_MAX_SKIPS,
+    MODEL_PRESWITCH_ENABLED,
+    MODEL_PRESWITCH_IDLE_SECONDS,
+    MODEL_DEMAND_DECAY,
+)
+
+
+def request_model_key(item: Dict[str, Any]) -> Optional[str]:
+    """Kuyruk öğesinin istediği model kimliği; varsayılan model (değişim gerektirmeyen) için None"""
+    request_data = item.get("request_data")
+    requested_model = getattr(request_data, "model", None)
+    if not requested_model or requested_model == MODEL_NAME:
+        return None
+    return requested_model.split('/')[-1]
+
+
+class ModelAffinity:
+    """Model yakınlığına göre yeniden sıralama sınırını ve model talep istatistiklerini tutar"""
+
+    def __init__(self, max_skips: int = MODEL_AFFINITY_MAX_SKIPS, preswitch_enabled: bool = MODEL_PRESWITCH_ENABLED,
+                 preswitch_idle_seconds: float = MODEL_PRESWITCH_IDLE_SECONDS, decay: float = MODEL_DEMAND_DECAY):
+        self.max_skips = max(0, max_skips)
+        self.preswitch_enabled = preswitch_enabled
+        self.preswitch_idle_seconds = preswitch_idle_seconds
+        self.decay = min(1.0, max(0.0, decay))
+        self._demand: Dict[str, float] = {}
+        self.dispatched = 0
+        self.reordered = 0
+        self.preswitches = 0
+        self.preswitch_failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_skips > 0
+
+    def preference(self, active_models: Iterable[Optional[str]]):
+        """Kuyruktan çekerken öne alınacak istekleri seçen yüklemi döndürür (kapalıysa None)"""
+        if not self.enabled:
+            return None
+        models = set(active_models)
+
+        def prefer(item: Dict[str, Any]) -> bool:
+            model_key = request_model_key(item)
+            return model_key is None or model_key in models
+
+        return prefer
+
+    def record_dispatch(self, item: Dict[str, Any]) -> None:
+        """Dağıtılan isteğin modelini azalan ağırlıklı talep sayacına ekler"""
+        self.dispatched += 1
+        if item.get("affinity_reordered"):
+            self.reordered += 1
+        model_key = request_model_key(item)
+        for key in list(self._demand):
+            self._demand[key] *= self.decay
+            if self._demand[key] < 0.01:
+                del self._demand[key]
+        if model_key is not None:
+            self._demand[model_key] = self._demand.get(model_key, 0.0) + 1.0
+
+    def predict_next_model(self) -> Optional[str]:
+        """Yakın geçmişte en çok talep edilen (varsayılan dışı) modeli döndürür"""
+        if not self._demand:
+            return None
+        return max(self._demand.items(), key=lambda kv: kv[1])[0]
+
+    def record_preswitch(self, success: bool) -> None:
+        if success:
+            self.preswitches += 1
+        else:
+            self.preswitch_failures += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_skips": self.max_skips,
+            "dispatched": self.dispatched,
+            "reordered": self.reordered,
+            "predicted_model": self.predict_next_model(),
+            "demand": {model: round(score, 2) for model, score in sorted(self._demand.items(), key=lambda kv: -kv[1])},
+            "preswitch_enabled": self.preswitch_enabled,
+            "preswitches": self.preswitches,
+            "preswitch_failures": self.preswitch_failures,
+        }
@@ -0,0 +1,812 @@
+"""
+Sayfa havuzu modülü
+Bir veya daha fazla Camoufox tarayıcı uç noktası üzerinde birden fazla tarayıcı
+bağlamını/sayfasını yönetir. Dağıtıcı, paylaşılan istek kuyruğundan alınan her isteği
+en az yüklü sağlıklı tarayıcıdaki boşta bir sayfaya yönlendirir; her sayfa kendi
+PageController'ı ve kuyruk işçisi döngüsüyle isteği işler. Başsız HTTP arka ucunun
+işlediği istekler sayfa tutmaz; HTTP_BACKEND_MAX_CONNECTIONS sınırı içinde ayrı görevlerde
+çalışır ve sayfa yalnızca kimlik bilgisi yenilemesi için kısa süreliğine ödünç alınır.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from config import (
+    PAGE_POOL_MIN_SIZE,
+    PAGE_POOL_MAX_SIZE,
+    PAGE_POOL_IDLE_TIMEOUT,
+    PAGE_POOL_SCALE_INTERVAL,
+    PAGE_POOL_SPARE_PAGE,
+    STREAM_CAPTURE_URL_GLOBS,
+)
+from stream.ipc import CORRELATION_HEADER, NO_CAPTURE_HEADER
+from .model_affinity import request_model_key
+
+
+class BrowserEndpoint:
+    """Tek bir Camoufox WS uç noktasına bağlı tarayıcıyı temsil eder"""
+
+    def __init__(self, endpoint_id: int, ws_endpoint: Optional[str], browser, is_primary: bool = False):
+        self.endpoint_id = endpoint_id
+        self.ws_endpoint = ws_endpoint
+        self.browser = browser
+        self.is_primary = is_primary
+        self.healthy = browser is None or browser.is_connected()
+        self.disconnected_time: Optional[float] = None
+
+    @property
+    def label(self) -> str:
+        return f"browser-{self.endpoint_id}"
+
+    def to_dict(self, slots: List["PageSlot"]) -> Dict[str, Any]:
+        return {
+            "endpoint_id": self.endpoint_id,
+            "label": self.label,
+            "is_primary": self.is_primary,
+            "healthy": self.healthy,
+            "pages": len(slots),
+            "busy": len([s for s in slots if s.is_busy]),
+        }
+
+
+class PageSlot:
+    """Havuzdaki tek bir sayfayı ve çalışma durumunu temsil eder"""
+
+    def __init__(self, slot_id: int, page, browser=None, is_primary: bool = False,
+                 endpoint: Optional[BrowserEndpoint] = None, on_idle: Optional[Callable[[], None]] = None):
+        self.slot_id = slot_id
+        self.page = page
+        self.browser = browser
+        self.endpoint = endpoint
+        self.is_primary = is_primary
+        self.is_ready = page is not None
+        self.state = "idle"  # starting | idle | busy | preswitching | lent | closing | closed
+        self.current_req_id: Optional[str] = None
+        self.current_model_id: Optional[str] = None
+        self.processing_lock = asyncio.Lock()
+        self.model_switching_lock = asyncio.Lock()
+        self.worker_task: Optional[asyncio.Task] = None
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._on_idle = on_idle
+        self.processed_count = 0
+        self.readiness_samples = 0
+        self.readiness_wait_total = 0.0
+        self.readiness_wait_last: Optional[float] = None
+        self.readiness_wait_max = 0.0
+        self.readiness_timeouts = 0
+        self.page_fresh = False  # Etkin sayfa sıfırlandı ve henüz bir istekte kullanılmadı
+        self.spare_page = None
+        self.spare_model_id: Optional[str] = None
+        self.spare_swaps = 0
+        self._spare_task: Optional[asyncio.Task] = None
+        self._stream_route_context = None
+        self.stream_correlation_error: Optional[str] = None
+        self.created_time = time.time()
+        self.last_active_time = time.time()
+
+    @property
+    def is_busy(self) -> bool:
+        return self.state == "busy"
+
+    def mark_busy(self, req_id: str) -> None:
+        self.state = "busy"
+        self.current_req_id = req_id
+        self.last_active_time = time.time()
+
+    def mark_idle(self) -> None:
+        if self.state == "busy":
+            self.state = "idle"
+            self.processed_count += 1
+        self.current_req_id = None
+        self.last_active_time = time.time()
+        if self._on_idle:
+            self._on_idle()
+
+    def record_readiness(self, wait_seconds: Optional[float]) -> None:
+        """İstekler arası sayfa hazır olma bekleme süresini kaydeder (None = zaman aşımı)"""
+        if wait_seconds is None:
+            self.readiness_timeouts += 1
+            return
+        self.readiness_samples += 1
+        self.readiness_wait_total += wait_seconds
+        self.readiness_wait_last = wait_seconds
+        self.readiness_wait_max = max(self.readiness_wait_max, wait_seconds)
+
+    @property
+    def spare_ready(self) -> bool:
+        try:
+            return self.spare_page is not None and not self.spare_page.is_closed()
+        except Exception:
+            return False
+
+    def ensure_spare(self) -> None:
+        """Yedek sayfa yoksa ve hazırlanmıyorsa arka planda açmaya başlar"""
+        if not PAGE_POOL_SPARE_PAGE or self.page is None or self.state in ("closing", "closed"):
+            return
+        if self.spare_page is not None or (self._spare_task and not self._spare_task.done()):
+            return
+        self._spare_task = asyncio.create_task(self._open_spare())
+
+    def swap_to_spare(self) -> bool:
+        """Hazır yedek sayfayı etkin sayfa yapar; kullanılan sayfa arka planda sıfırlanıp yeni yedek olur"""
+        if not self.spare_ready or self.state in ("closing", "closed"):
+            return False
+        used_page, used_model_id = self.page, self.current_model_id
+        self.page, self.spare_page = self.spare_page, None
+        self.set_current_model(self.spare_model_id)
+        self.page_fresh = True
+        self.spare_swaps += 1
+        if self.is_primary:
+            import server
+            server.page_instance = self.page
+        self._spare_task = asyncio.create_task(self._reset_spare(used_page, used_model_id))
+        return True
+
+    async def _open_spare(self) -> None:
+        from server import logger
+        from browser_utils import _initialize_spare_page, _set_model_from_page_display
+
+        page = await _initialize_spare_page(self.page.context, primary=self.is_primary)
+        if page is None:
+            logger.warning(f"[PagePool] Sayfa #{self.slot_id} için yedek sekme açılamadı.")
+            return
+        if self.state in ("closing", "closed"):
+            await self._close_page_quietly(page)
+            return
+        self.spare_model_id = await _set_model_from_page_display(page, f"pool-{self.slot_id}-spare", persist=False)
+        self.spare_page = page
+        logger.info(f"[PagePool] Sayfa #{self.slot_id} için yedek sekme hazır (model: {self.spare_model_id}).")
+
+    async def _reset_spare(self, page, model_id: Optional[str]) -> None:
+        from server import logger
+        from browser_utils.page_controller import PageController
+
+        try:
+            reset_done = await PageController(page, logger, f"pool-{self.slot_id}-spare").clear_chat_history(lambda stage="": False)
+        except Exception as reset_err:
+            logger.warning(f"[PagePool] Sayfa #{self.slot_id} yedek sekmesi sıfırlanırken hata: {reset_err}")
+            reset_done = False
+        if not reset_done:
+            # Sıfırlanamayan sekme yerine yeni bir sekme açılır
+            await self._close_page_quietly(page)
+            page = None
+        if self.state in ("closing", "closed"):
+            await self._close_page_quietly(page)
+            return
+        if page is None:
+            await self._open_spare()
+            return
+        self.spare_page = page
+        self.spare_model_id = model_id
+
+    async def close_spare(self) -> None:
+        if self._spare_task and not self._spare_task.done():
+            self._spare_task.cancel()
+            try:
+                await self._spare_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        page, self.spare_page = self.spare_page, None
+        await self._close_page_quietly(page)
+
+    @staticmethod
+    async def _close_page_quietly(page) -> None:
+        if page is None:
+            return
+        try:
+            if not page.is_closed():
+                await page.close()
+        except Exception:
+            pass
+
+    async def enable_stream_correlation(self) -> None:
+        """
+        Yardımcı akış modunda üretim isteklerine sayfanın o anki istek kimliğini başlık olarak ekler.
+        Rota bağlam düzeyinde kurulur; aynı bağlamda açılan yedek sekmeler de kapsanır.
+        Proxy bu başlığı okuyup siler ve yakalanan yanıtları istek kimliğiyle etiketler.
+        """
+        if os.environ.get('STREAM_PORT') == '0' or self.page is None:
+            return
+        context = self.page.context
+        if context is self._stream_route_context:
+            return
+        for url_glob in STREAM_CAPTURE_URL_GLOBS:
+            await context.route(url_glob, self._tag_stream_request)
+        self._stream_route_context = context
+        self.stream_correlation_error = None
+
+    async def _tag_stream_request(self, route) -> None:
+        req_id = self.current_req_id
+        if not req_id:
+            await route.continue_()
+            return
+        headers = await route.request.all_headers()
+        if NO_CAPTURE_HEADER in headers:
+            # Sayfa içi API isteği: yanıtı sayfa okur, proxy yakalamaz
+            await route.continue_()
+            return
+        headers[CORRELATION_HEADER] = req_id
+        await route.continue_(headers=headers)
+
+    def assign(self, request_item: Dict[str, Any]) -> None:
+        """Dağıtıcıdan gelen isteği bu sayfanın worker'ına teslim eder"""
+        self.mark_busy(request_item.get("req_id", "unknown"))
+        self.inbox.put_nowait(request_item)
+
+    def set_current_model(self, model_id: Optional[str]) -> None:
+        """Sayfanın aktif modelini kaydeder; birincil sayfa için global durumu da günceller"""
+        self.current_model_id = model_id
+        if self.is_primary:
+            import server
+            server.current_ai_studio_model_id = model_id
+
+    def to_dict(self) -> Dict[str, Any]:
+        page_closed = True
+        try:
+            page_closed = self.page is None or self.page.is_closed()
+        except Exception:
+            pass
+        return {
+            "slot_id": self.slot_id,
+            "state": self.state,
+            "is_primary": self.is_primary,
+            "browser": self.endpoint.label if self.endpoint else None,
+            "is_ready": self.is_ready and not page_closed,
+            "current_req_id": self.current_req_id,
+            "current_model_id": self.current_model_id,
+            "processed_count": self.processed_count,
+            "idle_seconds": round(time.time() - self.last_active_time, 2) if self.state == "idle" else 0,
+            "worker_running": bool(self.worker_task and not self.worker_task.done()),
+            "readiness_wait_ms": {
+                "last": round(self.readiness_wait_last * 1000, 1) if self.readiness_wait_last is not None else None,
+                "avg": round(self.readiness_wait_total / self.readiness_samples * 1000, 1) if self.readiness_samples else None,
+                "max": round(self.readiness_wait_max * 1000, 1),
+                "samples": self.readiness_samples,
+                "timeouts": self.readiness_timeouts,
+            },
+            "spare_page": {
+                "ready": self.spare_ready,
+                "swaps": self.spare_swaps,
+            } if PAGE_POOL_SPARE_PAGE else None,
+        }
+
+
+class PagePool:
+    """Sayfa havuzu; istekleri sayfalara dağıtır, kuyruk derinliğine göre sayfa ekler veya boşta kalanları kapatır"""
+
+    def __init__(self, min_size: int = PAGE_POOL_MIN_SIZE, max_size: int = PAGE_POOL_MAX_SIZE,
+                 idle_timeout: float = PAGE_POOL_IDLE_TIMEOUT, scale_interval: float = PAGE_POOL_SCALE_INTERVAL):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.idle_timeout = idle_timeout
+        self.scale_interval = scale_interval
+        self.slots: Dict[int, PageSlot] = {}
+        self.endpoints: Dict[int, BrowserEndpoint] = {}
+        self._next_slot_id = 0
+        self._next_endpoint_id = 0
+        self._scaling = False
+        self._supervisor_task: Optional[asyncio.Task] = None
+        self._dispatcher_task: Optional[asyncio.Task] = None
+        self._idle_event: Optional[asyncio.Event] = None
+        self._preswitch_task: Optional[asyncio.Task] = None
+        self._http_tasks: Set[asyncio.Task] = set()
+        self._drop_tasks: Set[asyncio.Task] = set()
+
+    # ------------------------------------------------------------------
+    # Durum bilgileri
+    # ------------------------------------------------------------------
+    @property
+    def size(self) -> int:
+        return len([s for s in self.slots.values() if s.state != "closed"])
+
+    @property
+    def busy_count(self) -> int:
+        return len([s for s in self.slots.values() if s.is_busy])
+
+    @property
+    def idle_count(self) -> int:
+        return len([s for s in self.slots.values() if s.state == "idle"])
+
+    @property
+    def effective_max_size(self) -> int:
+        # Her sağlıklı tarayıcı uç noktası en az bir sayfa tutar
+        return max(self.max_size, len(self.healthy_endpoints()))
+
+    @property
+    def capacity(self) -> int:
+        """Kabul kontrolü için beklenen eşzamanlı işleme kapasitesi (ölçeklenebilecek sayfalar dahil)"""
+        if any(ep.browser is not None for ep in self.healthy_endpoints()):
+            return max(1, self.size, self.effective_max_size)
+        return max(1, self.size)
+
+    def healthy_endpoints(self) -> List[BrowserEndpoint]:
+        return [ep for ep in self.endpoints.values() if ep.healthy]
+
+    def slots_for(self, endpoint: BrowserEndpoint) -> List[PageSlot]:
+        return [s for s in self.slots.values() if s.endpoint is endpoint and s.state != "closed"]
+
+    def is_running(self) -> bool:
+        workers_running = any(s.worker_task and not s.worker_task.done() for s in self.slots.values())
+        return workers_running and bool(self._dispatcher_task and not self._dispatcher_task.done())
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [slot.to_dict() for slot in sorted(self.slots.values(), key=lambda s: s.slot_id)]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "min_size": self.min_size,
+            "max_size": self.effective_max_size,
+            "busy": self.busy_count,
+            "idle": self.idle_count,
+            "http_backend_active": len(self._http_tasks),
+            "browsers": [ep.to_dict(self.slots_for(ep)) for ep in self.endpoints.values()],
+            "pages": self.snapshot(),
+        }
+
+    # ------------------------------------------------------------------
+    # Yaşam döngüsü
+    # ------------------------------------------------------------------
+    async def start(self, primary_page, browser, primary_model_id: Optional[str] = None,
+                    primary_ws_endpoint: Optional[str] = None,
+                    extra_browsers: Optional[List[Tuple[str, Any]]] = None) -> asyncio.Task:
+        """Birincil sayfayı havuza ekler, ek tarayıcılar için sayfa açar ve dağıtıcı/denetleyici görevlerini başlatır"""
+        from server import logger
+
+        self._idle_event = asyncio.Event()
+        primary_endpoint = self._register_endpoint(primary_ws_endpoint, browser, is_primary=True)
+        for ws_endpoint, extra_browser in extra_browsers or []:
+            self._register_endpoint(ws_endpoint, extra_browser)
+
+        primary_slot = self._register_slot(primary_page, primary_endpoint, is_primary=True)
+        primary_slot.current_model_id = primary_model_id
+        primary_slot.is_ready = primary_page is not None
+        self._start_worker(primary_slot)
+
+        # Her ek tarayıcı uç noktası için en az bir sayfa aç
+        for endpoint in list(self.endpoints.values()):
+            if endpoint.is_primary or self.size >= self.effective_max_size:
+                continue
+            await self._add_slot(endpoint)
+
+        while self.size < min(self.min_size, self.effective_max_size):
+            if not await self._add_slot():
+                break
+
+        self._dispatcher_task = asyncio.create_task(self._dispatch_loop())
+        self._supervisor_task = asyncio.create_task(self._autoscale_loop())
+        logger.info(
+            f"[PagePool] Sayfa havuzu başlatıldı: {len(self.endpoints)} tarayıcıda {self.size} sayfa "
+            f"(min={self.min_size}, max={self.effective_max_size})."
+        )
+        return self._supervisor_task
+
+    async def stop(self) -> None:
+        """Tüm worker'ları durdurur ve birincil olmayan sayfaları kapatır"""
+        from server import logger
+
+        for task in (self._dispatcher_task, self._supervisor_task, self._preswitch_task, *self._http_tasks):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+        for slot in list(self.slots.values()):
+            await self._stop_worker(slot)
+            await slot.close_spare()
+            if not slot.is_primary:
+                await self._close_slot_page(slot)
+            slot.state = "closed"
+        logger.info("[PagePool] Sayfa havuzu durduruldu.")
+
+    def _register_endpoint(self, ws_endpoint: Optional[str], browser, is_primary: bool = False) -> BrowserEndpoint:
+        endpoint = BrowserEndpoint(self._next_endpoint_id, ws_endpoint, browser, is_primary=is_primary)
+        self._next_endpoint_id += 1
+        self.endpoints[endpoint.endpoint_id] = endpoint
+        if browser is not None:
+            browser.on("disconnected", lambda _browser: self._on_browser_disconnected(endpoint))
+        return endpoint
+
+    def _register_slot(self, page, endpoint: Optional[BrowserEndpoint], is_primary: bool = False) -> PageSlot:
+        slot = PageSlot(
+            self._next_slot_id, page,
+            browser=endpoint.browser if endpoint else None,
+            is_primary=is_primary,
+            endpoint=endpoint,
+            on_idle=self._notify_idle,
+        )
+        self._next_slot_id += 1
+        self.slots[slot.slot_id] = slot
+        self._notify_idle()
+        return slot
+
+    def _notify_idle(self) -> None:
+        if self._idle_event is not None:
+            self._idle_event.set()
+
+    # ------------------------------------------------------------------
+    # Dağıtım
+    # ------------------------------------------------------------------
+    def _idle_slots(self) -> List[PageSlot]:
+        return [
+            s for s in self.slots.values()
+            if s.state == "idle" and (s.endpoint is None or s.endpoint.healthy)
+        ]
+
+    def _select_slot(self, model_id: Optional[str] = None) -> Optional[PageSlot]:
+        """En az yüklü sağlıklı tarayıcıdaki boşta bir sayfayı seçer; istenen model zaten açık olan sayfalar önceliklidir"""
+        candidates = self._idle_slots()
+        if not candidates:
+            return None
+        if model_id is not None:
+            candidates = [s for s in candidates if s.current_model_id == model_id] or candidates
+
+        def load_key(slot: PageSlot):
+            if slot.endpoint is None:
+                return (0.0, 0, slot.last_active_time)
+            endpoint_slots = self.slots_for(slot.endpoint)
+            busy = len([s for s in endpoint_slots if s.is_busy])
+            return (busy / max(1, len(endpoint_slots)), busy, slot.last_active_time)
+
+        return min(candidates, key=load_key)
+
+    async def _wait_for_slot(self, model_id: Optional[str] = None) -> PageSlot:
+        while True:
+            slot = self._select_slot(model_id)
+            if slot is not None:
+                return slot
+            self._idle_event.clear()
+            await self._idle_event.wait()
+
+    @staticmethod
+    def _http_backend():
+        import server
+        backend = server.http_backend
+        return backend if backend is not None and backend.enabled else None
+
+    def _uses_http_backend(self, request_item: Dict[str, Any]) -> bool:
+        backend = self._http_backend()
+        return backend is not None and backend.handles(request_item.get("request_data"))
+
+    def _http_capacity_free(self) -> bool:
+        backend = self._http_backend()
+        return backend is not None and len(self._http_tasks) < backend.max_connections
+
+    async def wait_for_change(self, timeout: Optional[float] = None) -> None:
+        """Bir sayfa boşa çıkana, bir HTTP isteği bitene, kuyruğa yeni istek gelene veya süre dolana kadar bekler"""
+        import server
+
+        self._idle_event.clear()
+        waiters = [
+            asyncio.create_task(self._idle_event.wait()),
+            asyncio.create_task(server.request_queue.wait_for_put()),
+        ]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def _next_request(self) -> Optional[Dict[str, Any]]:
+        """
+        Şu an başlatılabilecek bir sonraki isteği kuyruktan alır.
+        Boşta sayfa yokken yalnızca HTTP arka ucu istekleri, HTTP bağlantı sınırı doluyken yalnızca
+        sayfa gerektiren istekler çekilir; hiçbiri çekilemiyorsa None döner. Böylece kuyruk derinliği
+        gerçek bekleyen işi gösterir.
+        """
+        import server
+
+        queue = server.request_queue
+        has_idle_slot = bool(self._idle_slots())
+        http_free = self._http_capacity_free()
+        if has_idle_slot and (http_free or self._http_backend() is None):
+            affinity = server.model_affinity
+            if affinity is not None:
+                # Boşta sayfalarda açık olan modeli isteyenler öne alınır; sıradaki istek sınırlı sayıda atlanır
+                return await queue.get(
+                    prefer=affinity.preference(s.current_model_id for s in self._idle_slots()),
+                    max_skips=affinity.max_skips,
+                )
+            return await queue.get()
+        if has_idle_slot:
+            request_item = queue.get_matching_nowait(lambda item: not self._uses_http_backend(item))
+        elif http_free:
+            request_item = queue.get_matching_nowait(self._uses_http_backend)
+        else:
+            request_item = None
+        if request_item is None:
+            await self.wait_for_change()
+        return request_item
+
+    def _start_http_request(self, request_item: Dict[str, Any]) -> None:
+        from .queue_worker import http_backend_worker
+
+        task = asyncio.create_task(http_backend_worker(request_item))
+        self._http_tasks.add(task)
+        task.add_done_callback(self._on_http_request_done)
+
+    def _on_http_request_done(self, task: asyncio.Task) -> None:
+        self._http_tasks.discard(task)
+        self._notify_idle()
+
+    @asynccontextmanager
+    async def borrow_page(self, timeout: float = 30.0) -> AsyncIterator[Optional[Any]]:
+        """
+        HTTP arka ucunun kimlik bilgisi yenilemesi için boşta bir sayfayı dağıtımdan geçici olarak çıkarıp verir.
+        Süre içinde boşta sayfa bulunamazsa None verir.
+        """
+        try:
+            slot = await asyncio.wait_for(self._wait_for_slot(), timeout=timeout)
+        except asyncio.TimeoutError:
+            yield None
+            return
+        slot.state = "lent"
+        try:
+            yield slot.page
+        finally:
+            if slot.state == "lent":
+                slot.state = "idle"
+            self._notify_idle()
+
+    async def _dispatch_loop(self) -> None:
+        """Kuyruktan alınan her isteği en az yüklü tarayıcıdaki boşta bir sayfaya veya HTTP arka ucuna yönlendirir"""
+        import server
+        logger = server.logger
+
+        while True:
+            try:
+                request_item = await self._next_request()
+                if request_item is None:
+                    continue
+                if server.model_affinity is not None:
+                    server.model_affinity.record_dispatch(request_item)
+                if server.request_prefetcher:
+                    # Sayfa sohbeti sıfırlarken istem hazırlığı paralel ilerlesin
+                    server.request_prefetcher.ensure(request_item)
+                    server.request_prefetcher.refill(server.request_queue)
+                if self._uses_http_backend(request_item):
+                    self._start_http_request(request_item)
+                    logger.debug(f"[{request_item.get('req_id', 'unknown')}] (PagePool) HTTP arka ucuna atandı.")
+                    continue
+                slot = await self._wait_for_slot(request_model_key(request_item))
+                slot.assign(request_item)
+                logger.debug(
+                    f"[{request_item.get('req_id', 'unknown')}] (PagePool) Sayfa #{slot.slot_id} "
+                    f"({slot.endpoint.label if slot.endpoint else '-'}) için atandı."
+                )
+            except asyncio.CancelledError:
+                break
+            except Exception as dispatch_err:
+                logger.error(f"[PagePool] Dağıtıcı hatası: {dispatch_err}", exc_info=True)
+                await asyncio.sleep(0.5)
+
+    # ------------------------------------------------------------------
+    # Tarayıcı sağlığı
+    # ------------------------------------------------------------------
+    def _on_browser_disconnected(self, endpoint: BrowserEndpoint) -> None:
+        import server
+
+        if not endpoint.healthy:
+            return
+        endpoint.healthy = False
+        endpoint.disconnected_time = time.time()
+        server.logger.error(f"[PagePool] ❌ {endpoint.label} bağlantısı kesildi; uç nokta rotasyondan çıkarılıyor.")
+        if not self.healthy_endpoints():
+            server.is_browser_connected = False
+        task = asyncio.create_task(self._drop_endpoint(endpoint))
+        self._drop_tasks.add(task)
+        task.add_done_callback(self._on_drop_done)
+
+    def _on_drop_done(self, task: asyncio.Task) -> None:
+        from server import logger
+
+        self._drop_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[PagePool] Kopan tarayıcının sayfaları kaldırılamadı: {task.exception()}")
+
+    async def _drop_endpoint(self, endpoint: BrowserEndpoint) -> None:
+        """Bağlantısı kopan tarayıcıya ait sayfaları ve worker'ları havuzdan çıkarır"""
+        from server import logger
+
+        for slot in self.slots_for(endpoint):
+            slot.is_ready = False
+            slot.state = "closing"
+            await self._stop_worker(slot)
+            await slot.close_spare()
+            slot.page = None
+            slot.state = "closed"
+            self.slots.pop(slot.slot_id, None)
+        logger.info(f"[PagePool] {endpoint.label} sayfaları kaldırıldı (kalan sayfa: {self.size}).")
+
+    def _start_worker(self, slot: PageSlot) -> None:
+        from .queue_worker import queue_worker
+        slot.worker_task = asyncio.create_task(queue_worker(slot))
+        slot.ensure_spare()
+
+    async def _stop_worker(self, slot: PageSlot) -> None:
+        import server
+
+        if slot.worker_task and not slot.worker_task.done():
+            slot.worker_task.cancel()
+            try:
+                await asyncio.wait_for(slot.worker_task, timeout=5.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+
+        # Worker'a atanmış ama henüz alınmamış isteği başka bir sayfa için kuyruğa geri koy
+        while not slot.inbox.empty():
+            request_item = slot.inbox.get_nowait()
+            if server.request_queue is not None:
+                await server.request_queue.put(request_item)
+                server.request_queue.task_done()
+
+    def _least_loaded_endpoint(self) -> Optional[BrowserEndpoint]:
+        candidates = [ep for ep in self.healthy_endpoints() if ep.browser is not None]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda ep: (len(self.slots_for(ep)), ep.endpoint_id))
+
+    async def _add_slot(self, endpoint: Optional[BrowserEndpoint] = None) -> Optional[PageSlot]:
+        """Yeni bir tarayıcı bağlamı/sayfası açar ve worker döngüsünü başlatır"""
+        from server import logger
+        from browser_utils import _initialize_page_logic, _set_model_from_page_display
+
+        endpoint = endpoint or self._least_loaded_endpoint()
+        if endpoint is None or endpoint.browser is None or not endpoint.browser.is_connected():
+            logger.warning("[PagePool] Bağlı tarayıcı yok; yeni sayfa eklenemiyor.")
+            return None
+
+        logger.info(f"[PagePool] {endpoint.label} üzerinde yeni sayfa açılıyor (mevcut boyut: {self.size})...")
+        page, is_ready = await _initialize_page_logic(endpoint.browser, primary=False)
+        if not page or not is_ready:
+            logger.error(f"[PagePool] {endpoint.label} üzerinde yeni sayfa başlatılamadı.")
+            return None
+
+        slot = self._register_slot(page, endpoint)
+        slot.state = "starting"
+        slot.current_model_id = await _set_model_from_page_display(page, f"pool-{slot.slot_id}", persist=False)
+        slot.state = "idle"
+        self._start_worker(slot)
+        self._notify_idle()
+        logger.info(
+            f"[PagePool] ✅ Sayfa #{slot.slot_id} havuza eklendi ({endpoint.label}, model: {slot.current_model_id})."
+        )
+        return slot
+
+    async def _close_slot_page(self, slot: PageSlot) -> None:
+        from server import logger
+
+        await slot.close_spare()
+        page = slot.page
+        slot.page = None
+        slot.is_ready = False
+        if not page:
+            return
+        try:
+            context = page.context
+        except Exception:
+            context = None
+        try:
+            if not page.is_closed():
+                await page.close()
+        except Exception as close_err:
+            logger.warning(f"[PagePool] Sayfa #{slot.slot_id} kapatılırken hata: {close_err}")
+        if context:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def _remove_slot(self, slot: PageSlot) -> None:
+        """Boşta kalan ek bir sayfayı havuzdan çıkarır"""
+        from server import logger
+
+        async with slot.processing_lock:
+            if slot.state != "idle":
+                return
+            slot.state = "closing"
+        await self._stop_worker(slot)
+        await self._close_slot_page(slot)
+        slot.state = "closed"
+        self.slots.pop(slot.slot_id, None)
+        logger.info(f"[PagePool] Sayfa #{slot.slot_id} boşta kaldığı için kapatıldı (yeni boyut: {self.size}).")
+
+    async def _autoscale_loop(self) -> None:
+        """Kuyruk derinliğine göre havuzu büyütür veya küçültür"""
+        from server import logger
+
+        while True:
+            try:
+                await asyncio.sleep(self.scale_interval)
+                await self._autoscale_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as scale_err:
+                logger.error(f"[PagePool] Otomatik ölçekleme hatası: {scale_err}", exc_info=True)
+
+    async def _autoscale_once(self) -> None:
+        import server
+
+        request_queue = server.request_queue
+        queue_depth = request_queue.qsize() if request_queue else 0
+
+        # Ölçek büyütme: bekleyen iş, boşta olan sayfalardan fazlaysa
+        if queue_depth > self.idle_count and self.size < self.effective_max_size and not self._scaling:
+            self._scaling = True
+            try:
+                await self._add_slot()
+            finally:
+                self._scaling = False
+            return
+
+        # Ölçek küçültme: kuyruk boşken uzun süre boşta kalan ek sayfaları kapat
+        if queue_depth == 0 and self.size > self.min_size:
+            now = time.time()
+            for slot in sorted(self.slots.values(), key=lambda s: s.last_active_time):
+                if slot.is_primary or slot.state != "idle":
+                    continue
+                if slot.endpoint and len(self.slots_for(slot.endpoint)) <= 1:
+                    continue  # her tarayıcı uç noktası en az bir sayfa tutar
+                if now - slot.last_active_time >= self.idle_timeout:
+                    await self._remove_slot(slot)
+                    break
+
+        if queue_depth == 0 and not (self._preswitch_task and not self._preswitch_task.done()):
+            slot, model_id = self._preswitch_candidate()
+            if slot is not None:
+                self._preswitch_task = asyncio.create_task(self._preswitch(slot, model_id))
+
+    # ------------------------------------------------------------------
+    # Boşta model ön geçişi
+    # ------------------------------------------------------------------
+    def _preswitch_candidate(self) -> Tuple[Optional[PageSlot], Optional[str]]:
+        """Tahmin edilen sonraki model hiçbir sayfada açık değilse en uzun süre boşta kalan sayfayı seçer"""
+        import server
+
+        affinity = server.model_affinity
+        if affinity is None or not affinity.preswitch_enabled:
+            return None, None
+        model_id = affinity.predict_next_model()
+        if model_id is None:
+            return None, None
+        live_slots = [s for s in self.slots.values() if s.state not in ("closing", "closed")]
+        if any(s.current_model_id == model_id for s in live_slots):
+            return None, None
+        now = time.time()
+        candidates = [
+            s for s in self._idle_slots()
+            if s.is_ready and s.page is not None and now - s.last_active_time >= affinity.preswitch_idle_seconds
+        ]
+        if not candidates:
+            return None, None
+        return min(candidates, key=lambda s: s.last_active_time), model_id
+
+    async def _preswitch(self, slot: PageSlot, model_id: str) -> None:
+        """Sayfayı dağıtımdan geçici olarak çıkarıp tahmin edilen modele geçirir"""
+        import server
+        from browser_utils import switch_ai_studio_model
+
+        logger = server.logger
+        slot.state = "preswitching"
+        success = False
+        try:
+            async with slot.model_switching_lock:
+                if slot.current_model_id != model_id:
+                    logger.info(f"[PagePool] Sayfa #{slot.slot_id} boşta; tahmin edilen modele önceden geçiliyor: {slot.current_model_id} -> {model_id}")
+                    success = await switch_ai_studio_model(slot.page, model_id, f"preswitch-{slot.slot_id}")
+                    if success:
+                        slot.set_current_model(model_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as switch_err:
+            logger.warning(f"[PagePool] Sayfa #{slot.slot_id} ön model geçişi başarısız: {switch_err}")
+        finally:
+            server.model_affinity.record_preswitch(success)
+            if slot.state == "preswitching":
+                slot.state = "idle"
+            self._notify_idle()
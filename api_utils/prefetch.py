@@ -0,0 +1,148 @@
+"""
+İstek ön hazırlık (prefetch) modülü
+Sayfa gerektirmeyen işleri (mesaj doğrulama, birleşik istem oluşturma, base64 görsel
+çözme + md5, model kimliği doğrulama) kuyruktaki sıradaki K istek için önceden ve
+olay döngüsünü bloklamadan ayrı bir iş parçacığında yapar. Böylece sayfa kilidini
+tutan worker yalnızca tarayıcı G/Ç'si ile meşgul olur.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from config import MODEL_NAME, PREFETCH_DEPTH
+from .utils import validate_chat_request, prepare_combined_prompt
+
+logger = logging.getLogger("AIStudioProxyServer")
+
+
+class PreparedRequest:
+    """Sayfadan bağımsız hazırlık sonucunun taşıyıcısı"""
+
+    def __init__(self):
+        self.prompt: Optional[str] = None
+        self.images: List[str] = []
+        self.model_id: Optional[str] = None
+        self.model_error: Optional[HTTPException] = None
+        self.validation_error: Optional[HTTPException] = None
+        self.prepare_seconds = 0.0
+
+
+def resolve_model_id(req_id: str, requested_model: Optional[str],
+                     parsed_model_list: List[Dict[str, Any]]) -> Optional[str]:
+    """İstenen model kimliğini döndürür; model listede yoksa 400 fırlatır"""
+    if not requested_model or requested_model == MODEL_NAME:
+        return None
+    requested_model_id = requested_model.split('/')[-1]
+    if parsed_model_list:
+        valid_model_ids = [m.get("id") for m in parsed_model_list]
+        if requested_model_id not in valid_model_ids:
+            raise HTTPException(
+                status_code=400,
+                detail=f"[{req_id}] Invalid model '{requested_model_id}'. Available models: {', '.join(valid_model_ids)}"
+            )
+    return requested_model_id
+
+
+def prepare_request(req_id: str, request_data: Any, parsed_model_list: List[Dict[str, Any]]) -> PreparedRequest:
+    """Eşzamanlı hazırlık adımı; iş parçacığında çalıştırılır. Hatalar orijinal noktalarında yeniden fırlatılmak üzere saklanır"""
+    started = time.perf_counter()
+    prepared = PreparedRequest()
+    try:
+        prepared.model_id = resolve_model_id(req_id, request_data.model, parsed_model_list)
+    except HTTPException as model_err:
+        prepared.model_error = model_err
+    try:
+        validate_chat_request(request_data.messages, req_id)
+    except ValueError as e:
+        prepared.validation_error = HTTPException(status_code=400, detail=f"[{req_id}] Geçersiz istek: {e}")
+    else:
+        prepared.prompt, prepared.images = prepare_combined_prompt(request_data.messages, req_id)
+    prepared.prepare_seconds = time.perf_counter() - started
+    return prepared
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    # Alınmadan bırakılan görevlerin hataları "Task exception was never retrieved" uyarısı üretmesin
+    if not task.cancelled():
+        task.exception()
+
+
+def discard_prepared(request_item: Optional[Dict[str, Any]]) -> None:
+    """İptal edilen veya düşürülen isteğin henüz alınmamış hazırlık görevini iptal eder"""
+    task = request_item.pop("prepared_task", None) if request_item else None
+    if task is not None and not task.done():
+        task.cancel()
+
+
+class RequestPrefetcher:
+    """Kuyruğun başındaki K isteği arka planda hazırlar"""
+
+    def __init__(self, depth: int = PREFETCH_DEPTH):
+        self.depth = max(0, depth)
+        self.prepared_count = 0
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.depth > 0
+
+    def ensure(self, request_item: Dict[str, Any]) -> None:
+        """
+        İstek için hazırlık görevi yoksa başlatır. İstemci bağlantısı koparsa veya son tarih dolarsa
+        henüz alınmamış görev iptal edilir.
+        """
+        if not self.enabled or request_item.get("prepared_task") is not None or request_item.get("cancelled"):
+            return
+        task = asyncio.create_task(self._prepare(request_item))
+        task.add_done_callback(_consume_result)
+        request_item["prepared_task"] = task
+        watcher = request_item.get("disconnect_watcher")
+        if watcher is not None:
+            watcher.add_callback(lambda: discard_prepared(request_item))
+
+    def refill(self, queue) -> None:
+        """Kuyruktaki ilk K canlı istek için hazırlık görevlerini başlatır"""
+        if not self.enabled or queue is None or queue.empty():
+            return
+        for request_item in itertools.islice(queue.iter_oldest(), self.depth):
+            self.ensure(request_item)
+
+    async def take(self, request_item: Dict[str, Any]) -> Optional[PreparedRequest]:
+        """Hazır sonucu döndürür; hazırlık başlatılmamışsa None (worker satır içi hazırlar)"""
+        task = request_item.pop("prepared_task", None)
+        if task is None:
+            if self.enabled:
+                self.miss_count += 1
+            return None
+        try:
+            prepared = await task
+        except Exception as prep_err:
+            logger.warning(f"[{request_item.get('req_id')}] Ön hazırlık başarısız, satır içi hazırlanacak: {prep_err}")
+            return None
+        self.hit_count += 1
+        return prepared
+
+    async def _prepare(self, request_item: Dict[str, Any]) -> PreparedRequest:
+        import server
+
+        req_id = request_item.get("req_id")
+        prepared = await asyncio.to_thread(
+            prepare_request, req_id, request_item["request_data"], list(server.parsed_model_list or [])
+        )
+        self.prepared_count += 1
+        logger.debug(f"[{req_id}] (Prefetch) İstek {prepared.prepare_seconds * 1000:.1f} ms'de önceden hazırlandı.")
+        return prepared
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "prepared": self.prepared_count,
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+        }
@@ -7,28 +7,33 @@ import asyncio
 import time
 from fastapi import HTTPException
 
+from .disconnect import ClientDisconnectWatcher
+from .prefetch import discard_prepared
 
 
-async def queue_worker():
-    """Kuyruk işçisi, istek kuyruğundaki görevleri işler"""
+def _record_expired(disconnect_watcher, stage: str) -> None:
+    """Son tarihi dolduğu için durdurulan isteği kuyruk istatistiklerine ekler"""
+    import server
+    if disconnect_watcher.deadline_exceeded and server.deadline_stats:
+        server.deadline_stats.record(stage)
+
+
+
+async def queue_worker(page_slot):
+    """Kuyruk işçisi, istek kuyruğundaki görevleri verilen havuz sayfasında işler"""
     # Global değişkenleri içe aktar
     from server import (
-        logger, request_queue, processing_lock, model_switching_lock, 
+        logger, request_queue, model_switching_lock, 
         params_cache_lock
     )
     
-    logger.info("--- Kuyruk Worker başlatıldı ---")
+    logger.info(f"--- Kuyruk Worker başlatıldı (sayfa #{page_slot.slot_id}) ---")
     
     # Global değişkenleri kontrol et ve başlat
     if request_queue is None:
         logger.info("request_queue başlatılıyor...")
-        from asyncio import Queue
-        request_queue = Queue()
-    
-    if processing_lock is None:
-        logger.info("processing_lock başlatılıyor...")
-        from asyncio import Lock
-        processing_lock = Lock()
+        from api_utils.fair_queue import FairRequestQueue
+        request_queue = FairRequestQueue()
     
     if model_switching_lock is None:
         logger.info("model_switching_lock başlatılıyor...")
@@ -40,58 +45,32 @@ async def queue_worker():
         from asyncio import Lock
         params_cache_lock = Lock()
     
-    was_last_request_streaming = False
     last_request_completion_time = 0
     
+    import server
+
+    try:
+        await page_slot.enable_stream_correlation()
+    except Exception as route_err:
+        # Etiketsiz kareler birden fazla üretim varken isteğe bağlanamaz; bu sayfa yanıtı sayfadan okur
+        page_slot.stream_correlation_error = str(route_err) or type(route_err).__name__
+        logger.error(f"Sayfa #{page_slot.slot_id} için akış ilişkilendirme rotası kurulamadı: {route_err}; "
+                     f"bu sayfanın yanıtları yardımcı akış yerine sayfa üzerinden alınacak.")
+
     while True:
         request_item = None
         result_future = None
         req_id = "UNKNOWN"
         completion_event = None
+        service_started = False
+        record_service_time = False
+        requeued = False
         
         try:
-            # 检查队列中的项目，清理已断开连接的请求
-            queue_size = request_queue.qsize()
-            if queue_size > 0:
-                checked_count = 0
-                items_to_requeue = []
-                processed_ids = set()
-                
-                while checked_count < queue_size and checked_count < 10:
-                    try:
-                        item = request_queue.get_nowait()
-                        item_req_id = item.get("req_id", "unknown")
-                        
-                        if item_req_id in processed_ids:
-                            items_to_requeue.append(item)
-                            continue
-                            
-                        processed_ids.add(item_req_id)
-                        
-                        if not item.get("cancelled", False):
-                            item_http_request = item.get("http_request")
-                            if item_http_request:
-                                try:
-                                    if await item_http_request.is_disconnected():
-                                        logger.info(f"[{item_req_id}] (Worker Queue Check) İstemci bağlantısı kesildi, istek iptal ediliyor.")
-                                        item["cancelled"] = True
-                                        item_future = item.get("result_future")
-                                        if item_future and not item_future.done():
-                                            item_future.set_exception(HTTPException(status_code=499, detail=f"[{item_req_id}] Client disconnected while queued."))
-                                except Exception as check_err:
-                                    logger.error(f"[{item_req_id}] (Worker Queue Check) Error checking disconnect: {check_err}")
-                        
-                        items_to_requeue.append(item)
-                        checked_count += 1
-                    except asyncio.QueueEmpty:
-                        break
-                
-                for item in items_to_requeue:
-                    await request_queue.put(item)
-            
-            # 获取下一个请求
+            # 获取分发器分配给本页面的下一个请求
+            # 排队中断开的请求由各自的 ClientDisconnectWatcher 直接标记为已取消，无需轮询队列
             try:
-                request_item = await asyncio.wait_for(request_queue.get(), timeout=5.0)
+                request_item = await asyncio.wait_for(page_slot.inbox.get(), timeout=5.0)
             except asyncio.TimeoutError:
                 # 如果5秒内没有新请求，继续循环检查
                 continue
@@ -100,84 +79,108 @@ async def queue_worker():
             request_data = request_item["request_data"]
             http_request = request_item["http_request"]
             result_future = request_item["result_future"]
+            disconnect_watcher = request_item.get("disconnect_watcher") or ClientDisconnectWatcher(req_id, None)
 
+            # task_done() 统一在 finally 中调用
             if request_item.get("cancelled", False):
                 logger.info(f"[{req_id}] (Worker) İstek iptal edilmiş, atlanıyor.")
+                discard_prepared(request_item)
                 if not result_future.done():
                     result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstek kullanıcı tarafından iptal edildi"))
-                request_queue.task_done()
                 continue
 
+            request_queue.mark_processing(req_id, page_slot_id=page_slot.slot_id)
             is_streaming_request = request_data.stream
             logger.info(f"[{req_id}] (Worker) İstek kuyruğundan alındı. Mod: {'akış' if is_streaming_request else 'akış dışı'}")
 
-            # 优化：在开始处理前主动检测客户端连接状态，避免不必要的处理
-            from api_utils.request_processor import _test_client_connection
-            is_connected = await _test_client_connection(req_id, http_request)
-            if not is_connected:
+            if disconnect_watcher.disconnected:
                 logger.info(f"[{req_id}] (Worker) ✅ İstemci bağlantısı kesildi; işlem atlanıyor")
+                _record_expired(disconnect_watcher, "dispatched")
                 if not result_future.done():
-                    result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstemci işlem başlamadan bağlantıyı kesti"))
-                request_queue.task_done()
+                    result_future.set_exception(disconnect_watcher.error(f"[{req_id}] İstemci işlem başlamadan bağlantıyı kesti"))
                 continue
             
-            # 流式请求间隔控制
-            current_time = time.time()
-            if was_last_request_streaming and is_streaming_request and (current_time - last_request_completion_time < 1.0):
-                delay_time = max(0.5, 1.0 - (current_time - last_request_completion_time))
-                logger.info(f"[{req_id}] (Worker) Ardışık akış isteği, {delay_time:.2f}s gecikme ekleniyor...")
-                await asyncio.sleep(delay_time)
+            # 请求间节奏控制：等待页面真正就绪（无加载动画、输入框为空且可用），而不是固定休眠
+            if last_request_completion_time and page_slot.page and page_slot.is_ready:
+                from browser_utils.page_controller import PageController
+                readiness_wait = await PageController(page_slot.page, logger, req_id).wait_until_ready()
+                page_slot.record_readiness(readiness_wait)
+                if readiness_wait is not None:
+                    since_last = time.time() - last_request_completion_time
+                    logger.info(
+                        f"[{req_id}] (Worker) Sayfa #{page_slot.slot_id} hazır: bekleme {readiness_wait * 1000:.0f} ms "
+                        f"(önceki istekten bu yana {since_last:.2f}s)."
+                    )
             
-            # 等待锁前再次主动检测客户端连接
-            is_connected = await _test_client_connection(req_id, http_request)
-            if not is_connected:
+            if disconnect_watcher.disconnected:
                 logger.info(f"[{req_id}] (Worker) ✅ Kilit beklenirken istemci bağlantısı kesildi, işlem iptal ediliyor")
+                _record_expired(disconnect_watcher, "dispatched")
                 if not result_future.done():
-                    result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstemci isteği kapattı"))
-                request_queue.task_done()
+                    result_future.set_exception(disconnect_watcher.error(f"[{req_id}] İstemci isteği kapattı"))
                 continue
             
-            logger.info(f"[{req_id}] (Worker) İşleme kilidi bekleniyor...")
-            async with processing_lock:
-                logger.info(f"[{req_id}] (Worker) İşleme kilidi alındı, çekirdek işlem başlatılıyor...")
+            logger.info(f"[{req_id}] (Worker) Sayfa #{page_slot.slot_id} işleme kilidi bekleniyor...")
+            async with page_slot.processing_lock:
+                if page_slot.state in ("closing", "closed"):
+                    # Sayfa havuzdan çıkarılıyor; isteği başka bir sayfa için kuyruğa geri koy
+                    logger.info(f"[{req_id}] (Worker) Sayfa #{page_slot.slot_id} kapatılıyor, istek kuyruğa geri konuyor.")
+                    await request_queue.put(request_item)
+                    requeued = True
+                    break
+                page_slot.mark_busy(req_id)
+                if server.admission_controller:
+                    server.admission_controller.begin(req_id, request_data, fallback_model=page_slot.current_model_id)
+                    service_started = True
+                logger.info(f"[{req_id}] (Worker) Sayfa #{page_slot.slot_id} işleme kilidi alındı, çekirdek işlem başlatılıyor...")
                 completion_event = None
                 submit_btn_loc = None
                 client_disco_checker = None
-                disconnect_monitor_task = None
+                disconnect_callback = None
                 client_disconnected_early = False
                 current_request_was_streaming = False
                 
-                # 获取锁后最终主动检测客户端连接
-                is_connected = await _test_client_connection(req_id, http_request)
-                if not is_connected:
+                # 获取锁后最终检测客户端连接
+                if disconnect_watcher.disconnected:
                     logger.info(f"[{req_id}] (Worker) ✅ Kilit alındıktan sonra istemci bağlantısı kesildi, işlem iptal ediliyor")
+                    _record_expired(disconnect_watcher, "dispatched")
                     if not result_future.done():
-                        result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstemci isteği kapattı"))
+                        result_future.set_exception(disconnect_watcher.error(f"[{req_id}] İstemci isteği kapattı"))
                 elif result_future.done():
                     logger.info(f"[{req_id}] (Worker) Future işlem öncesinde tamamlanmış veya iptal edilmiş; atlanıyor.")
                 else:
-                    # Her yeni istekte sohbeti sıfırla
+                    # Her yeni istekte sohbeti sıfırla; önceden sıfırlanmış (veya yedek) sekme varsa tıklama beklenmez
                     try:
-                        from server import page_instance, is_page_ready
-                        if page_instance and is_page_ready:
+                        if page_slot.page_fresh:
+                            logger.info(f"[{req_id}] (Worker) Sayfa #{page_slot.slot_id} zaten sıfırlanmış; istek öncesi temizlik atlandı.")
+                        elif page_slot.swap_to_spare():
+                            logger.info(f"[{req_id}] (Worker) ✅ Sayfa #{page_slot.slot_id} önceden sıfırlanmış yedek sekmeye geçti.")
+                        elif page_slot.page and page_slot.is_ready:
                             from browser_utils.page_controller import PageController
 
                             def noop_disconnect_checker(stage: str = "") -> bool:
                                 return False
 
-                            page_controller = PageController(page_instance, logger, req_id)
+                            page_controller = PageController(page_slot.page, logger, req_id)
                             await page_controller.clear_chat_history(noop_disconnect_checker)
                             logger.info(f"[{req_id}] (Worker) ✅ İstek öncesi sohbet geçmişi sıfırlandı.")
                         else:
-                            logger.warning(f"[{req_id}] (Worker) Sohbet sıfırlanamadı; sayfa hazır değil (page_ready={is_page_ready}).")
+                            logger.warning(f"[{req_id}] (Worker) Sohbet sıfırlanamadı; sayfa hazır değil (page_ready={page_slot.is_ready}).")
                     except Exception as pre_clear_err:
                         logger.error(f"[{req_id}] (Worker) İstek öncesi sohbet temizlenirken hata: {pre_clear_err}", exc_info=True)
+
+                    page_slot.page_fresh = False
 
                     # 调用实际的请求处理函数
                     try:
                         from api_utils import _process_request_refactored
+                        # 分发时已在后台线程中开始的预处理结果（校验、提示拼接、图片解码）
+                        prepared = await server.request_prefetcher.take(request_item) if server.request_prefetcher else None
+                        if server.STREAM_CHANNEL:
+                            # Gönderimden önce isteğe özel akış kanalı açılır; proxy'nin bu istek kimliğiyle etiketlediği kareler buraya yönlenir
+                            server.STREAM_CHANNEL.open(req_id)
                         returned_value = await _process_request_refactored(
-                            req_id, request_data, http_request, result_future
+                            req_id, request_data, http_request, result_future, page_slot=page_slot,
+                            disconnect_watcher=disconnect_watcher, prepared=prepared
                         )
                         
                         if isinstance(returned_value, tuple) and len(returned_value) == 3:
@@ -195,60 +198,35 @@ async def queue_worker():
                             current_request_was_streaming = False
                             logger.warning(f"[{req_id}] (Worker) _process_request_refactored returned unexpected type: {type(returned_value)}")
 
-                        # 统一的客户端断开检测和响应处理
+                        # 统一的客户端断开检测：在共享的断开事件上注册回调，无需轮询
                         if completion_event:
                             # 流式模式：等待流式生成器完成信号
                             logger.info(f"[{req_id}] (Worker) Akış üreticisinden tamamlanma sinyali bekleniyor...")
 
-                            # 创建一个增强的客户端断开检测器，支持提前done信号触发
-                            client_disconnected_early = False
-
-                            async def enhanced_disconnect_monitor():
+                            def on_stream_disconnect():
                                 nonlocal client_disconnected_early
-                                while not completion_event.is_set():
-                                    try:
-                                        # İstemci bağlantısını proaktif olarak kontrol et
-                                        is_connected = await _test_client_connection(req_id, http_request)
-                                        if not is_connected:
-                                            logger.info(f"[{req_id}] (Worker) ✅ Akış sırasında istemci bağlantısı kesildi, done sinyali erken tetiklendi")
-                                            client_disconnected_early = True
-                                            # Beklemeyi sonlandırmak için completion_event'i hemen ayarla
-                                            if not completion_event.is_set():
-                                                completion_event.set()
-                                            break
-                                        await asyncio.sleep(0.3)  # Daha sık kontrol aralığı
-                                    except Exception as e:
-                                        logger.error(f"[{req_id}] (Worker) Gelişmiş bağlantı kesilme denetleyicisinde hata: {e}")
-                                        break
-
-                            # 启动增强的断开连接监控
-                            disconnect_monitor_task = asyncio.create_task(enhanced_disconnect_monitor())
+                                if completion_event.is_set():
+                                    return
+                                logger.info(f"[{req_id}] (Worker) ✅ Akış sırasında istemci bağlantısı kesildi, done sinyali erken tetiklendi")
+                                client_disconnected_early = True
+                                completion_event.set()
+
+                            disconnect_callback = on_stream_disconnect
                         else:
                             # 非流式模式：等待处理完成并检测客户端断开
                             logger.info(f"[{req_id}] (Worker) Akış dışı modda işlem tamamlanması bekleniyor...")
 
-                            client_disconnected_early = False
-
-                            async def non_streaming_disconnect_monitor():
+                            def on_non_stream_disconnect():
                                 nonlocal client_disconnected_early
-                                while not result_future.done():
-                                    try:
-                                        # İstemci bağlantısını proaktif olarak kontrol et
-                                        is_connected = await _test_client_connection(req_id, http_request)
-                                        if not is_connected:
-                                            logger.info(f"[{req_id}] (Worker) ✅ Akış dışı işlem sırasında istemci bağlantısı kesildi, işlem iptal ediliyor")
-                                            client_disconnected_early = True
-                                            # result_future'ı iptal et
-                                            if not result_future.done():
-                                                result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstemci akış dışı işlem sırasında bağlantıyı kesti"))
-                                            break
-                                        await asyncio.sleep(0.3)  # Daha sık kontrol aralığı
-                                    except Exception as e:
-                                        logger.error(f"[{req_id}] (Worker) Akış dışı bağlantı denetleyicisinde hata: {e}")
-                                        break
-
-                            # 启动非流式断开连接监控
-                            disconnect_monitor_task = asyncio.create_task(non_streaming_disconnect_monitor())
+                                if result_future.done():
+                                    return
+                                logger.info(f"[{req_id}] (Worker) ✅ Akış dışı işlem sırasında istemci bağlantısı kesildi, işlem iptal ediliyor")
+                                client_disconnected_early = True
+                                result_future.set_exception(disconnect_watcher.error(f"[{req_id}] İstemci akış dışı işlem sırasında bağlantıyı kesti"))
+
+                            disconnect_callback = on_non_stream_disconnect
+
+                        disconnect_watcher.add_callback(disconnect_callback)
 
                         # 等待处理完成（流式或非流式）
                         try:
@@ -263,6 +241,9 @@ async def queue_worker():
                                 await asyncio.wait_for(asyncio.shield(result_future), timeout=RESPONSE_COMPLETION_TIMEOUT/1000 + 60)
                                 logger.info(f"[{req_id}] (Worker) ✅ Akış dışı işlem tamamlandı. İstemci erken koptu mu: {client_disconnected_early}")
 
+                            # Yalnızca tamamlanan istekler hizmet süresi tahminine katkı sağlar
+                            record_service_time = not client_disconnected_early
+
                             # 如果客户端提前断开，跳过按钮状态处理
                             if client_disconnected_early:
                                 logger.info(f"[{req_id}] (Worker) İstemci erken koptu, buton durumu işlemesi atlandı")
@@ -317,46 +298,51 @@ async def queue_worker():
                             if not result_future.done():
                                 result_future.set_exception(HTTPException(status_code=500, detail=f"[{req_id}] Error waiting for completion: {ev_wait_err}"))
                         finally:
-                            # 清理断开连接监控任务
-                            if disconnect_monitor_task and not disconnect_monitor_task.done():
-                                disconnect_monitor_task.cancel()
-                                try:
-                                    await disconnect_monitor_task
-                                except asyncio.CancelledError:
-                                    pass
+                            disconnect_watcher.remove_callback(disconnect_callback)
+                            _record_expired(disconnect_watcher, "in_flight")
+                            # 响应已结束；之后收到的 http.disconnect 属于正常关闭，不再视为断开
+                            disconnect_watcher.close()
 
                     except Exception as process_err:
                         logger.error(f"[{req_id}] (Worker) _process_request_refactored execution error: {process_err}")
                         if not result_future.done():
                             result_future.set_exception(HTTPException(status_code=500, detail=f"[{req_id}] Request processing error: {process_err}"))
             
-            logger.info(f"[{req_id}] (Worker) İşleme kilidi serbest bırakılıyor.")
+            logger.info(f"[{req_id}] (Worker) Sayfa #{page_slot.slot_id} işleme kilidi serbest bırakılıyor.")
 
             # Kilidi bıraktıktan sonra temizleme işlemlerini hemen gerçekleştir
             try:
-                # Akış kuyruğu önbelleğini temizle
+                # İsteğin akış kanalını kapat; geç gelen kareler artık atılır
                 from api_utils import clear_stream_queue
-                await clear_stream_queue()
+                if disconnect_watcher.deadline_exceeded:
+                    await clear_stream_queue(req_id, error="deadline_exceeded")
+                elif disconnect_watcher.disconnected:
+                    await clear_stream_queue(req_id, error="client_disconnected")
+                else:
+                    await clear_stream_queue(req_id)
 
                 # Akış ve akış dışı tüm modlar için sohbet geçmişini temizle
                 if submit_btn_loc and client_disco_checker:
-                    from server import page_instance, is_page_ready
-                    if page_instance and is_page_ready:
+                    if page_slot.swap_to_spare():
+                        # Kullanılan sekme arka planda sıfırlanıp bir sonraki takas için yedek olur
+                        logger.info(f"[{req_id}] (Worker) ✅ Yedek sekmeye geçildi; kullanılan sekme arka planda sıfırlanıyor.")
+                    elif page_slot.page and page_slot.is_ready:
                         from browser_utils.page_controller import PageController
-                        page_controller = PageController(page_instance, logger, req_id)
+                        page_controller = PageController(page_slot.page, logger, req_id)
                         logger.info(f"[{req_id}] (Worker) Sohbet geçmişi temizleniyor ({'akış' if completion_event else 'akış dışı'} mod)...")
-                        await page_controller.clear_chat_history(client_disco_checker)
+                        # Yanıt tamamlandı; istemci bağlantısı artık temizliği durdurmamalı
+                        page_slot.page_fresh = await page_controller.clear_chat_history(lambda stage="": False)
                         logger.info(f"[{req_id}] (Worker) ✅ Sohbet geçmişi temizlendi.")
                 else:
                     logger.info(f"[{req_id}] (Worker) Sohbet geçmişi temizliği atlandı; gerekli parametreler eksik (submit_btn_loc: {bool(submit_btn_loc)}, client_disco_checker: {bool(client_disco_checker)})")
             except Exception as clear_err:
                 logger.error(f"[{req_id}] (Worker) Temizleme işlemi sırasında hata oluştu: {clear_err}", exc_info=True)
 
-            was_last_request_streaming = is_streaming_request
+            page_slot.ensure_spare()
             last_request_completion_time = time.time()
             
         except asyncio.CancelledError:
-            logger.info("--- Kuyruk işçisi iptal edildi ---")
+            logger.info(f"--- Kuyruk işçisi iptal edildi (sayfa #{page_slot.slot_id}) ---")
             if result_future and not result_future.done():
                 result_future.cancel("Worker cancelled")
             break
@@ -365,7 +351,102 @@ async def queue_worker():
             if result_future and not result_future.done():
                 result_future.set_exception(HTTPException(status_code=500, detail=f"[{req_id}] Sunucu iç hatası: {e}"))
         finally:
+            if request_item and request_item.get("disconnect_watcher"):
+                request_item["disconnect_watcher"].close()
+            if service_started and server.admission_controller:
+                # Sohbet temizliği de sayfayı meşgul tuttuğu için ölçüme dahildir
+                server.admission_controller.finish(
+                    req_id, request_item["request_data"], record_service_time, fallback_model=page_slot.current_model_id
+                )
+            page_slot.mark_idle()
             if request_item:
+                if not requeued:
+                    request_queue.complete(req_id)
                 request_queue.task_done()
     
-    logger.info("--- Kuyruk işçisi durduruldu ---") 
+    logger.info(f"--- Kuyruk işçisi durduruldu (sayfa #{page_slot.slot_id}) ---") 
+
+
+async def http_backend_worker(request_item):
+    """HTTP arka ucunun işlediği isteği sayfa tutmadan işler; dağıtıcı tarafından ayrı bir görevde başlatılır"""
+    from server import logger, request_queue, RESPONSE_COMPLETION_TIMEOUT
+    import server
+
+    req_id = request_item["req_id"]
+    request_data = request_item["request_data"]
+    result_future = request_item["result_future"]
+    disconnect_watcher = request_item.get("disconnect_watcher") or ClientDisconnectWatcher(req_id, None)
+    service_started = False
+    record_service_time = False
+    client_disconnected_early = False
+    completion_event = None
+
+    def on_http_disconnect():
+        nonlocal client_disconnected_early
+        if completion_event is not None and not completion_event.is_set():
+            client_disconnected_early = True
+            completion_event.set()
+        elif completion_event is None and not result_future.done():
+            client_disconnected_early = True
+            result_future.set_exception(disconnect_watcher.error(f"[{req_id}] İstemci akış dışı işlem sırasında bağlantıyı kesti"))
+
+    try:
+        if request_item.get("cancelled", False):
+            logger.info(f"[{req_id}] (HTTP Worker) İstek iptal edilmiş, atlanıyor.")
+            discard_prepared(request_item)
+            if not result_future.done():
+                result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstek kullanıcı tarafından iptal edildi"))
+            return
+        request_queue.mark_processing(req_id, backend="http")
+        if disconnect_watcher.disconnected:
+            logger.info(f"[{req_id}] (HTTP Worker) ✅ İstemci bağlantısı kesildi; işlem atlanıyor")
+            _record_expired(disconnect_watcher, "dispatched")
+            if not result_future.done():
+                result_future.set_exception(disconnect_watcher.error(f"[{req_id}] İstemci işlem başlamadan bağlantıyı kesti"))
+            return
+        if server.admission_controller:
+            server.admission_controller.begin(req_id, request_data)
+            service_started = True
+        logger.info(f"[{req_id}] (HTTP Worker) İstek HTTP arka ucuyla işleniyor; sayfa tutulmuyor.")
+
+        from api_utils import _process_request_refactored
+        prepared = await server.request_prefetcher.take(request_item) if server.request_prefetcher else None
+        returned_value = await _process_request_refactored(
+            req_id, request_data, request_item["http_request"], result_future,
+            disconnect_watcher=disconnect_watcher, prepared=prepared
+        )
+        if isinstance(returned_value, tuple) and len(returned_value) == 3:
+            completion_event = returned_value[0]
+
+        disconnect_watcher.add_callback(on_http_disconnect)
+        try:
+            timeout = RESPONSE_COMPLETION_TIMEOUT / 1000 + 60
+            if completion_event:
+                await asyncio.wait_for(completion_event.wait(), timeout=timeout)
+            else:
+                await asyncio.wait_for(asyncio.shield(result_future), timeout=timeout)
+            record_service_time = not client_disconnected_early
+        except asyncio.TimeoutError:
+            logger.warning(f"[{req_id}] (HTTP Worker) ⚠️ İşlemin tamamlanması beklenirken zaman aşımı oluştu.")
+            if not result_future.done():
+                result_future.set_exception(HTTPException(status_code=504, detail=f"[{req_id}] Processing timed out waiting for completion."))
+        except Exception:
+            # Hata result_future üzerinden istemciye zaten iletildi
+            pass
+        finally:
+            disconnect_watcher.remove_callback(on_http_disconnect)
+            _record_expired(disconnect_watcher, "in_flight")
+    except asyncio.CancelledError:
+        if not result_future.done():
+            result_future.cancel("Worker cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"[{req_id}] (HTTP Worker) ❌ İstek işlenirken beklenmeyen hata: {e}", exc_info=True)
+        if not result_future.done():
+            result_future.set_exception(HTTPException(status_code=500, detail=f"[{req_id}] Sunucu iç hatası: {e}"))
+    finally:
+        disconnect_watcher.close()
+        if service_started and server.admission_controller:
+            server.admission_controller.finish(req_id, request_data, record_service_time)
+        request_queue.complete(req_id)
+        request_queue.task_done()
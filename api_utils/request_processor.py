@@ -8,6 +8,7 @@ import json
 import os
 import random
 import time
+from contextlib import asynccontextmanager
 from typing import Optional, Tuple, Callable, AsyncGenerator
 from asyncio import Event, Future
 
@@ -33,24 +34,35 @@ from .utils import (
     prepare_combined_prompt,
     generate_sse_chunk,
     generate_sse_stop_chunk,
+    generate_sse_error_chunk,
     use_stream_response,
-    calculate_usage_stats
+    calculate_usage_stats,
+    StreamDeltaAssembler
 )
-from browser_utils.page_controller import PageController
+from .disconnect import ClientDisconnectWatcher
+from .prefetch import PreparedRequest, resolve_model_id
+from .http_backend import HttpBackendError
+from browser_utils.page_controller import PageController, PageApiUnavailableError
 
 
-async def _initialize_request_context(req_id: str, request: ChatCompletionRequest) -> dict:
+async def _initialize_request_context(req_id: str, request: ChatCompletionRequest, page_slot=None) -> dict:
     """İstek bağlamını hazırlar"""
-    from server import (
-        logger, page_instance, is_page_ready, parsed_model_list,
-        current_ai_studio_model_id, model_switching_lock, page_params_cache,
-        params_cache_lock
-    )
+    from server import logger, parsed_model_list, page_params_cache, params_cache_lock
     
     logger.info(f"[{req_id}] İstek işlenmeye başlıyor...")
     logger.info(f"[{req_id}]   Parametreler - Model: {request.model}, Stream: {request.stream}")
     
+    # Havuz sayfası verildiyse sayfa, aktif model ve model kilidi o sayfaya aittir
+    if page_slot is not None:
+        page_instance = page_slot.page
+        is_page_ready = page_slot.is_ready
+        current_ai_studio_model_id = page_slot.current_model_id
+        model_switching_lock = page_slot.model_switching_lock
+    else:
+        from server import page_instance, is_page_ready, current_ai_studio_model_id, model_switching_lock
+    
     context = {
+        'page_slot': page_slot,
         'logger': logger,
         'page': page_instance,
         'is_page_ready': is_page_ready,
@@ -69,25 +81,21 @@ async def _initialize_request_context(req_id: str, request: ChatCompletionReques
     return context
 
 
-async def _analyze_model_requirements(req_id: str, context: dict, request: ChatCompletionRequest) -> dict:
+async def _analyze_model_requirements(req_id: str, context: dict, request: ChatCompletionRequest,
+                                     prepared: Optional[PreparedRequest] = None) -> dict:
     """Model gereksinimini analiz eder ve değişim gerekip gerekmediğini belirler"""
     logger = context['logger']
     current_ai_studio_model_id = context['current_ai_studio_model_id']
-    parsed_model_list = context['parsed_model_list']
-    requested_model = request.model
     
-    if requested_model and requested_model != MODEL_NAME:
-        requested_model_id = requested_model.split('/')[-1]
+    if prepared is not None:
+        if prepared.model_error is not None:
+            raise prepared.model_error
+        requested_model_id = prepared.model_id
+    else:
+        requested_model_id = resolve_model_id(req_id, request.model, context['parsed_model_list'])
+    
+    if requested_model_id:
         logger.info(f"[{req_id}] İstek, {requested_model_id} modelinin kullanılmasını talep ediyor")
-        
-        if parsed_model_list:
-            valid_model_ids = [m.get("id") for m in parsed_model_list]
-            if requested_model_id not in valid_model_ids:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"[{req_id}] Invalid model '{requested_model_id}'. Available models: {', '.join(valid_model_ids)}"
-                )
-        
         context['model_id_to_use'] = requested_model_id
         if current_ai_studio_model_id != requested_model_id:
             context['needs_model_switching'] = True
@@ -96,81 +104,17 @@ async def _analyze_model_requirements(req_id: str, context: dict, request: ChatC
     return context
 
 
-async def _test_client_connection(req_id: str, http_request: Request) -> bool:
-    """Küçük bir test paketi göndererek istemci bağlantısını doğrular"""
-    try:
-        # Küçük bir test paketi göndermeyi dene
-        test_chunk = "data: {\"type\":\"ping\"}\n\n"
-
-        # Alt düzey yanıt nesnesini al
-        if hasattr(http_request, '_receive'):
-            # Alım kanalının aktif olup olmadığını kontrol et
-            try:
-                # Engellemeden bağlantı kopması mesajı olup olmadığını dene
-                import asyncio
-                receive_task = asyncio.create_task(http_request._receive())
-                done, pending = await asyncio.wait([receive_task], timeout=0.01)
-
-                if done:
-                    message = receive_task.result()
-                    if message.get("type") == "http.disconnect":
-                        return False
-                else:
-                    # Tamamlanmayan görevi iptal et
-                    receive_task.cancel()
-                    try:
-                        await receive_task
-                    except asyncio.CancelledError:
-                        pass
-
-            except Exception:
-                # Denetim sırasında hata oluşursa bağlantı sorunlu olabilir
-                return False
-
-        # Tüm kontroller geçerse bağlantı sağlıklı kabul edilir
-        return True
-
-    except Exception as e:
-        # Herhangi bir istisna bağlantının koptuğu anlamına gelir
-        return False
-
-async def _setup_disconnect_monitoring(req_id: str, http_request: Request, result_future: Future) -> Tuple[Event, asyncio.Task, Callable]:
-    """İstemci bağlantı kopmalarını takip eder"""
+def _setup_disconnect_monitoring(req_id: str, disconnect_watcher: ClientDisconnectWatcher,
+                                 result_future: Future) -> Tuple[Event, Callable[[], None], Callable]:
+    """İsteğin paylaşılan bağlantı kopması olayına bağlanır; yoklama görevi oluşturmaz"""
     from server import logger
 
-    client_disconnected_event = Event()
-
-    async def check_disconnect_periodically():
-        while not client_disconnected_event.is_set():
-            try:
-                # Proaktif kontrol yöntemi
-                is_connected = await _test_client_connection(req_id, http_request)
-                if not is_connected:
-                    logger.info(f"[{req_id}] Proaktif kontrol istemci bağlantısının koptuğunu gösterdi.")
-                    client_disconnected_event.set()
-                    if not result_future.done():
-                        result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstemci isteği kapattı"))
-                    break
-
-                # Yedek kontrol: mevcut is_disconnected yöntemini kullan
-                if await http_request.is_disconnected():
-                    logger.info(f"[{req_id}] Yedek kontrol istemci bağlantısının koptuğunu gösterdi.")
-                    client_disconnected_event.set()
-                    if not result_future.done():
-                        result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] İstemci isteği kapattı"))
-                    break
-
-                await asyncio.sleep(0.3)  # Daha sık kontrol aralığı (0.5 sn'den 0.3 sn'ye)
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"[{req_id}] (Disco Check Task) hata: {e}")
-                client_disconnected_event.set()
-                if not result_future.done():
-                    result_future.set_exception(HTTPException(status_code=500, detail=f"[{req_id}] Internal disconnect checker error: {e}"))
-                break
+    def on_disconnect():
+        if not result_future.done():
+            result_future.set_exception(disconnect_watcher.error(f"[{req_id}] İstemci isteği kapattı"))
 
-    disconnect_check_task = asyncio.create_task(check_disconnect_periodically())
+    disconnect_watcher.add_callback(on_disconnect)
+    client_disconnected_event = disconnect_watcher.event
 
     def check_client_disconnected(stage: str = ""):
         if client_disconnected_event.is_set():
@@ -178,7 +122,7 @@ async def _setup_disconnect_monitoring(req_id: str, http_request: Request, resul
             raise ClientDisconnectedError(f"[{req_id}] Client disconnected at stage: {stage}")
         return False
 
-    return client_disconnected_event, disconnect_check_task, check_client_disconnected
+    return client_disconnected_event, on_disconnect, check_client_disconnected
 
 
 async def _validate_page_status(req_id: str, context: dict, check_client_disconnected: Callable) -> None:
@@ -202,30 +146,45 @@ async def _handle_model_switching(req_id: str, context: dict, check_client_disco
     model_switching_lock = context['model_switching_lock']
     model_id_to_use = context['model_id_to_use']
     
+    page_slot = context.get('page_slot')
+    
     import server
     
+    def _get_active_model():
+        return page_slot.current_model_id if page_slot is not None else server.current_ai_studio_model_id
+    
+    def _set_active_model(model_id):
+        if page_slot is not None:
+            page_slot.set_current_model(model_id)
+        else:
+            server.current_ai_studio_model_id = model_id
+    
     async with model_switching_lock:
-        if server.current_ai_studio_model_id != model_id_to_use:
-            logger.info(f"[{req_id}] Model değişimi hazırlanıyor: {server.current_ai_studio_model_id} -> {model_id_to_use}")
+        if _get_active_model() != model_id_to_use:
+            logger.info(f"[{req_id}] Model değişimi hazırlanıyor: {_get_active_model()} -> {model_id_to_use}")
             switch_success = await switch_ai_studio_model(page, model_id_to_use, req_id)
             if switch_success:
-                server.current_ai_studio_model_id = model_id_to_use
+                _set_active_model(model_id_to_use)
                 context['model_actually_switched'] = True
                 context['current_ai_studio_model_id'] = model_id_to_use
-                logger.info(f"[{req_id}] ✅ Model başarıyla değiştirildi: {server.current_ai_studio_model_id}")
+                logger.info(f"[{req_id}] ✅ Model başarıyla değiştirildi: {model_id_to_use}")
             else:
-                await _handle_model_switch_failure(req_id, page, model_id_to_use, server.current_ai_studio_model_id, logger)
+                await _handle_model_switch_failure(req_id, page, model_id_to_use, _get_active_model(), logger, _set_active_model)
     
     return context
 
 
-async def _handle_model_switch_failure(req_id: str, page: AsyncPage, model_id_to_use: str, model_before_switch: str, logger) -> None:
+async def _handle_model_switch_failure(req_id: str, page: AsyncPage, model_id_to_use: str, model_before_switch: str, logger,
+                                       restore_model: Optional[Callable] = None) -> None:
     """Model değişiminin başarısız olduğu durumu ele alır"""
     import server
     
     logger.warning(f"[{req_id}] ❌ Model {model_id_to_use} değerine geçirilemedi.")
-    # Global durumu eski haline döndür
-    server.current_ai_studio_model_id = model_before_switch
+    # Global (veya sayfaya ait) durumu eski haline döndür
+    if restore_model is not None:
+        restore_model(model_before_switch)
+    else:
+        server.current_ai_studio_model_id = model_before_switch
     
     raise HTTPException(
         status_code=422,
@@ -250,8 +209,15 @@ async def _handle_parameter_cache(req_id: str, context: dict) -> None:
             page_params_cache["last_known_model_id_for_params"] = current_ai_studio_model_id
 
 
-async def _prepare_and_validate_request(req_id: str, request: ChatCompletionRequest, check_client_disconnected: Callable) -> str:
-    """İsteği hazırlar ve doğrular"""
+async def _prepare_and_validate_request(req_id: str, request: ChatCompletionRequest, check_client_disconnected: Callable,
+                                        prepared: Optional[PreparedRequest] = None) -> Tuple[str, list]:
+    """İsteği hazırlar ve doğrular; ön hazırlık sonucu varsa onu kullanır"""
+    if prepared is not None:
+        if prepared.validation_error is not None:
+            raise prepared.validation_error
+        check_client_disconnected("After Prompt Prep")
+        return prepared.prompt, prepared.images
+
     try:
         validate_chat_request(request.messages, req_id)
     except ValueError as e:
@@ -262,18 +228,57 @@ async def _prepare_and_validate_request(req_id: str, request: ChatCompletionRequ
     
     return prepared_prompt
 
+def _http_backend_for(request: ChatCompletionRequest):
+    """İstek başsız HTTP arka ucuyla işlenebiliyorsa arka ucu, aksi halde None döndürür"""
+    from server import http_backend
+    return http_backend if http_backend is not None and http_backend.handles(request) else None
+
+
+@asynccontextmanager
+async def _borrow_credential_page():
+    """HTTP arka ucunun kimlik bilgisi yenilemesi için sayfa ödünç verir; havuz yoksa birincil sayfa kullanılır"""
+    from server import page_pool, page_instance
+    if page_pool is None:
+        yield page_instance
+        return
+    async with page_pool.borrow_page() as page:
+        yield page
+
+
+async def _replay_from_first_message(first_message: dict, messages: AsyncGenerator) -> AsyncGenerator[dict, None]:
+    """Önceden okunmuş ilk mesajı ve ardından kaynağın kalanını üretir"""
+    try:
+        yield first_message
+        async for message in messages:
+            yield message
+    finally:
+        await messages.aclose()
+
+
 async def _handle_response_processing(req_id: str, request: ChatCompletionRequest, page: AsyncPage,
                                     context: dict, result_future: Future,
-                                    submit_button_locator: Locator, check_client_disconnected: Callable) -> Optional[Tuple[Event, Locator, Callable]]:
+                                    submit_button_locator: Locator, check_client_disconnected: Callable,
+                                    prepared_prompt: Optional[str] = None) -> Optional[Tuple[Event, Locator, Callable]]:
     """Yanıt üretim sürecini yönetir"""
     from server import logger
     
     is_streaming = request.stream
     current_ai_studio_model_id = context.get('current_ai_studio_model_id')
     
+    # İstem sayfaya gönderilmeden verildiyse yanıt HTTP arka ucundan alınır
+    http_backend = _http_backend_for(request)
+    if http_backend is not None and prepared_prompt is not None:
+        return await _handle_http_backend_response(req_id, request, context, result_future, prepared_prompt,
+                                                   check_client_disconnected, http_backend)
+
     # Yardımcı akış kullanılacak mı kontrol et
     stream_port = os.environ.get('STREAM_PORT')
     use_stream = stream_port != '0'
+    page_slot = context.get('page_slot')
+    if use_stream and page_slot is not None and page_slot.stream_correlation_error:
+        # Proxy kareleri bu isteğe yönlendirilemez; boşta kalma süresini beklemek yerine sayfadan oku
+        logger.info(f"[{req_id}] Sayfa #{page_slot.slot_id} akış ilişkilendirmesi olmadan çalışıyor; yanıt sayfadan alınacak.")
+        use_stream = False
     
     if use_stream:
         return await _handle_auxiliary_stream_response(req_id, request, context, result_future, submit_button_locator, check_client_disconnected)
@@ -281,14 +286,44 @@ async def _handle_response_processing(req_id: str, request: ChatCompletionReques
         return await _handle_playwright_response(req_id, request, page, context, result_future, submit_button_locator, check_client_disconnected)
 
 
+async def _handle_http_backend_response(req_id: str, request: ChatCompletionRequest,
+                                        context: dict, result_future: Future, prepared_prompt: str,
+                                        check_client_disconnected: Callable, http_backend) -> Optional[Tuple[Event, Locator, Callable]]:
+    """Yanıtı tarayıcı oturumunun kimlik bilgileriyle doğrudan HTTP arka ucundan alır"""
+    from server import logger
+
+    model_id = context.get('model_id_to_use') or context.get('current_ai_studio_model_id')
+    if not model_id:
+        raise HTTPException(status_code=400, detail=f"[{req_id}] HTTP arka ucu için model belirlenemedi; istekte geçerli bir model belirtin.")
+
+    logger.info(f"[{req_id}] İstem HTTP arka ucuyla gönderiliyor (model: {model_id})")
+    messages = http_backend.stream_messages(prepared_prompt, model_id, _borrow_credential_page, req_id)
+    try:
+        # Çıktıdan önceki hatalar istemciye akış içi hata yerine HTTP hatası olarak döner
+        first_message = await messages.__anext__()
+    except HttpBackendError as backend_err:
+        logger.error(f"[{req_id}] HTTP arka ucu isteği başarısız: {backend_err}")
+        status_code = 503 if backend_err.status == 503 else 502
+        raise HTTPException(status_code=status_code, detail=f"[{req_id}] HTTP arka ucu hatası: {backend_err}")
+    check_client_disconnected("After HTTP Backend Response Started: ")
+
+    return await _handle_auxiliary_stream_response(
+        req_id, request, context, result_future, None, check_client_disconnected,
+        message_source=_replay_from_first_message(first_message, messages)
+    )
+
+
 async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletionRequest, context: dict, 
                                           result_future: Future, submit_button_locator: Locator, 
-                                          check_client_disconnected: Callable) -> Optional[Tuple[Event, Locator, Callable]]:
-    """Yanıtı yardımcı akış aracılığıyla işler"""
+                                          check_client_disconnected: Callable,
+                                          message_source: Optional[AsyncGenerator] = None) -> Optional[Tuple[Event, Locator, Callable]]:
+    """Yanıtı yardımcı akış aracılığıyla işler; message_source verilirse aynı biçimdeki mesajlar oradan okunur"""
     from server import logger
     
     is_streaming = request.stream
     current_ai_studio_model_id = context.get('current_ai_studio_model_id')
+    messages = message_source if message_source is not None else use_stream_response(
+        req_id, stop_event=context.get('disconnect_event'))
     
     def generate_random_string(length):
         charset = "abcdefghijklmnopqrstuvwxyz0123456789"
@@ -299,21 +334,17 @@ async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletion
             completion_event = Event()
             
             async def create_stream_generator_from_helper(event_to_set: Event) -> AsyncGenerator[str, None]:
-                last_reason_pos = 0
-                last_body_pos = 0
+                # Mesajlar yalnızca yeni metni taşır; tam içerik kullanım istatistiği için sonda birleştirilir
+                assembler = StreamDeltaAssembler(req_id)
                 model_name_for_stream = current_ai_studio_model_id or MODEL_NAME
                 chat_completion_id = f"{CHAT_COMPLETION_ID_PREFIX}{req_id}-{int(time.time())}-{random.randint(100, 999)}"
                 created_timestamp = int(time.time())
 
-                # Kullanım istatistiğini hesaplamak için tam içeriği biriktir
-                full_reasoning_content = ""
-                full_body_content = ""
-
                 # Veri alım durum bayrağı
                 data_receiving = False
 
                 try:
-                    async for raw_data in use_stream_response(req_id):
+                    async for raw_data in messages:
                         # Veri alınmaya başlandığını işaretle
                         data_receiving = True
 
@@ -346,19 +377,17 @@ async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletion
                             logger.warning(f"[{req_id}] Veri sözlük biçiminde değil: {data}")
                             continue
                         
-                        reason = data.get("reason", "")
-                        body = data.get("body", "")
+                        reason, body, _ = assembler.add(data)
                         done = data.get("done", False)
-                        function = data.get("function", [])
-                        
-                        # Tam içerik kayıtlarını güncelle
-                        if reason:
-                            full_reasoning_content = reason
-                        if body:
-                            full_body_content = body
+                        function = assembler.functions if done else []
+
+                        upstream_error = data.get("error")
+                        if upstream_error and upstream_error != "internal_timeout":
+                            logger.error(f"[{req_id}] Yardımcı akış üst sunucu hatası bildirdi: {upstream_error}")
+                            yield generate_sse_error_chunk(f"Üst sunucu hatası: {upstream_error}", req_id, "upstream_error")
                         
                         # Reasoning içeriklerini işle
-                        if len(reason) > last_reason_pos:
+                        if reason:
                             output = {
                                 "id": chat_completion_id,
                                 "object": "chat.completion.chunk",
@@ -369,22 +398,21 @@ async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletion
                                     "delta":{
                                         "role": "assistant",
                                         "content": None,
-                                        "reasoning_content": reason[last_reason_pos:],
+                                        "reasoning_content": reason,
                                     },
                                     "finish_reason": None,
                                     "native_finish_reason": None,
                                 }]
                             }
-                            last_reason_pos = len(reason)
                             yield f"data: {json.dumps(output, ensure_ascii=False, separators=(',', ':'))}\n\n"
                         
                         # Asıl içerik bloğunu işle
-                        if len(body) > last_body_pos:
+                        if body:
                             finish_reason_val = None
                             if done:
                                 finish_reason_val = "stop"
                             
-                            delta_content = {"role": "assistant", "content": body[last_body_pos:]}
+                            delta_content = {"role": "assistant", "content": body}
                             choice_item = {
                                 "index": 0,
                                 "delta": delta_content,
@@ -416,7 +444,6 @@ async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletion
                                 "created": created_timestamp,
                                 "choices": [choice_item]
                             }
-                            last_body_pos = len(body)
                             yield f"data: {json.dumps(output, ensure_ascii=False, separators=(',', ':'))}\n\n"
                         
                         # yalnzca tutamakdone=TrueAma yeni icerik yok（Yalnzca islev cagrs veya saf son）
@@ -490,8 +517,8 @@ async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletion
                     try:
                         usage_stats = calculate_usage_stats(
                             [msg.model_dump() for msg in request.messages],
-                            full_body_content,
-                            full_reasoning_content
+                            assembler.body,
+                            assembler.reason
                         )
                         logger.info(f"[{req_id}] Hesaplanan token kullanım istatistikleri: {usage_stats}")
                         
@@ -547,8 +574,9 @@ async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletion
         reasoning_content = None
         functions = None
         final_data_from_aux_stream = None
+        assembler = StreamDeltaAssembler(req_id)
 
-        async for raw_data in use_stream_response(req_id):
+        async for raw_data in messages:
             check_client_disconnected(f"Akış dışı yardımcı akış döngüsü ({req_id})")
             
             # Verinin sözlük formatında olduğunu doğrula
@@ -570,16 +598,22 @@ async def _handle_auxiliary_stream_response(req_id: str, request: ChatCompletion
                 continue
                 
             final_data_from_aux_stream = data
+            assembler.add(data)
             if data.get("done"):
-                content = data.get("body")
-                reasoning_content = data.get("reason")
-                functions = data.get("function")
+                content = assembler.body
+                reasoning_content = assembler.reason
+                functions = assembler.functions
                 break
         
-        if final_data_from_aux_stream and final_data_from_aux_stream.get("reason") == "internal_timeout":
+        if final_data_from_aux_stream and final_data_from_aux_stream.get("error") == "internal_timeout":
             logger.error(f"[{req_id}] Akış dışı istek yardımcı akışta iç zaman aşımına uğradı")
             raise HTTPException(status_code=502, detail=f"[{req_id}] Yardımcı akış işlemede hata (iç zaman aşımı)")
 
+        upstream_error = final_data_from_aux_stream.get("error") if final_data_from_aux_stream else None
+        if upstream_error and not content and not functions:
+            logger.error(f"[{req_id}] Yardımcı akış üst sunucu hatası bildirdi: {upstream_error}")
+            raise HTTPException(status_code=502, detail=f"[{req_id}] Üst sunucu hatası: {upstream_error}")
+
         if final_data_from_aux_stream and final_data_from_aux_stream.get("done") is True and content is None:
             logger.error(f"[{req_id}] Akış dışı istek yardımcı akışta tamamlandı ancak içerik gelmedi")
             raise HTTPException(status_code=502, detail=f"[{req_id}] Yardımcı akış tamamlandı fakat içerik sağlanmadı")
@@ -672,41 +706,16 @@ async def _handle_playwright_response(req_id: str, request: ChatCompletionReques
             data_receiving = False
 
             try:
-                # PageController kullanarak yanıtı al
+                # Sayfadaki MutationObserver'ın bildirdiği metin parçaları oluştukları anda iletilir
                 page_controller = PageController(page, logger, req_id)
-                final_content = await page_controller.get_response(check_client_disconnected)
-
-                # Veri alındığını işaretle
-                data_receiving = True
+                content_parts = []
+                async for delta in page_controller.stream_response(check_client_disconnected):
+                    # Veri alındığını işaretle
+                    data_receiving = True
+                    content_parts.append(delta)
+                    yield generate_sse_chunk(delta, req_id, current_ai_studio_model_id or MODEL_NAME)
+                final_content = "".join(content_parts)
 
-                # Akış yanıtlarını oluştur - Markdown yapısını koru
-                # Satır bazında parçalayarak yeni satırları ve Markdown'ı koru
-                lines = final_content.split('\n')
-                for line_idx, line in enumerate(lines):
-                    # İstemci bağlantısının kopup kopmadığını kontrol et
-                    try:
-                        check_client_disconnected(f"Playwright akış oluşturucu döngüsü ({req_id})")
-                    except ClientDisconnectedError:
-                        logger.info(f"[{req_id}] Playwright akış üreticisinde istemci bağlantısı kesildi")
-                        # Müşteri veri alırken bağlantı kesildiyse done sinyalini ayarla
-                        if data_receiving and not completion_event.is_set():
-                            logger.info(f"[{req_id}] Playwright verisi alınırken istemci bağlantısı kesildi, done sinyali gönderiliyor")
-                            completion_event.set()
-                        break
-
-                    # Satır içeriğini gönder (boş satırlar dahil, Markdown formatını koru)
-                    if line:  # Boş olmayan satırlar karakter bazında parçalanır
-                        chunk_size = 5  # Hız ve deneyimi dengelemek için 5 karakterlik parçalara böl
-                        for i in range(0, len(line), chunk_size):
-                            chunk = line[i:i+chunk_size]
-                            yield generate_sse_chunk(chunk, req_id, current_ai_studio_model_id or MODEL_NAME)
-                            await asyncio.sleep(0.03)  # Orta düzeyde gönderim hızı
-
-                    # Satır sonu karakterlerini ekle (son satır hariç)
-                    if line_idx < len(lines) - 1:
-                        yield generate_sse_chunk('\n', req_id, current_ai_studio_model_id or MODEL_NAME)
-                        await asyncio.sleep(0.01)
-                
                 # Kullanım istatistiklerini hesapla ve tamamlama bloğunu gönder
                 usage_stats = calculate_usage_stats(
                     [msg.model_dump() for msg in request.messages],
@@ -744,9 +753,9 @@ async def _handle_playwright_response(req_id: str, request: ChatCompletionReques
         
         return completion_event, submit_button_locator, check_client_disconnected
     else:
-        # PageController kullanarak yanıtı al
+        # PageController kullanarak yanıtı al; tamamlanma sayfa içinden bildirildiği için ek bekleme yapılmaz
         page_controller = PageController(page, logger, req_id)
-        final_content = await page_controller.get_response(check_client_disconnected)
+        final_content = "".join([delta async for delta in page_controller.stream_response(check_client_disconnected)])
         
         # Token kullanım istatistiklerini hesapla
         usage_stats = calculate_usage_stats(
@@ -775,20 +784,38 @@ async def _handle_playwright_response(req_id: str, request: ChatCompletionReques
         return None
 
 
-async def _cleanup_request_resources(req_id: str, disconnect_check_task: Optional[asyncio.Task], 
+async def _start_page_api_stream(req_id: str, context: dict, page_controller: PageController, prepared_prompt: str,
+                                 image_list: list, check_client_disconnected: Callable) -> Optional[AsyncGenerator]:
+    """İstemi sayfa içi API ile gönderir ve ilk mesajı bekler; API kullanılamazsa None döner (DOM yoluna dönülür)"""
+    from server import logger
+
+    if image_list:
+        logger.info(f"[{req_id}] Görsel içeren istek sayfa içi API yerine DOM yoluyla gönderiliyor.")
+        return None
+    model_id = context.get('current_ai_studio_model_id') or context.get('model_id_to_use')
+    if not model_id:
+        logger.info(f"[{req_id}] Aktif model bilinmiyor; istek DOM yoluyla gönderiliyor.")
+        return None
+
+    messages = page_controller.stream_completion_via_api(prepared_prompt, model_id, check_client_disconnected)
+    try:
+        # Yalnızca ilk mesaja kadar DOM yoluna dönmek güvenlidir; sonrasında çıktı istemciye akmaya başlar
+        first_message = await messages.__anext__()
+    except PageApiUnavailableError as api_err:
+        logger.warning(f"[{req_id}] Sayfa içi API kullanılamadı, DOM yoluna dönülüyor: {api_err}")
+        return None
+
+    return _replay_from_first_message(first_message, messages)
+
+
+async def _cleanup_request_resources(req_id: str, disconnect_watcher: ClientDisconnectWatcher,
+                                   disconnect_callback: Callable[[], None],
                                    completion_event: Optional[Event], result_future: Future, 
                                    is_streaming: bool) -> None:
     """Talep edilen kaynaklar temizle"""
     from server import logger
     
-    if disconnect_check_task and not disconnect_check_task.done():
-        disconnect_check_task.cancel()
-        try: 
-            await disconnect_check_task
-        except asyncio.CancelledError: 
-            pass
-        except Exception as task_clean_err: 
-            logger.error(f"[{req_id}] Gorevi temizlerken bir hata olustu: {task_clean_err}")
+    disconnect_watcher.remove_callback(disconnect_callback)
     
     logger.info(f"[{req_id}] Isleme tamamland。")
     
@@ -801,31 +828,50 @@ async def _process_request_refactored(
     req_id: str,
     request: ChatCompletionRequest,
     http_request: Request,
-    result_future: Future
+    result_future: Future,
+    page_slot=None,
+    disconnect_watcher: Optional[ClientDisconnectWatcher] = None,
+    prepared: Optional[PreparedRequest] = None
 ) -> Optional[Tuple[Event, Locator, Callable[[str], bool]]]:
     """Cekirdek istek isleme islevi - Yeniden duzenlenmis surum"""
 
-    # optimizasyon：Herhangi bir isleme baslamadan once istemci baglant durumunu aktif olarak alglayn
-    is_connected = await _test_client_connection(req_id, http_request)
-    if not is_connected:
+    if disconnect_watcher is None:
+        disconnect_watcher = ClientDisconnectWatcher(req_id, http_request).start()
+
+    # optimizasyon：Herhangi bir isleme baslamadan once istemci baglant durumunu kontrol et
+    if disconnect_watcher.disconnected:
         from server import logger
         logger.info(f"[{req_id}] ✅ Temel islemeden once musteri baglants tespit edildi，Kaynaklardan tasarruf etmek icin erken ckn")
         if not result_future.done():
-            result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] Islem baslamadan once istemcinin baglants kesildi"))
+            result_future.set_exception(disconnect_watcher.error(f"[{req_id}] Islem baslamadan once istemcinin baglants kesildi"))
         return None
 
-    context = await _initialize_request_context(req_id, request)
-    context = await _analyze_model_requirements(req_id, context, request)
+    context = await _initialize_request_context(req_id, request, page_slot=page_slot)
+    context = await _analyze_model_requirements(req_id, context, request, prepared=prepared)
     
-    client_disconnected_event, disconnect_check_task, check_client_disconnected = await _setup_disconnect_monitoring(
-        req_id, http_request, result_future
+    client_disconnected_event, disconnect_callback, check_client_disconnected = _setup_disconnect_monitoring(
+        req_id, disconnect_watcher, result_future
     )
+    # Akış okuyucusu bu olay ayarlandığında bir sonraki kareyi beklemeden durur
+    context['disconnect_event'] = client_disconnected_event
     
     page = context['page']
     submit_button_locator = page.locator(SUBMIT_BUTTON_SELECTOR) if page else None
     completion_event = None
     
     try:
+        if _http_backend_for(request) is not None:
+            # HTTP arka ucu sayfa tutmaz; model istek gövdesinde seçilir, sayfa yalnızca kimlik yenilemesinde ödünç alınır
+            check_client_disconnected("Before HTTP Backend Request: ")
+            prepared_prompt, _ = await _prepare_and_validate_request(req_id, request, check_client_disconnected, prepared=prepared)
+            response_result = await _handle_response_processing(
+                req_id, request, None, context, result_future, None, check_client_disconnected,
+                prepared_prompt=prepared_prompt
+            )
+            if response_result:
+                completion_event, _, _ = response_result
+            return completion_event, None, check_client_disconnected
+
         await _validate_page_status(req_id, context, check_client_disconnected)
         
         page_controller = PageController(page, context['logger'], req_id)
@@ -833,7 +879,7 @@ async def _process_request_refactored(
         await _handle_model_switching(req_id, context, check_client_disconnected)
         await _handle_parameter_cache(req_id, context)
         
-        prepared_prompt,image_list = await _prepare_and_validate_request(req_id, request, check_client_disconnected)
+        prepared_prompt,image_list = await _prepare_and_validate_request(req_id, request, check_client_disconnected, prepared=prepared)
 
         # kullanmakPageControllerSayfa etkilesimlerini yonetin
         # Fark etme：Kilit acldktan sonra sohbet gecmisinin temizlenmesi, islenmek uzere sraya tasnd.
@@ -850,12 +896,25 @@ async def _process_request_refactored(
         # optimizasyon：Bir istem gondermeden once musteri baglantsn tekrar kontrol edin，Gereksiz arka plan isteklerinden kacnn
         check_client_disconnected("Bir istem gondermeden once son cek")
 
-        await page_controller.submit_prompt(prepared_prompt,image_list, check_client_disconnected)
-        
-        # Yanıt işleme burada yapılmaya devam eder; akış olup olmadığını belirler ve future'ı ayarlar
-        response_result = await _handle_response_processing(
-            req_id, request, page, context, result_future, submit_button_locator, check_client_disconnected
-        )
+        page_api_messages = None
+        if PAGE_API_MODE_ENABLED:
+            page_api_messages = await _start_page_api_stream(
+                req_id, context, page_controller, prepared_prompt, image_list, check_client_disconnected
+            )
+
+        if page_api_messages is not None:
+            # Sayfa içi API, yardımcı akışla aynı delta mesajlarını üretir
+            response_result = await _handle_auxiliary_stream_response(
+                req_id, request, context, result_future, submit_button_locator, check_client_disconnected,
+                message_source=page_api_messages
+            )
+        else:
+            await page_controller.submit_prompt(prepared_prompt,image_list, check_client_disconnected)
+
+            # Yanıt işleme burada yapılmaya devam eder; akış olup olmadığını belirler ve future'ı ayarlar
+            response_result = await _handle_response_processing(
+                req_id, request, page, context, result_future, submit_button_locator, check_client_disconnected
+            )
         
         if response_result:
             completion_event, _, _ = response_result
@@ -865,7 +924,7 @@ async def _process_request_refactored(
     except ClientDisconnectedError as disco_err:
         context['logger'].info(f"[{req_id}] İstemci bağlantısı kesildi sinyali yakalandı: {disco_err}")
         if not result_future.done():
-             result_future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] Client disconnected during processing."))
+             result_future.set_exception(disconnect_watcher.error(f"[{req_id}] Client disconnected during processing."))
     except HTTPException as http_err:
         context['logger'].warning(f"[{req_id}] yakaland HTTP anormal: {http_err.status_code} - {http_err.detail}")
         if not result_future.done():
@@ -881,4 +940,6 @@ async def _process_request_refactored(
         if not result_future.done():
             result_future.set_exception(HTTPException(status_code=500, detail=f"[{req_id}] Unexpected server error: {e}"))
     finally:
-        await _cleanup_request_resources(req_id, disconnect_check_task, completion_event, result_future, request.stream)
+        await _cleanup_request_resources(
+            req_id, disconnect_watcher, disconnect_callback, completion_event, result_future, request.stream
+        )
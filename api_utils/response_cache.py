@@ -0,0 +1,356 @@
+"""
+Yanıt önbelleği modülü
+Çıktıyı etkileyen istek alanlarının kanonik özetine göre tamamlanmış yanıtları saklar.
+Bellekte TTL'li bir LRU katmanı ve isteğe bağlı olarak yeniden başlatmalardan sonra da
+kalıcı olan bir SQLite katmanı vardır. Önbellekten dönen yanıtlar akış isteklerinde
+mevcut SSE parça biçimiyle yeniden oynatılır.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from config import (
+    CHAT_COMPLETION_ID_PREFIX,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_DB_PATH,
+)
+from models import ChatCompletionRequest
+from .coalesce import request_fingerprint
+from .utils import generate_sse_chunk, generate_sse_stop_chunk
+
+logger = logging.getLogger("AIStudioProxyServer")
+
+ERROR_CONTENT_MARKER = "\n\n[hata:"
+
+
+def parse_cache_control(header_value: Optional[str]) -> Tuple[bool, bool]:
+    """(önbellekten okunabilir mi, önbelleğe yazılabilir mi) döndürür"""
+    directives = {part.strip().lower() for part in (header_value or "").split(",") if part.strip()}
+    if "no-store" in directives:
+        return False, False
+    if "no-cache" in directives:
+        return False, True
+    return True, True
+
+
+class SSEResponseCollector:
+    """SSE parçalarından nihai mesajı (içerik, akıl yürütme, araç çağrıları, kullanım) biriktirir"""
+
+    def __init__(self):
+        self.content_parts: List[str] = []
+        self.reasoning_parts: List[str] = []
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.model: Optional[str] = None
+        self.done = False
+        self.errored = False
+        self._buffer = ""
+
+    def feed(self, chunk: Any) -> None:
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("utf-8", errors="replace")
+        self._buffer += chunk
+        while "\n\n" in self._buffer:
+            event, self._buffer = self._buffer.split("\n\n", 1)
+            for line in event.splitlines():
+                if line.startswith("data:"):
+                    self._feed_data(line[5:].strip())
+
+    def _feed_data(self, data: str) -> None:
+        if data == "[DONE]":
+            self.done = True
+            return
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            self.errored = True
+            return
+        if "error" in payload:
+            self.errored = True
+            return
+        self.model = payload.get("model") or self.model
+        if payload.get("usage"):
+            self.usage = payload["usage"]
+        for choice in payload.get("choices") or []:
+            delta = choice.get("delta") or {}
+            content = delta.get("content")
+            if content:
+                if content.startswith(ERROR_CONTENT_MARKER):
+                    self.errored = True
+                self.content_parts.append(content)
+            if delta.get("reasoning_content"):
+                self.reasoning_parts.append(delta["reasoning_content"])
+            for tool_call in delta.get("tool_calls") or []:
+                self._merge_tool_call(tool_call)
+            # Akış her zaman "stop" taşıyan kullanım parçasıyla biter; ilk gerçek neden korunur
+            reason = choice.get("finish_reason")
+            if reason and (self.finish_reason is None or reason == "tool_calls"):
+                self.finish_reason = reason
+
+    def _merge_tool_call(self, tool_call: Dict[str, Any]) -> None:
+        """Araç çağrısı parçalarını index'e göre birleştirir; argüman parçaları uç uca eklenir"""
+        index = tool_call.get("index", len(self._tool_calls))
+        merged = self._tool_calls.setdefault(index, {"index": index, "function": {"arguments": ""}})
+        for field in ("id", "type"):
+            if tool_call.get(field):
+                merged[field] = tool_call[field]
+        function = tool_call.get("function") or {}
+        if function.get("name"):
+            merged["function"]["name"] = function["name"]
+        merged["function"]["arguments"] += function.get("arguments") or ""
+
+    @property
+    def tool_calls(self) -> Optional[List[Dict[str, Any]]]:
+        if not self._tool_calls:
+            return None
+        return [self._tool_calls[index] for index in sorted(self._tool_calls)]
+
+    def to_entry(self) -> Optional[Dict[str, Any]]:
+        if not self.done or self.errored or not self.finish_reason:
+            return None
+        message: Dict[str, Any] = {"role": "assistant", "content": "".join(self.content_parts) or None}
+        if self.reasoning_parts:
+            message["reasoning_content"] = "".join(self.reasoning_parts)
+        if self.tool_calls:
+            message["tool_calls"] = self.tool_calls
+        return {"model": self.model, "message": message, "finish_reason": self.finish_reason, "usage": self.usage}
+
+
+def entry_from_json(body: bytes) -> Optional[Dict[str, Any]]:
+    """Akış dışı yanıt gövdesinden önbellek kaydı çıkarır"""
+    try:
+        payload = json.loads(body)
+        choice = payload["choices"][0]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    message = choice.get("message") or {}
+    if isinstance(message.get("content"), str) and ERROR_CONTENT_MARKER in message["content"]:
+        return None
+    return {
+        "model": payload.get("model"),
+        "message": message,
+        "finish_reason": choice.get("finish_reason") or "stop",
+        "usage": payload.get("usage"),
+    }
+
+
+class _DiskTier:
+    """SQLite tabanlı kalıcı katman; çağrılar iş parçacığında çalıştırılır"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return row[1], json.loads(row[0])
+
+    def put(self, key: str, entry: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry, ensure_ascii=False), expires_at),
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Bellek içi LRU + TTL katmanı ve isteğe bağlı SQLite katmanı"""
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS, db_path: Optional[str] = RESPONSE_CACHE_DB_PATH):
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._memory: "collections.OrderedDict[str, Tuple[float, Dict[str, Any]]]" = collections.OrderedDict()
+        self._disk: Optional[_DiskTier] = None
+        if enabled and db_path:
+            try:
+                self._disk = _DiskTier(db_path)
+            except sqlite3.Error as db_err:
+                logger.error(f"Yanıt önbelleği veritabanı açılamadı ({db_path}): {db_err}; yalnızca bellek katmanı kullanılacak.")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        # Akış dışı yanıtların arka plan yazma görevleri; referans tutulmazsa görev toplanabilir
+        self._pending_writes: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def key_for(request: ChatCompletionRequest, default_model: Optional[str] = None) -> str:
+        return request_fingerprint(request, include_stream=False, default_model=default_model)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        cached = self._memory.get(key)
+        if cached is not None:
+            expires_at, entry = cached
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            del self._memory[key]
+        if self._disk is not None:
+            try:
+                stored = await asyncio.to_thread(self._disk.get, key)
+            except sqlite3.Error as db_err:
+                logger.warning(f"Yanıt önbelleği disk okuma hatası: {db_err}")
+                stored = None
+            if stored is not None:
+                self._remember(key, stored[1], stored[0])
+                self.hits += 1
+                self.disk_hits += 1
+                return stored[1]
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, entry: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, entry, expires_at)
+        self.stores += 1
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.put, key, entry, expires_at)
+            except sqlite3.Error as db_err:
+                logger.warning(f"Yanıt önbelleği disk yazma hatası: {db_err}")
+
+    def _remember(self, key: str, entry: Dict[str, Any], expires_at: float) -> None:
+        self._memory[key] = (expires_at, entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def capture(self, key: str, response: Response, should_store=None) -> Response:
+        """
+        Yeni üretilen yanıtı önbelleğe yazar. Akış yanıtında parçalar aynen iletilir ve
+        akış [DONE] ile hatasız bittiğinde kayıt oluşturulur; `should_store` o anda tekrar sorulur.
+        """
+        if isinstance(response, StreamingResponse):
+            # İçerik uzunluğu dışındaki başlıklar ve durum kodu korunur
+            headers = {name: value for name, value in response.headers.items() if name.lower() != "content-length"}
+            return StreamingResponse(self._capture_stream(key, response.body_iterator, should_store),
+                                     status_code=response.status_code, headers=headers,
+                                     media_type=response.media_type)
+        if getattr(response, "status_code", 500) == 200 and isinstance(getattr(response, "body", None), bytes):
+            entry = entry_from_json(response.body)
+            if entry is not None:
+                self._put_in_background(key, entry)
+        return response
+
+    def _put_in_background(self, key: str, entry: Dict[str, Any]) -> None:
+        task = asyncio.create_task(self.put(key, entry))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._on_write_done)
+
+    def _on_write_done(self, task: asyncio.Task) -> None:
+        self._pending_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Yanıt önbelleğine yazılamadı: {task.exception()}")
+
+    async def _capture_stream(self, key: str, source: AsyncIterator[Any], should_store) -> AsyncIterator[Any]:
+        collector = SSEResponseCollector()
+        async for chunk in source:
+            collector.feed(chunk)
+            yield chunk
+        entry = collector.to_entry()
+        if entry is not None and (should_store is None or should_store()):
+            await self.put(key, entry)
+
+    def build_response(self, entry: Dict[str, Any], req_id: str, stream: bool,
+                       fallback_model: Optional[str] = None) -> Response:
+        model = entry.get("model") or fallback_model
+        headers = {"X-Cache": "HIT"}
+        if stream:
+            return StreamingResponse(self._replay_stream(entry, req_id, model), media_type="text/event-stream",
+                                     headers=headers)
+        created = int(time.time())
+        return JSONResponse(content={
+            "id": f"{CHAT_COMPLETION_ID_PREFIX}{req_id}-{created}",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": entry["message"],
+                "finish_reason": entry.get("finish_reason", "stop"),
+            }],
+            "usage": entry.get("usage"),
+        }, headers=headers)
+
+    @staticmethod
+    async def _replay_stream(entry: Dict[str, Any], req_id: str, model: str) -> AsyncIterator[str]:
+        message = entry.get("message") or {}
+        if message.get("reasoning_content"):
+            yield _extra_delta_chunk({"role": "assistant", "content": None,
+                                      "reasoning_content": message["reasoning_content"]}, req_id, model)
+        if message.get("content"):
+            yield generate_sse_chunk(message["content"], req_id, model)
+        if message.get("tool_calls"):
+            yield _extra_delta_chunk({"role": "assistant", "content": None, "tool_calls": message["tool_calls"]},
+                                     req_id, model)
+        yield generate_sse_stop_chunk(req_id, model, entry.get("finish_reason") or "stop", entry.get("usage"))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self._disk is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+        }
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+def _extra_delta_chunk(delta: Dict[str, Any], req_id: str, model: str) -> str:
+    """generate_sse_chunk ile aynı biçimde, metin dışı delta alanları için SSE parçası"""
+    chunk_data = {
+        "id": f"chatcmpl-{req_id}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+    }
+    return f"data: {json.dumps(chunk_data)}\n\n"
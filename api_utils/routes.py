@@ -8,12 +8,12 @@ import os
 import random
 import time
 import uuid
-from typing import Dict, List, Any, Set
-from asyncio import Queue, Future, Lock, Event
+from typing import Dict, List, Any, Optional, Set
+from asyncio import Queue, Future, Event
 import logging
 
 from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect, Depends
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from pydantic import BaseModel
 from playwright.async_api import Page as AsyncPage
 
@@ -28,6 +28,8 @@ from browser_utils import _handle_model_list_response, get_default_qwen_models,
 
 # --- Bağımlılıkları içe aktar ---
 from .dependencies import *
+from .disconnect import ClientDisconnectWatcher
+from .prefetch import discard_prepared
 
 MODEL_LIST_REFRESH_TTL_SECONDS = int(os.environ.get('MODEL_LIST_REFRESH_TTL_SECONDS', '300'))
 
@@ -96,10 +98,11 @@ async def get_api_info(request: Request, current_ai_studio_model_id: str = Depen
 async def health_check(
     server_state: Dict[str, Any] = Depends(get_server_state),
     worker_task = Depends(get_worker_task),
-    request_queue: Queue = Depends(get_request_queue)
+    request_queue: Queue = Depends(get_request_queue),
+    page_pool = Depends(get_page_pool)
 ):
     """Sağlık kontrolü"""
-    is_worker_running = bool(worker_task and not worker_task.done())
+    is_worker_running = bool(worker_task and not worker_task.done()) and (page_pool is None or page_pool.is_running())
     launch_mode = os.environ.get('LAUNCH_MODE', 'unknown')
     browser_page_critical = launch_mode != "direct_debug_no_browser"
     
@@ -122,7 +125,11 @@ async def health_check(
     status = {
         "status": status_val,
         "message": "",
-        "details": {**server_state, "workerRunning": is_worker_running, "queueLength": q_size, "launchMode": launch_mode, "browserAndPageCritical": browser_page_critical}
+        "details": {
+            **server_state, "workerRunning": is_worker_running, "queueLength": q_size, "launchMode": launch_mode,
+            "browserAndPageCritical": browser_page_critical,
+            "pagePool": page_pool.summary() if page_pool else None
+        }
     }
     
     if status_val == "OK":
@@ -214,12 +221,43 @@ async def chat_completions(
     logger: logging.Logger = Depends(get_logger),
     request_queue: Queue = Depends(get_request_queue),
     server_state: Dict[str, Any] = Depends(get_server_state),
-    worker_task = Depends(get_worker_task)
+    worker_task = Depends(get_worker_task),
+    page_pool = Depends(get_page_pool),
+    admission_controller = Depends(get_admission_controller),
+    request_prefetcher = Depends(get_request_prefetcher),
+    request_coalescer = Depends(get_request_coalescer),
+    response_cache = Depends(get_response_cache),
+    deadline_stats = Depends(get_deadline_stats),
+    current_ai_studio_model_id: str = Depends(get_current_ai_studio_model_id)
 ):
     """Sohbet tamamlama isteğini işler"""
     req_id = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=7))
     logger.info(f"[{req_id}] /v1/chat/completions isteği alındı (Stream={request.stream})")
     
+    # İstemcinin beklemeye razı olduğu süre; kuyrukta veya işlem sırasında dolarsa istek durdurulur
+    from api_utils.deadlines import parse_request_timeout
+    try:
+        request_timeout = parse_request_timeout(http_request.headers, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"[{req_id}] Geçersiz istek zaman aşımı: {e}")
+    deadline = time.time() + request_timeout if request_timeout else None
+    
+    # Birebir aynı isteğin tamamlanmış yanıtı önbellekteyse tarayıcıya gitmeden döndür
+    cache_key = None
+    if response_cache and response_cache.enabled:
+        from api_utils.response_cache import parse_cache_control
+        cache_readable, cache_writable = parse_cache_control(http_request.headers.get("cache-control"))
+        if cache_readable or cache_writable:
+            cache_key = response_cache.key_for(request, default_model=current_ai_studio_model_id)
+        if cache_readable:
+            cached_entry = await response_cache.get(cache_key)
+            if cached_entry is not None:
+                logger.info(f"[{req_id}] Yanıt önbellekten döndürülüyor (Stream={request.stream}).")
+                return response_cache.build_response(cached_entry, req_id, bool(request.stream),
+                                                     fallback_model=current_ai_studio_model_id)
+        if not cache_writable:
+            cache_key = None
+
     launch_mode = os.environ.get('LAUNCH_MODE', 'unknown')
     browser_page_critical = launch_mode != "direct_debug_no_browser"
     
@@ -230,16 +268,94 @@ async def chat_completions(
 
     if service_unavailable:
         raise HTTPException(status_code=503, detail=f"[{req_id}] Hizmet şu anda kullanılamıyor. Lütfen daha sonra yeniden deneyin.", headers={"Retry-After": "30"})
+
+    timeout_seconds = RESPONSE_COMPLETION_TIMEOUT / 1000 + 120
+    if deadline:
+        timeout_seconds = min(timeout_seconds, max(0.0, deadline - time.time()))
+
+    # Aynı istek zaten kuyruktaysa veya işleniyorsa ona bağlan; takipçiler kuyruğa ve kabul kontrolüne girmez
+    flight = None
+    while request_coalescer and request_coalescer.enabled:
+        from api_utils.coalesce import LeaderAbandoned
+        flight, is_leader = request_coalescer.acquire(request, req_id, default_model=current_ai_studio_model_id)
+        if is_leader:
+            break
+        logger.info(f"[{req_id}] Aynı istek [{flight.leader_req_id}] zaten işleniyor; sonucuna bağlanılıyor.")
+        # Takipçi de kendi bağlantı kopması ve son tarihiyle bekler
+        follower_watcher = ClientDisconnectWatcher(req_id, http_request).start().set_deadline(deadline)
+        try:
+            response = await request_coalescer.follow(flight, timeout=timeout_seconds, watcher=follower_watcher)
+            if deadline and isinstance(response, StreamingResponse):
+                response = _with_deadline_notice(response, follower_watcher, req_id)
+            return response
+        except LeaderAbandoned:
+            logger.info(f"[{req_id}] Lider istek [{flight.leader_req_id}] sonuçsuz bitti; istek yeniden deneniyor.")
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"[{req_id}] İstek işlenirken zaman aşımı oluştu.")
+        flight = None
+
+    if admission_controller:
+        decision = admission_controller.check(
+            request, request_queue.items(), page_pool.capacity if page_pool else 1,
+            fallback_model=current_ai_studio_model_id
+        )
+        if not decision.admitted:
+            logger.warning(
+                f"[{req_id}] Aşırı yük: tahmini kuyruk bekleme süresi {decision.predicted_wait:.1f}s "
+                f"(bütçe {admission_controller.max_queue_wait:.0f}s); istek reddedildi, Retry-After={decision.retry_after}s."
+            )
+            rejection = HTTPException(
+                status_code=429,
+                detail=f"[{req_id}] Sunucu aşırı yüklü; tahmini bekleme süresi {decision.predicted_wait:.0f}s. Lütfen {decision.retry_after}s sonra yeniden deneyin.",
+                headers={"Retry-After": str(decision.retry_after)}
+            )
+            if flight:
+                request_coalescer.fail(flight, rejection)
+            raise rejection
     
+    # Adil kuyruk için istemci anahtarı: API anahtarı, yoksa istemci IP adresi
+    from api_utils import auth_utils
+    client_key = auth_utils.extract_api_key(http_request.headers)
+    if not client_key and http_request.client:
+        client_key = f"ip:{http_request.client.host}"
+
     result_future = Future()
-    await request_queue.put({
+    disconnect_watcher = ClientDisconnectWatcher(req_id, http_request).start().set_deadline(deadline)
+    if flight:
+        request_coalescer.bind(flight, disconnect_watcher)
+    request_item = {
         "req_id": req_id, "request_data": request, "http_request": http_request,
-        "result_future": result_future, "enqueue_time": time.time(), "cancelled": False
-    })
+        "result_future": result_future, "enqueue_time": time.time(), "cancelled": False,
+        "client_key": client_key, "disconnect_watcher": disconnect_watcher, "deadline": deadline
+    }
+
+    def _cancel_if_queued():
+        # Worker isteği almadan önce bağlantı koparsa veya son tarih dolarsa isteği kuyrukta iptal et
+        if request_queue.cancel(req_id):
+            if disconnect_watcher.deadline_exceeded and deadline_stats:
+                deadline_stats.record("queued")
+            if not result_future.done():
+                result_future.set_exception(disconnect_watcher.error(f"[{req_id}] Client disconnected while queued."))
+
+    queued_disconnect_callback = disconnect_watcher.add_callback(_cancel_if_queued)
+    await request_queue.put(request_item)
+    if request_prefetcher:
+        request_prefetcher.refill(request_queue)
     
+    response = None
     try:
-        timeout_seconds = RESPONSE_COMPLETION_TIMEOUT / 1000 + 120
-        return await asyncio.wait_for(result_future, timeout=timeout_seconds)
+        # Son tarih, izleyicinin zamanlayıcısıyla future'ı 504 ile sonlandırır; burada yalnızca pay bırakılır
+        response = await asyncio.wait_for(result_future, timeout=timeout_seconds + (5 if deadline else 0))
+        if flight:
+            # Takipçiler ham yanıtı alır; aşağıdaki sarmalayıcılar yalnızca liderin istemcisine uygulanır
+            response = request_coalescer.publish(flight, response)
+        if deadline and isinstance(response, StreamingResponse):
+            response = _with_deadline_notice(response, disconnect_watcher, req_id)
+        if cache_key:
+            # Yanıt, istemcinin bağlantısı kopmadan tamamlandıysa önbelleğe yazılır
+            response = response_cache.capture(cache_key, response,
+                                              should_store=lambda: not disconnect_watcher.disconnected)
+        return response
     except asyncio.TimeoutError:
         raise HTTPException(status_code=504, detail=f"[{req_id}] İstek işlenirken zaman aşımı oluştu.")
     except asyncio.CancelledError:
@@ -254,27 +370,55 @@ async def chat_completions(
     except Exception as e:
         logger.exception(f"[{req_id}] Worker yanıtını beklerken hata oluştu")
         raise HTTPException(status_code=500, detail=f"[{req_id}] Sunucu iç hatası: {e}")
+    finally:
+        disconnect_watcher.remove_callback(queued_disconnect_callback)
+        if flight and response is None:
+            error = result_future.exception() if result_future.done() and not result_future.cancelled() else None
+            # Liderin kendi son tarihi dolduysa takipçiler isteği kendileri yeniden dener
+            request_coalescer.fail(flight, None if disconnect_watcher.deadline_exceeded else error)
+
+
+def _with_deadline_notice(response: StreamingResponse, disconnect_watcher: ClientDisconnectWatcher,
+                          req_id: str) -> StreamingResponse:
+    """Akış son tarih nedeniyle kesilirse istemciye [DONE] öncesinde bir hata bloğu gönderir"""
+    from api_utils.utils import generate_sse_error_chunk
+    source = response.body_iterator
+    done_marker = "data: [DONE]"
+
+    async def iterator():
+        notified = finished = False
+        async for chunk in source:
+            text = chunk.decode("utf-8", errors="ignore") if isinstance(chunk, bytes) else chunk
+            if done_marker in text:
+                finished = True
+                if disconnect_watcher.deadline_exceeded and not notified:
+                    notified = True
+                    head, tail = text.split(done_marker, 1)
+                    if head:
+                        yield head
+                    yield generate_sse_error_chunk(f"[{req_id}] Request deadline exceeded.", req_id, "timeout")
+                    yield done_marker + tail
+                    continue
+            yield chunk
+        if disconnect_watcher.deadline_exceeded and not finished:
+            yield generate_sse_error_chunk(f"[{req_id}] Request deadline exceeded.", req_id, "timeout")
+            yield f"{done_marker}\n\n"
+
+    response.body_iterator = iterator()
+    return response
 
 
 # --- İstek iptali ile ilgili yardımcılar ---
 async def cancel_queued_request(req_id: str, request_queue: Queue, logger: logging.Logger) -> bool:
-    """Kuyruktaki bir isteği iptal eder"""
-    items_to_requeue = []
-    found = False
-    try:
-        while not request_queue.empty():
-            item = request_queue.get_nowait()
-            if item.get("req_id") == req_id:
-                logger.info(f"[{req_id}] İstek kuyrukta bulunup iptal edildi.")
-                item["cancelled"] = True
-                if (future := item.get("result_future")) and not future.done():
-                    future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] Request cancelled."))
-                found = True
-            items_to_requeue.append(item)
-    finally:
-        for item in items_to_requeue:
-            await request_queue.put(item)
-    return found
+    """Kuyruktaki bir isteği sıraya dokunmadan, sabit zamanda iptal eder"""
+    item = request_queue.get_entry(req_id)
+    if item is None or not request_queue.cancel(req_id):
+        return False
+    logger.info(f"[{req_id}] İstek kuyrukta bulunup iptal edildi.")
+    discard_prepared(item)
+    if (future := item.get("result_future")) and not future.done():
+        future.set_exception(HTTPException(status_code=499, detail=f"[{req_id}] Request cancelled."))
+    return True
 
 
 async def cancel_request(
@@ -291,27 +435,132 @@ async def cancel_request(
 
 
 # --- Kuyruk durumu ucu ---
+def _describe_queue_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "req_id": item.get("req_id", "unknown"),
+        "state": item.get("state", "queued"),
+        "enqueue_time": item.get("enqueue_time", 0),
+        "wait_time_seconds": round(time.time() - item.get("enqueue_time", 0), 2),
+        "is_streaming": item.get("request_data").stream,
+        "cancelled": item.get("cancelled", False),
+        "client": _display_client(item.get("client_key")),
+        "batch_id": item.get("batch_id"),
+        "deadline_remaining_seconds": round(item["deadline"] - time.time(), 2) if item.get("deadline") else None
+    }
+
+
+def _display_client(client_key) -> str:
+    from api_utils import auth_utils
+    if not client_key:
+        return "anonymous"
+    return client_key if client_key.startswith(("ip:", "batch:")) else auth_utils.mask_key(client_key)
+
+
 async def get_queue_status(
     request_queue: Queue = Depends(get_request_queue),
-    processing_lock: Lock = Depends(get_processing_lock)
+    page_pool = Depends(get_page_pool),
+    admission_controller = Depends(get_admission_controller),
+    request_prefetcher = Depends(get_request_prefetcher),
+    request_coalescer = Depends(get_request_coalescer),
+    response_cache = Depends(get_response_cache),
+    batch_manager = Depends(get_batch_manager),
+    model_affinity = Depends(get_model_affinity),
+    deadline_stats = Depends(get_deadline_stats),
+    stream_channel = Depends(get_stream_channel),
+    http_backend = Depends(get_http_backend),
+    overlay_suppressor = Depends(get_overlay_suppressor)
 ):
     """Kuyruğun durumunu döndürür"""
-    queue_items = list(request_queue._queue)
+    queue_items = request_queue.items()
+    workers = page_pool.capacity if page_pool else 1
     return JSONResponse(content={
         "queue_length": len(queue_items),
-        "is_processing_locked": processing_lock.locked(),
-        "items": sorted([
-            {
-                "req_id": item.get("req_id", "unknown"),
-                "enqueue_time": item.get("enqueue_time", 0),
-                "wait_time_seconds": round(time.time() - item.get("enqueue_time", 0), 2),
-                "is_streaming": item.get("request_data").stream,
-                "cancelled": item.get("cancelled", False)
-            } for item in queue_items
-        ], key=lambda x: x.get("enqueue_time", 0))
+        "is_processing_locked": bool(page_pool and page_pool.busy_count > 0),
+        "page_pool": page_pool.summary() if page_pool else None,
+        "clients": request_queue.flows_snapshot(),
+        "admission": admission_controller.snapshot(queue_items, workers) if admission_controller else None,
+        "prefetch": request_prefetcher.snapshot() if request_prefetcher else None,
+        "coalescing": request_coalescer.snapshot() if request_coalescer else None,
+        "response_cache": response_cache.snapshot() if response_cache else None,
+        "batches": batch_manager.snapshot() if batch_manager else None,
+        "model_affinity": model_affinity.snapshot() if model_affinity else None,
+        "deadlines": deadline_stats.snapshot() if deadline_stats else None,
+        "stream_channel": stream_channel.snapshot() if stream_channel else None,
+        "http_backend": http_backend.snapshot() if http_backend else None,
+        "overlay_suppressor": overlay_suppressor.snapshot() if overlay_suppressor else None,
+        "items": [_describe_queue_item(item) for item in queue_items]
     })
 
 
+async def get_queue_item_status(
+    req_id: str,
+    request_queue: Queue = Depends(get_request_queue)
+):
+    """Tek bir isteğin kuyruk durumunu sabit zamanda döndürür"""
+    item = request_queue.get_entry(req_id)
+    if item is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": f"Request {req_id} not found in queue."})
+    content = _describe_queue_item(item)
+    if item.get("page_slot_id") is not None:
+        content["page_slot_id"] = item["page_slot_id"]
+    return JSONResponse(content=content)
+
+
+# --- Toplu iş (batch) uçları ---
+async def create_batch(
+    request: Request,
+    logger: logging.Logger = Depends(get_logger),
+    batch_manager = Depends(get_batch_manager)
+):
+    """JSONL gövdesinden yeni bir toplu iş oluşturur"""
+    if batch_manager is None:
+        raise HTTPException(status_code=503, detail="Batch manager is not initialized.")
+    raw = await request.body()
+    metadata = {key: value for key, value in request.query_params.items()}
+    try:
+        job = batch_manager.create(raw, metadata)
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.warning(f"[Batch] Geçersiz girdi reddedildi: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid batch input: {e}")
+    return JSONResponse(content=job.to_dict())
+
+
+async def list_batches(batch_manager = Depends(get_batch_manager)):
+    """Tüm toplu işleri en yeniden eskiye listeler"""
+    jobs = batch_manager.list() if batch_manager else []
+    return JSONResponse(content={"object": "list", "data": [job.to_dict() for job in jobs]})
+
+
+def _require_batch(batch_manager, batch_id: str):
+    job = batch_manager.get(batch_id) if batch_manager else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found.")
+    return job
+
+
+async def get_batch(batch_id: str, batch_manager = Depends(get_batch_manager)):
+    """Tek bir toplu işin durumunu döndürür"""
+    return JSONResponse(content=_require_batch(batch_manager, batch_id).to_dict())
+
+
+async def get_batch_output(batch_id: str, batch_manager = Depends(get_batch_manager)):
+    """Toplu işin o ana kadar yazılmış JSONL çıktısını döndürür"""
+    job = _require_batch(batch_manager, batch_id)
+    return FileResponse(job.output_path, media_type="application/jsonl", filename=f"{job.id}_output.jsonl")
+
+
+async def cancel_batch(
+    batch_id: str,
+    logger: logging.Logger = Depends(get_logger),
+    batch_manager = Depends(get_batch_manager)
+):
+    """Toplu işi iptal eder; yürütülmekte olan satır kuyruktan çekilir"""
+    job = _require_batch(batch_manager, batch_id)
+    batch_manager.cancel(batch_id)
+    logger.info(f"[Batch] {batch_id} iptal isteği alındı (durum: {job.status}).")
+    return JSONResponse(content=job.to_dict())
+
+
 # --- WebSocket günlük ucu ---
 async def websocket_log_endpoint(
     websocket: WebSocket,
@@ -339,6 +588,7 @@ async def websocket_log_endpoint(
 # --- API anahtarı yönetimi veri modelleri ---
 class ApiKeyRequest(BaseModel):
     key: str
+    weight: Optional[float] = None
 
 class ApiKeyTestRequest(BaseModel):
     key: str
@@ -350,7 +600,10 @@ async def get_api_keys(logger: logging.Logger = Depends(get_logger)):
     from api_utils import auth_utils
     try:
         auth_utils.initialize_keys()
-        keys_info = [{"value": key, "status": "geçerli"} for key in auth_utils.API_KEYS]
+        keys_info = [
+            {"value": key, "status": "geçerli", "weight": auth_utils.get_key_weight(key)}
+            for key in auth_utils.API_KEYS
+        ]
         return JSONResponse(content={"success": True, "keys": keys_info, "total_count": len(keys_info)})
     except Exception as e:
         logger.error(f"API anahtarı listesi alınamadı: {e}")
@@ -361,8 +614,10 @@ async def add_api_key(request: ApiKeyRequest, logger: logging.Logger = Depends(g
     """API anahtarı ekler"""
     from api_utils import auth_utils
     key_value = request.key.strip()
-    if not key_value or len(key_value) < 8:
+    if not key_value or len(key_value) < 8 or len(key_value.split()) != 1:
         raise HTTPException(status_code=400, detail="Geçersiz API anahtarı formatı.")
+    if request.weight is not None and request.weight <= 0:
+        raise HTTPException(status_code=400, detail="Ağırlık pozitif bir sayı olmalıdır.")
     
     auth_utils.initialize_keys()
     if key_value in auth_utils.API_KEYS:
@@ -375,7 +630,7 @@ async def add_api_key(request: ApiKeyRequest, logger: logging.Logger = Depends(g
         with open(key_file_path, 'a+', encoding='utf-8') as f:
             f.seek(0)
             if f.read(): f.write("\n")
-            f.write(key_value)
+            f.write(key_value if request.weight is None else f"{key_value} weight={request.weight:g}")
         
         auth_utils.initialize_keys()
         logger.info(f"API anahtarı eklendi: {key_value[:4]}...{key_value[-4:]}")
@@ -418,7 +673,7 @@ async def delete_api_key(request: ApiKeyRequest, logger: logging.Logger = Depend
             lines = f.readlines()
         
         with open(key_file_path, 'w', encoding='utf-8') as f:
-            f.writelines(line for line in lines if line.strip() != key_value)
+            f.writelines(line for line in lines if auth_utils.parse_key_line(line)[0] != key_value)
             
         auth_utils.initialize_keys()
         logger.info(f"API anahtarı silindi: {key_value[:4]}...{key_value[-4:]}")
@@ -7,9 +7,10 @@ import asyncio
 import json
 import time
 import datetime
-from typing import Any, Dict, List, Optional, AsyncGenerator
+from typing import Any, Dict, List, Optional, Tuple, AsyncGenerator
 from asyncio import Queue
 from models import Message
+from stream.ipc import STREAM_MESSAGE_VERSION, terminal_message
 import re
 import base64
 import requests
@@ -54,32 +55,51 @@ def generate_sse_error_chunk(message: str, req_id: str, error_type: str = "serve
 
 
 # --- Akış işleme araçları ---
-async def use_stream_response(req_id: str) -> AsyncGenerator[Any, None]:
-    """Sunucunun global kuyruğundan veri çekerek akış yanıtı kullanır"""
-    from server import STREAM_QUEUE, logger
-    import queue
+async def use_stream_response(req_id: str, stop_event: Optional[asyncio.Event] = None) -> AsyncGenerator[Any, None]:
+    """
+    Akış proxy kanalından bu isteğe ait mesajları, geldikleri anda yoklama yapmadan tüketir.
+    stop_event (istemci kopması / son tarih) ayarlandığında bir sonraki kare beklenmeden okuma sonlandırılır.
+    """
+    from server import STREAM_CHANNEL, logger
     
-    if STREAM_QUEUE is None:
-        logger.warning(f"[{req_id}] STREAM_QUEUE boş, akış yanıtı kullanılamıyor")
+    if STREAM_CHANNEL is None:
+        logger.warning(f"[{req_id}] STREAM_CHANNEL boş, akış yanıtı kullanılamıyor")
         return
     
+    # Kareler istek kimliğine göre ayrıştırılır; başka sayfaların üretimleri bu kuyruğa düşmez
+    stream_queue = STREAM_CHANNEL.open(req_id)
+    
     logger.info(f"[{req_id}] Akış yanıtı kullanılmaya başlandı")
     
-    empty_count = 0
-    max_empty_retries = 300  # 30 saniyelik zaman aşımı
+    wait_interval = 5.0  # durum kaydı aralığı (saniye)
+    max_idle_seconds = 30.0  # veri gelmezse zaman aşımı
+    idle_seconds = 0.0
     data_received = False
+    get_task: Optional[asyncio.Task] = None
+    stop_task = asyncio.ensure_future(stop_event.wait()) if stop_event is not None else None
     
     try:
         while True:
             try:
-                # Kuyruktan veri al
-                data = STREAM_QUEUE.get_nowait()
+                # Kanal okuyucusu mesajı kuyruğa koyduğu anda uyanılır; kopma/son tarih de aynı beklemeyi bitirir
+                if get_task is None:
+                    get_task = asyncio.ensure_future(stream_queue.get())
+                waiters = {get_task} if stop_task is None else {get_task, stop_task}
+                await asyncio.wait(waiters, timeout=wait_interval, return_when=asyncio.FIRST_COMPLETED)
+                if not get_task.done():
+                    if stop_task is not None and stop_task.done():
+                        logger.info(f"[{req_id}] İstemci koptu veya son tarih doldu; akış okuması sonlandırılıyor")
+                        yield terminal_message("stream_stopped")
+                        return
+                    raise asyncio.TimeoutError
+                data = get_task.result()
+                get_task = None
                 if data is None:  # Bitiş işareti
                     logger.info(f"[{req_id}] Akış bitiş sinyali alındı")
                     break
                 
-                # Boş sayaç sıfırla
-                empty_count = 0
+                # Boşta geçen süreyi sıfırla
+                idle_seconds = 0.0
                 data_received = True
                 logger.debug(f"[{req_id}] Akış verisi alındı: {type(data)} - {str(data)[:200]}...")
                 
@@ -106,51 +126,95 @@ async def use_stream_response(req_id: str) -> AsyncGenerator[Any, None]:
                         logger.info(f"[{req_id}] Sözlük formatında tamamlanma işareti alındı")
                         break
                 
-            except (queue.Empty, asyncio.QueueEmpty):
-                empty_count += 1
-                if empty_count % 50 == 0:  # Her 5 saniyede bekleme durumunu kaydet
-                    logger.info(f"[{req_id}] Akış verisi bekleniyor... ({empty_count}/{max_empty_retries})")
+            except asyncio.TimeoutError:
+                idle_seconds += wait_interval
+                logger.info(f"[{req_id}] Akış verisi bekleniyor... ({idle_seconds:.0f}/{max_idle_seconds:.0f}s)")
                 
-                if empty_count >= max_empty_retries:
+                if idle_seconds >= max_idle_seconds:
                     if not data_received:
                         logger.error(f"[{req_id}] Akış kuyruğunda veri alınamadı; yardımcı akış başlamamış olabilir")
                     else:
-                        logger.warning(f"[{req_id}] Akış kuyruğunda boş okuma sayısı limite ulaştı ({max_empty_retries}); okuma sonlandırılıyor")
+                        logger.warning(f"[{req_id}] Akış kanalında {max_idle_seconds:.0f}s boyunca veri gelmedi; okuma sonlandırılıyor")
                     
                     # Basitçe çıkmak yerine zaman aşımı tamamlanma sinyali gönder
-                    yield {"done": True, "reason": "internal_timeout", "body": "", "function": []}
+                    yield {"v": STREAM_MESSAGE_VERSION, "seq": None, "done": True, "reason": "", "body": "",
+                           "function": [], "error": "internal_timeout"}
                     return
-                    
-                await asyncio.sleep(0.1)  # 100ms bekle
                 continue
                 
     except Exception as e:
         logger.error(f"[{req_id}] Akış yanıtı kullanılırken hata: {e}")
         raise
     finally:
+        for task in (get_task, stop_task):
+            if task is not None and not task.done():
+                task.cancel()
         logger.info(f"[{req_id}] Akış yanıtı tamamlandı; veri alındı mı: {data_received}")
 
+
+class StreamDeltaAssembler:
+    """
+    Yardımcı akışın sıra numaralı delta mesajlarını birleştirir.
+    Her mesaj yalnızca yeni metni taşır; tam metin kullanım istatistiği için sonda bir kez oluşturulur.
+    """
+
+    def __init__(self, req_id: str):
+        self.req_id = req_id
+        self.next_seq = 0
+        self.functions: List[Dict[str, Any]] = []
+        self._reason_parts: List[str] = []
+        self._body_parts: List[str] = []
+
+    def add(self, message: Dict[str, Any]) -> Tuple[str, str, List[Dict[str, Any]]]:
+        """Mesajdaki yeni (reason, body, function) parçalarını döndürür; yinelenen veya uyumsuz mesajlar boş döner"""
+        from server import logger
+
+        if message.get("v") != STREAM_MESSAGE_VERSION:
+            logger.warning(f"[{self.req_id}] Desteklenmeyen akış mesajı sürümü: {message.get('v')}")
+            return "", "", []
+        seq = message.get("seq")
+        if seq is not None:
+            if seq < self.next_seq:
+                logger.warning(f"[{self.req_id}] Yinelenen akış mesajı atlandı (seq={seq})")
+                return "", "", []
+            if seq > self.next_seq:
+                logger.warning(f"[{self.req_id}] Akış mesajlarında boşluk: {self.next_seq} beklenirken {seq} geldi")
+            self.next_seq = seq + 1
+        reason = message.get("reason") or ""
+        body = message.get("body") or ""
+        functions = message.get("function") or []
+        if reason:
+            self._reason_parts.append(reason)
+        if body:
+            self._body_parts.append(body)
+        self.functions.extend(functions)
+        return reason, body, functions
+
+    @property
+    def reason(self) -> str:
+        return "".join(self._reason_parts)
+
+    @property
+    def body(self) -> str:
+        return "".join(self._body_parts)
+
 
-async def clear_stream_queue():
-    """Akış kuyruğunu temizler (orijinal davranış ile uyumlu)"""
-    from server import STREAM_QUEUE, logger
-    import queue
+async def clear_stream_queue(req_id: Optional[str] = None, error: str = "stream_released"):
+    """İsteğin akış kanalını kapatır (bekleyen okuyucu error ile sonlanır) ve etiketsiz kalan mesajları boşaltır"""
+    from server import STREAM_CHANNEL, STREAM_QUEUE, logger
 
-    if STREAM_QUEUE is None:
+    if STREAM_CHANNEL is None:
         logger.info("Akış kuyruğu başlatılmamış veya devre dışı; temizleme atlandı.")
         return
 
+    cleared = STREAM_CHANNEL.release(req_id, error) if req_id else 0
     while True:
         try:
-            data_chunk = await asyncio.to_thread(STREAM_QUEUE.get_nowait)
-            # logger.info(f"Akış kuyruğundaki veri temizlendi: {data_chunk}")
-        except queue.Empty:
-            logger.info("Akış kuyruğu boş (queue.Empty yakalandı).")
-            break
-        except Exception as e:
-            logger.error(f"Akış kuyruğu temizlenirken beklenmeyen hata: {e}", exc_info=True)
+            STREAM_QUEUE.get_nowait()
+            cleared += 1
+        except asyncio.QueueEmpty:
             break
-    logger.info("Akış kuyruğu temizliği tamamlandı.")
+    logger.info(f"Akış kuyruğu temizliği tamamlandı ({cleared} mesaj atıldı).")
 
 
 # --- Helper response generator ---
@@ -1,6 +1,6 @@
 # --- browser_utils/__init__.py ---
 # Tarayıcı işlem araçları modülü
-from .initialization import _initialize_page_logic, _close_page_logic, signal_camoufox_shutdown, enable_temporary_chat_mode
+from .initialization import _initialize_page_logic, _initialize_spare_page, _close_page_logic, signal_camoufox_shutdown, enable_temporary_chat_mode
 from .operations import (
     _handle_model_list_response,
     detect_and_extract_page_error,
@@ -24,10 +24,12 @@ from .model_management import (
     _verify_and_apply_ui_state
 )
 from .script_manager import ScriptManager, script_manager
+from .overlay_suppressor import OverlaySuppressor, sweep_overlays
 
 __all__ = [
     # Başlatma ile ilgili
     '_initialize_page_logic',
+    '_initialize_spare_page',
     '_close_page_logic',
     'signal_camoufox_shutdown',
     'enable_temporary_chat_mode',
@@ -56,5 +58,9 @@ __all__ = [
 
     # Script yönetimi ile ilgili
     'ScriptManager',
-    'script_manager'
+    'script_manager',
+
+    # Giriş penceresi bastırıcı
+    'OverlaySuppressor',
+    'sweep_overlays'
 ]
@@ -310,8 +310,12 @@ async def _wait_for_chat_ready(
     await _stop_active_generation(page)
 
 
-async def _initialize_page_logic(browser: AsyncBrowser) -> Tuple[Optional[AsyncPage], bool]:
-    """Create the Qwen chat page and ensure the UI is ready for use."""
+async def _initialize_page_logic(browser: AsyncBrowser, primary: bool = True) -> Tuple[Optional[AsyncPage], bool]:
+    """Create the Qwen chat page and ensure the UI is ready for use.
+
+    Secondary pages (``primary=False``) are used by the page pool: they skip the
+    model-list response hook and the interactive auth-state saving prompt.
+    """
 
     logger.info("Initialising Qwen chat page.")
     launch_mode = os.environ.get("LAUNCH_MODE", "debug").lower()
@@ -357,15 +361,20 @@ async def _initialize_page_logic(browser: AsyncBrowser) -> Tuple[Optional[AsyncP
 
             await script_manager.add_init_scripts(context)
 
+        if server.overlay_suppressor:
+            await server.overlay_suppressor.install(context)
+
         page = await context.new_page()
-        page.on("response", _handle_model_list_response)
+        if primary:
+            page.on("response", _handle_model_list_response)
 
         logger.info("Navigating to %s", target_url)
         await page.goto(target_url, wait_until="domcontentloaded", timeout=60000)
 
         await _wait_for_chat_ready(page, loop, target_host)
 
-        await _maybe_save_auth_state(context, loop, launch_mode)
+        if primary:
+            await _maybe_save_auth_state(context, loop, launch_mode)
 
         logger.info("Qwen chat page ready.")
         return page, True
@@ -381,6 +390,31 @@ async def _initialize_page_logic(browser: AsyncBrowser) -> Tuple[Optional[AsyncP
         return None, False
 
 
+async def _initialize_spare_page(context: AsyncBrowserContext, primary: bool = False) -> Optional[AsyncPage]:
+    """Open an extra Qwen chat tab in an existing context.
+
+    Used by the page pool to keep a pre-reset page ready next to each slot's
+    active page; the tab shares the context's cookies and init scripts.
+    """
+
+    page: Optional[AsyncPage] = None
+    try:
+        page = await context.new_page()
+        if primary:
+            page.on("response", _handle_model_list_response)
+        await page.goto(_build_target_url(), wait_until="domcontentloaded", timeout=60000)
+        await _wait_for_chat_ready(page, asyncio.get_running_loop(), _target_host())
+        return page
+    except Exception as exc:
+        logger.warning("Failed to prepare spare Qwen chat page: %s", exc)
+        if page:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        return None
+
+
 async def _close_page_logic():
     """Close the active page and its context if present."""
 
@@ -13,6 +13,7 @@ from playwright.async_api import Error as PlaywrightAsyncError, TimeoutError, ex
 
 from config import EXCLUDED_MODELS_FILENAME
 from .operations import get_default_qwen_models, save_error_snapshot
+from .overlay_suppressor import sweep_overlays
 
 logger = logging.getLogger("AIStudioProxyServer")
 
@@ -66,7 +67,23 @@ async def load_excluded_models(excluded_models_path: str = EXCLUDED_MODELS_FILEN
 
 
 async def _dismiss_dropdown_blockers(page, req_id: str = "unknown", attempts: int = 3) -> bool:
-    """Attempt to close modals/overlays that block the model dropdown."""
+    """Attempt to close modals/overlays that block the model dropdown.
+
+    With the in-page overlay suppressor active this is a single non-waiting
+    sweep (which also clicks a visible "Stop generating" button); otherwise each
+    known blocker selector is probed in turn.
+    """
+
+    handled = await sweep_overlays(page, stop_generation=True)
+    if handled is not None:
+        if handled:
+            logger.info(f"[{req_id}] Model açılır menüsünü engelleyen {handled} öğe kapatıldı.")
+            return True
+        try:
+            await page.keyboard.press("Escape")
+        except Exception:
+            pass
+        return False
 
     selectors = [
         "button[aria-label='Stop generating']",
@@ -114,8 +131,12 @@ async def _dismiss_dropdown_blockers(page, req_id: str = "unknown", attempts: in
 
     return dismissed_any
 
-async def _set_model_from_page_display(page, req_id: str = "unknown") -> Optional[str]:
-    """Extract the currently selected model from the dropdown button."""
+async def _set_model_from_page_display(page, req_id: str = "unknown", persist: bool = True) -> Optional[str]:
+    """Extract the currently selected model from the dropdown button.
+
+    When ``persist`` is False the value is only returned and the global
+    ``server.current_ai_studio_model_id`` is left untouched (used by pool pages).
+    """
 
     try:
         button = page.locator('#model-selector-0-button')
@@ -124,6 +145,8 @@ async def _set_model_from_page_display(page, req_id: str = "unknown") -> Optiona
         if text:
             logger.info(f"[{req_id}] Current Qwen model inferred from UI: {text}")
             display_name = text.split('\n')[0]
+            if not persist:
+                return display_name
             try:
                 import server
                 server.current_ai_studio_model_id = display_name
@@ -22,6 +22,32 @@ logger = logging.getLogger("AIStudioProxyServer")
 
 MODEL_LIST_REFRESH_TTL_SECONDS = int(os.environ.get("MODEL_LIST_REFRESH_TTL_SECONDS", "300"))
 
+# Labels of the "continue without logging in" buttons of the Qwen guest modals.
+AUTH_OVERLAY_BUTTON_TEXTS = [
+    "Stay logged out",
+    "Continue without logging in",
+    "Continue as guest",
+    "\u7ee7\u7eed\u672a\u767b\u5f55",
+    "\u7ee7\u7eed\u4e0d\u767b\u5f55",
+    "\u6682\u4e0d\u767b\u5f55",
+    "\u5148\u4e0d\u767b\u5f55",
+    "Not now",
+    "\u7a0d\u540e\u518d\u8bf4",
+]
+
+# Text fragments identifying sign-up/login overlays that can be removed from the DOM.
+AUTH_OVERLAY_TEXT_PATTERNS = [
+    "sign up to qwen",
+    "log in to qwen",
+    "continue with google",
+    "continue with github",
+    "already have an account",
+    "powered by open webui",
+    "welcome back to qwen",
+    "\u767b\u5f55",
+    "\u6ce8\u518c",
+]
+
 
 def _build_default_models() -> List[Dict[str, Any]]:
     """Produce a timestamped copy of the fallback model catalog."""
@@ -195,17 +221,7 @@ async def force_dismiss_auth_overlays(page, logger=None, req_id: str = "unknown"
     if not page or page.is_closed():
         return False
 
-    button_texts = [
-        "Stay logged out",
-        "Continue without logging in",
-        "Continue as guest",
-        "\u7ee7\u7eed\u672a\u767b\u5f55",
-        "\u7ee7\u7eed\u4e0d\u767b\u5f55",
-        "\u6682\u4e0d\u767b\u5f55",
-        "\u5148\u4e0d\u767b\u5f55",
-        "Not now",
-        "\u7a0d\u540e\u518d\u8bf4",
-    ]
+    button_texts = AUTH_OVERLAY_BUTTON_TEXTS
 
     # Try button-based variants first (preferred to DOM removal).
     for text in button_texts:
@@ -238,17 +254,7 @@ async def force_dismiss_auth_overlays(page, logger=None, req_id: str = "unknown"
             continue
 
     # Fallback: look for modern sign-up overlays and remove them directly.
-    patterns = [
-        "sign up to qwen",
-        "log in to qwen",
-        "continue with google",
-        "continue with github",
-        "already have an account",
-        "powered by open webui",
-        "welcome back to qwen",
-        "\u767b\u5f55",
-        "\u6ce8\u518c",
-    ]
+    patterns = AUTH_OVERLAY_TEXT_PATTERNS
 
     try:
         removed = await page.evaluate(
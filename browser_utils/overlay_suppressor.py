@@ -0,0 +1,292 @@
+"""Persistent in-page suppression of the Qwen guest/login overlays."""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from config import (
+    OVERLAY_SUPPRESSOR_ENABLED,
+    PROMPT_TEXTAREA_SELECTOR,
+    RESPONSE_CONTAINER_SELECTOR,
+)
+
+from .operations import AUTH_OVERLAY_BUTTON_TEXTS, AUTH_OVERLAY_TEXT_PATTERNS
+
+logger = logging.getLogger("AIStudioProxyServer")
+
+OVERLAY_SUPPRESSOR_BINDING = "__proxyOverlaySuppressed"
+OVERLAY_SUPPRESSOR_VERSION = 1
+
+# Labels of the buttons that stop an in-progress generation (they block the model dropdown).
+STOP_GENERATION_BUTTON_TEXTS = ["Stop", "\u505c\u6b62", "\u505c\u6b62\u751f\u6210"]
+
+_OVERLAY_SUPPRESSOR_TEMPLATE = """
+(() => {
+    const config = __CONFIG__;
+    const existing = window.__proxyOverlaySuppressor;
+    if (existing && existing.version >= config.version) {
+        return existing.counts;
+    }
+    if (existing) {
+        existing.stop();
+    }
+
+    const buttonTexts = config.buttonTexts.map(text => text.toLowerCase());
+    const patterns = config.patterns.map(text => text.toLowerCase());
+    const stopTexts = config.stopTexts.map(text => text.toLowerCase());
+    const protectedSelector = config.protect.join(', ');
+    const overlaySelector = 'div.fixed, div[role="dialog"], div[class*="shadow-qwen"]';
+    const candidateSelector = 'button, a, ' + overlaySelector;
+    const counts = { clicked: 0, removed: 0 };
+    let observer = null;
+    let scheduled = false;
+
+    const isVisible = (el) => !!(el && el.isConnected && el.getClientRects().length);
+    const labelOf = (el) => ((el.innerText || el.textContent || '') + '').trim();
+
+    const report = (kind, label) => {
+        counts[kind] += 1;
+        try {
+            const notify = window[config.binding];
+            if (typeof notify === 'function') {
+                const pending = notify({ kind, label: label.slice(0, 80) });
+                if (pending && typeof pending.catch === 'function') {
+                    pending.catch(() => {});
+                }
+            }
+        } catch (err) {}
+    };
+
+    const clickGuestButtons = () => {
+        let handled = 0;
+        for (const el of document.querySelectorAll('button, a')) {
+            const label = labelOf(el);
+            if (!label || label.length > 60 || !isVisible(el)) {
+                continue;
+            }
+            const lowered = label.toLowerCase();
+            if (buttonTexts.some(text => lowered.includes(text))) {
+                el.click();
+                report('clicked', label);
+                handled += 1;
+            }
+        }
+        return handled;
+    };
+
+    const removeOverlays = () => {
+        let handled = 0;
+        for (const node of document.querySelectorAll(overlaySelector)) {
+            if (!node.isConnected || (protectedSelector && node.querySelector(protectedSelector))) {
+                continue;
+            }
+            const text = (node.innerText || '').toLowerCase();
+            if (text && patterns.some(pattern => text.includes(pattern))) {
+                node.remove();
+                report('removed', text.trim());
+                handled += 1;
+            }
+        }
+        if (handled) {
+            for (const backdrop of document.querySelectorAll('div.fixed.inset-0')) {
+                if (!(backdrop.innerText || '').trim() && !backdrop.querySelector(protectedSelector || 'textarea')) {
+                    backdrop.remove();
+                }
+            }
+            if (document.body) {
+                document.body.style.overflow = '';
+            }
+        }
+        return handled;
+    };
+
+    const sweep = () => {
+        if (!document.body) {
+            return 0;
+        }
+        return clickGuestButtons() + removeOverlays();
+    };
+
+    const stopGeneration = () => {
+        for (const el of document.querySelectorAll('button')) {
+            if (!isVisible(el)) {
+                continue;
+            }
+            const aria = (el.getAttribute('aria-label') || '').toLowerCase();
+            const label = labelOf(el).toLowerCase();
+            if (aria === 'stop generating' || (label.length <= 24 && stopTexts.some(text => label.includes(text)))) {
+                el.click();
+                return 1;
+            }
+        }
+        return 0;
+    };
+
+    const schedule = () => {
+        if (scheduled) {
+            return;
+        }
+        scheduled = true;
+        setTimeout(() => {
+            scheduled = false;
+            try { sweep(); } catch (err) {}
+        }, 0);
+    };
+
+    // Streaming responses mutate the DOM constantly; only sweep when a mutation could carry an overlay.
+    const relevant = (records) => records.some(record => {
+        if (record.type === 'attributes') {
+            return record.target.nodeType === 1 && record.target.matches(overlaySelector);
+        }
+        for (const node of record.addedNodes) {
+            if (node.nodeType === 1 && (node.matches(candidateSelector) || node.querySelector(candidateSelector))) {
+                return true;
+            }
+        }
+        return false;
+    });
+
+    const start = () => {
+        const root = document.documentElement;
+        if (!root) {
+            return false;
+        }
+        observer = new MutationObserver(records => {
+            if (relevant(records)) {
+                schedule();
+            }
+        });
+        observer.observe(root, {
+            childList: true,
+            subtree: true,
+            attributes: true,
+            attributeFilter: ['class', 'style', 'hidden', 'open'],
+        });
+        schedule();
+        return true;
+    };
+
+    if (!start()) {
+        document.addEventListener('DOMContentLoaded', start, { once: true });
+    }
+
+    window.__proxyOverlaySuppressor = {
+        version: config.version,
+        counts,
+        sweep,
+        stopGeneration,
+        stop: () => observer && observer.disconnect(),
+    };
+    return counts;
+})()
+"""
+
+_SWEEP_SCRIPT = """(stopGeneration) => {
+    const suppressor = window.__proxyOverlaySuppressor;
+    if (!suppressor) {
+        return null;
+    }
+    let handled = suppressor.sweep();
+    if (stopGeneration) {
+        handled += suppressor.stopGeneration();
+    }
+    return handled;
+}"""
+
+
+def build_overlay_suppressor_script() -> str:
+    """Return the init script with the overlay labels and patterns embedded."""
+
+    config = {
+        "version": OVERLAY_SUPPRESSOR_VERSION,
+        "binding": OVERLAY_SUPPRESSOR_BINDING,
+        "buttonTexts": AUTH_OVERLAY_BUTTON_TEXTS,
+        "patterns": AUTH_OVERLAY_TEXT_PATTERNS,
+        "stopTexts": STOP_GENERATION_BUTTON_TEXTS,
+        "protect": [PROMPT_TEXTAREA_SELECTOR, RESPONSE_CONTAINER_SELECTOR],
+    }
+    return _OVERLAY_SUPPRESSOR_TEMPLATE.replace("__CONFIG__", json.dumps(config))
+
+
+async def sweep_overlays(page, stop_generation: bool = False) -> Optional[int]:
+    """Run one immediate pass of the in-page suppressor.
+
+    Returns the number of overlays handled (plus a clicked stop button when
+    ``stop_generation`` is set), or None when the suppressor is not active in
+    the page and the caller has to fall back to Playwright-driven dismissal.
+    """
+
+    if not page or page.is_closed():
+        return None
+    try:
+        handled = await page.evaluate(_SWEEP_SCRIPT, stop_generation)
+    except Exception:
+        return None
+    if isinstance(handled, bool) or not isinstance(handled, (int, float)):
+        return None
+    return int(handled)
+
+
+class OverlaySuppressor:
+    """Keeps the Qwen guest/login modals out of the way from inside the page.
+
+    The script is registered once per browser context, so every tab opened in
+    it (pool pages and their spare tabs) watches the DOM with a MutationObserver
+    from the first navigation on and clicks "continue as guest" buttons or
+    removes sign-up overlays as soon as they are inserted. Each action is
+    reported back through a context binding and counted here.
+    """
+
+    def __init__(self, enabled: bool = OVERLAY_SUPPRESSOR_ENABLED):
+        self.enabled = enabled
+        self.contexts = 0
+        self.clicked = 0
+        self.removed = 0
+        self.last_label: Optional[str] = None
+        self.last_at: Optional[float] = None
+        self._script = build_overlay_suppressor_script()
+
+    async def install(self, context) -> bool:
+        """Expose the report binding and register the init script on ``context``."""
+
+        if not self.enabled:
+            return False
+        try:
+            await context.expose_binding(OVERLAY_SUPPRESSOR_BINDING, self._on_report)
+            await context.add_init_script(self._script)
+        except Exception as exc:
+            logger.warning(f"Overlay suppressor could not be installed: {exc}")
+            return False
+        # Init scripts only apply to later navigations; start it in tabs that are already open.
+        for page in list(getattr(context, "pages", [])):
+            try:
+                await page.evaluate(self._script)
+            except Exception as exc:
+                logger.debug(f"Overlay suppressor could not start in an open tab: {exc}")
+        self.contexts += 1
+        return True
+
+    def _on_report(self, _source, payload) -> None:
+        if not isinstance(payload, dict) or payload.get("kind") not in ("clicked", "removed"):
+            return
+        kind = payload["kind"]
+        if kind == "clicked":
+            self.clicked += 1
+        else:
+            self.removed += 1
+        self.last_label = str(payload.get("label") or "")[:80]
+        self.last_at = time.time()
+        logger.info(f"Overlay suppressor {kind} a blocking auth overlay: '{self.last_label}'.")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "contexts": self.contexts,
+            "clicked": self.clicked,
+            "removed": self.removed,
+            "last_label": self.last_label,
+            "last_at": self.last_at,
+        }
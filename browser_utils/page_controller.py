@@ -3,14 +3,17 @@
 from __future__ import annotations
 
 import asyncio
+import os
 import re
-from typing import Callable, Optional
+import weakref
+from typing import Any, AsyncGenerator, Callable, Dict, Optional
 
 from playwright.async_api import expect as expect_async, TimeoutError, FilePayload
 from fastapi import HTTPException
 
 from config import (
     PROMPT_TEXTAREA_SELECTOR,
+    PROMPT_FILE_INPUT_SELECTOR,
     SUBMIT_BUTTON_SELECTOR,
     RESPONSE_CONTAINER_SELECTOR,
     RESPONSE_TEXT_SELECTOR,
@@ -19,9 +22,53 @@ from config import (
     CLEAR_CHAT_CONFIRM_BUTTON_SELECTOR,
     CLICK_TIMEOUT_MS,
     WAIT_FOR_ELEMENT_TIMEOUT_MS,
+    PAGE_READY_TIMEOUT_MS,
+    POST_COMPLETION_BUFFER,
+    SILENCE_TIMEOUT_MS,
+    PAGE_API_NEW_CHAT_PATH,
+    PAGE_API_COMPLETIONS_PATH,
 )
 from models import ClientDisconnectedError
-from .operations import save_error_snapshot, force_dismiss_auth_overlays
+from stream.ipc import NO_CAPTURE_HEADER, STREAM_MESSAGE_VERSION
+from stream.parsers import QwenSSEParser
+from .operations import (
+    save_error_snapshot,
+    force_dismiss_auth_overlays,
+    AUTH_OVERLAY_BUTTON_TEXTS,
+    AUTH_OVERLAY_TEXT_PATTERNS,
+)
+from .overlay_suppressor import sweep_overlays
+
+
+# Name of the page binding the response observer reports through, and the per-page
+# routing of its events to the waiting request (page -> {token: queue}).
+RESPONSE_DELTA_BINDING = "__proxyResponseDelta"
+_delta_sinks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+async def _ensure_delta_binding(page) -> Dict[str, asyncio.Queue]:
+    """Expose the delta binding once per page and return its token -> queue routing table."""
+    sinks = _delta_sinks.get(page)
+    if sinks is not None:
+        return sinks
+    sinks = {}
+
+    def _on_delta(_source, payload) -> None:
+        queue = sinks.get(payload.get("token")) if isinstance(payload, dict) else None
+        if queue is not None:
+            queue.put_nowait(payload)
+
+    _delta_sinks[page] = sinks
+    try:
+        await page.expose_binding(RESPONSE_DELTA_BINDING, _on_delta)
+    except Exception:
+        _delta_sinks.pop(page, None)
+        raise
+    return sinks
+
+
+class PageApiUnavailableError(Exception):
+    """The in-page API call failed before any output was produced; the DOM path can still be used."""
 
 
 class PageController:
@@ -121,7 +168,18 @@ class PageController:
             await textarea.fill(prompt)
 
     async def _dismiss_auth_suggestions(self) -> None:
-        """Close login prompts or full-screen modals that block interactions."""
+        """Close login prompts or full-screen modals that block interactions.
+
+        The in-page overlay suppressor normally handles them as they appear, so
+        this only runs one immediate sweep; the Playwright dismissal loop below
+        is used for pages where the suppressor is not active.
+        """
+
+        handled = await sweep_overlays(self.page)
+        if handled is not None:
+            if handled:
+                self.logger.info(f"[{self.req_id}] Overlay suppressor cleared {handled} auth overlay(s).")
+            return
 
         for attempt in range(3):
             try:
@@ -158,8 +216,12 @@ class PageController:
             )
 
     # ------------------------------------------------------------------
-    async def clear_chat_history(self, check_client_disconnected: Callable) -> None:
-        """Trigger the built-in new chat button."""
+    async def clear_chat_history(self, check_client_disconnected: Callable) -> bool:
+        """Trigger the built-in new chat button.
+
+        Returns ``True`` once a new chat was started, ``False`` if the reset
+        could not be triggered.
+        """
 
         self.logger.info(f"[{self.req_id}] Triggering new chat action...")
         self._check_disconnect(check_client_disconnected, "before-clear")
@@ -168,7 +230,7 @@ class PageController:
             self.logger.info(
                 f"[{self.req_id}] No clear chat selector configured – skipping."
             )
-            return
+            return False
 
         button_locator = self.page.locator(CLEAR_CHAT_BUTTON_SELECTOR)
         chat_reset_done = False
@@ -207,7 +269,7 @@ class PageController:
                     f"[{self.req_id}] JS fallback for new chat failed: {js_exc}"
                 )
         if not chat_reset_done:
-            return
+            return False
 
         if CLEAR_CHAT_CONFIRM_BUTTON_SELECTOR and CLEAR_CHAT_CONFIRM_BUTTON_SELECTOR != "[data-qwen-not-supported]":
             confirm_locator = self.page.locator(CLEAR_CHAT_CONFIRM_BUTTON_SELECTOR)
@@ -250,16 +312,242 @@ class PageController:
                 self.logger.warning(
                     f"[{self.req_id}] Unable to confirm textarea reset after new chat: {clear_err}"
                 )
+        return True
 
     # ------------------------------------------------------------------
+    _PAGE_READY_SCRIPT = """
+    ([submitSelector, spinnerSelector, textareaSelector]) => {
+        const isVisible = (el) => !!el && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+        for (const spinner of document.querySelectorAll(spinnerSelector)) {
+            if (isVisible(spinner)) return false;
+        }
+        const textarea = document.querySelector(textareaSelector);
+        if (!textarea || textarea.disabled || textarea.readOnly || (textarea.value || '').length > 0) return false;
+        const button = document.querySelector(submitSelector);
+        if (!button || button.getAttribute('aria-busy') === 'true') return false;
+        return true;
+    }
+    """
+
+    async def wait_until_ready(self, timeout_ms: int = PAGE_READY_TIMEOUT_MS) -> Optional[float]:
+        """Wait until the page can accept the next prompt.
+
+        The probe runs inside the page on every animation frame: no loading
+        spinner is visible, the textarea is enabled and empty, and the submit
+        button is present. Returns the seconds spent waiting, or ``None`` if
+        the page did not become ready within ``timeout_ms``.
+        """
+
+        started = asyncio.get_running_loop().time()
+        try:
+            await self.page.wait_for_function(
+                self._PAGE_READY_SCRIPT,
+                arg=[SUBMIT_BUTTON_SELECTOR, LOADING_SPINNER_SELECTOR, PROMPT_TEXTAREA_SELECTOR],
+                polling="raf",
+                timeout=timeout_ms,
+            )
+        except TimeoutError:
+            self.logger.warning(
+                f"[{self.req_id}] Page not ready after {timeout_ms} ms; continuing anyway."
+            )
+            return None
+        return asyncio.get_running_loop().time() - started
+
+    # ------------------------------------------------------------------
+    # Bump whenever _SUBMIT_ROUTINE_SCRIPT changes; the version is logged with every submission.
+    SUBMIT_ROUTINE_VERSION = 2
+
+    _SUBMIT_ROUTINE_SCRIPT = """
+    async ([version, opts]) => {
+        const started = performance.now();
+        const result = { version, ok: false, stage: 'textarea', dismissed: 0, attached: false, fileName: opts.fileName };
+        // Live progress record, read back by _SUBMIT_PROBE_SCRIPT if this call never returns a result
+        window.__proxySubmitRoutine = result;
+        const isVisible = (el) => !!el && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+        const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+        const waitFor = async (probe, timeoutMs) => {
+            const deadline = performance.now() + timeoutMs;
+            for (;;) {
+                const found = probe();
+                if (found || performance.now() >= deadline) return found;
+                await sleep(50);
+            }
+        };
+        const buttonTexts = opts.buttonTexts.map((text) => text.toLowerCase());
+        const patterns = opts.overlayPatterns.map((text) => text.toLowerCase());
+        const dismissOverlays = () => {
+            let count = 0;
+            for (const el of document.querySelectorAll('button, a')) {
+                const label = (el.innerText || '').trim().toLowerCase();
+                if (label && label.length < 60 && buttonTexts.some((text) => label.includes(text)) && isVisible(el)) {
+                    el.click();
+                    count += 1;
+                }
+            }
+            for (const node of document.querySelectorAll('div.fixed, div[role="dialog"], div[class*="shadow-qwen"]')) {
+                if (!node.isConnected || node.querySelector(opts.textareaSelector)) continue;
+                const text = (node.innerText || '').toLowerCase();
+                if (text && patterns.some((pattern) => text.includes(pattern))) {
+                    node.remove();
+                    count += 1;
+                }
+            }
+            if (count) document.body.style.overflow = '';
+            return count;
+        };
+
+        result.dismissed += dismissOverlays();
+        const textarea = await waitFor(() => {
+            const el = document.querySelector(opts.textareaSelector);
+            return isVisible(el) && !el.disabled && !el.readOnly ? el : null;
+        }, opts.elementTimeoutMs);
+        if (!textarea) return Object.assign(result, { error: 'prompt textarea is not visible or editable' });
+        textarea.focus();
+        textarea.dispatchEvent(new MouseEvent('click', { bubbles: true, cancelable: true }));
+
+        result.stage = 'upload';
+        const fileInput = document.querySelector(opts.fileInputSelector);
+        if (!fileInput) return Object.assign(result, { error: 'prompt file input not found' });
+        const transfer = new DataTransfer();
+        transfer.items.add(new File([opts.prompt], opts.fileName, { type: 'text/plain' }));
+        fileInput.files = transfer.files;
+        fileInput.dispatchEvent(new Event('input', { bubbles: true }));
+        fileInput.dispatchEvent(new Event('change', { bubbles: true }));
+        result.attached = true;
+
+        result.stage = 'fill';
+        const descriptor = Object.getOwnPropertyDescriptor(HTMLTextAreaElement.prototype, 'value');
+        if (descriptor && descriptor.set) {
+            descriptor.set.call(textarea, opts.text);
+        } else {
+            textarea.value = opts.text;
+        }
+        if (textarea._valueTracker) textarea._valueTracker.setValue('');
+        textarea.dispatchEvent(new Event('input', { bubbles: true }));
+        textarea.dispatchEvent(new Event('change', { bubbles: true }));
+        result.valueLength = textarea.value.length;
+        result.dismissed += dismissOverlays();
+
+        // The send button stays disabled until the attachment has been accepted
+        result.stage = 'submit';
+        const button = await waitFor(() => {
+            const el = document.querySelector(opts.submitSelector);
+            return isVisible(el) && !el.disabled && el.getAttribute('aria-disabled') !== 'true' ? el : null;
+        }, opts.clickTimeoutMs);
+        if (!button) return Object.assign(result, { error: 'send button did not become enabled' });
+        result.responseCount = document.querySelectorAll(opts.responseSelector).length;
+        button.click();
+
+        result.ok = true;
+        result.stage = 'submitted';
+        result.elapsedMs = Math.round(performance.now() - started);
+        return result;
+    }
+    """
+
+    _SUBMIT_PROBE_SCRIPT = """
+    (opts) => {
+        const state = window.__proxySubmitRoutine;
+        if (!state || state.fileName !== opts.fileName) return null;
+        return {
+            stage: state.stage,
+            attached: !!state.attached,
+            responseCount: state.responseCount,
+            currentCount: document.querySelectorAll(opts.responseSelector).length,
+        };
+    }
+    """
+
     async def submit_prompt(
         self, prompt: str, image_list, check_client_disconnected: Callable
     ) -> None:
-        """Fill the Qwen textarea and submit the prompt."""
+        """Attach the prompt and submit it.
+
+        One injected routine dismisses guest overlays, attaches the prompt file,
+        clears the textarea, snapshots the response count and clicks send in a
+        single round-trip. The step-by-step Playwright path only runs if the
+        routine could not finish.
+        """
 
         self.logger.info(f"[{self.req_id}] Preparing to submit prompt…")
         self._check_disconnect(check_client_disconnected, "before-submit")
 
+        self._uploaded_prompt_filename = None
+        file_name = f"user_prompt_{self.req_id}.txt"
+        try:
+            result = await self.page.evaluate(
+                self._SUBMIT_ROUTINE_SCRIPT,
+                [
+                    self.SUBMIT_ROUTINE_VERSION,
+                    {
+                        "prompt": prompt,
+                        "fileName": file_name,
+                        "text": "",
+                        "textareaSelector": PROMPT_TEXTAREA_SELECTOR,
+                        "fileInputSelector": PROMPT_FILE_INPUT_SELECTOR,
+                        "submitSelector": SUBMIT_BUTTON_SELECTOR,
+                        "responseSelector": RESPONSE_CONTAINER_SELECTOR,
+                        "buttonTexts": AUTH_OVERLAY_BUTTON_TEXTS,
+                        "overlayPatterns": AUTH_OVERLAY_TEXT_PATTERNS,
+                        "elementTimeoutMs": WAIT_FOR_ELEMENT_TIMEOUT_MS,
+                        "clickTimeoutMs": CLICK_TIMEOUT_MS,
+                    },
+                ],
+            )
+        except Exception as routine_err:
+            result = {"ok": False, "stage": "evaluate", "error": str(routine_err)}
+        if not isinstance(result, dict):
+            result = {"ok": False, "stage": "evaluate", "error": f"unexpected result {result!r}"}
+        if result.get("stage") == "evaluate":
+            result = await self._probe_submit_routine(file_name, result)
+
+        if result.get("ok"):
+            self._uploaded_prompt_filename = file_name
+            self._response_count_before_submit = result.get("responseCount")
+            self.logger.info(
+                f"[{self.req_id}] Prompt submitted by routine v{result.get('version')} in {result.get('elapsedMs')} ms "
+                f"({len(prompt)} chars as {file_name}, {result.get('dismissed', 0)} overlay(s) dismissed)."
+            )
+        else:
+            self.logger.warning(
+                f"[{self.req_id}] Submit routine v{self.SUBMIT_ROUTINE_VERSION} stopped at '{result.get('stage')}' "
+                f"({result.get('error')}); continuing with Playwright steps."
+            )
+            await self._submit_prompt_stepwise(prompt, file_name, attached=bool(result.get("attached")))
+
+        self._check_disconnect(check_client_disconnected, "after-submit")
+
+    async def _probe_submit_routine(self, file_name: str, result: dict) -> dict:
+        """Recover how far the routine got when its evaluate call failed.
+
+        The routine may have attached the file or clicked send before the call
+        broke, so the stepwise fallback must not blindly repeat those steps.
+        """
+
+        try:
+            state = await self.page.evaluate(
+                self._SUBMIT_PROBE_SCRIPT,
+                {"fileName": file_name, "responseSelector": RESPONSE_CONTAINER_SELECTOR},
+            )
+        except Exception as probe_err:
+            self.logger.debug(f"[{self.req_id}] Submit routine probe failed: {probe_err}")
+            return result
+        if not isinstance(state, dict):
+            return result
+
+        response_count = state.get("responseCount")
+        submitted = state.get("stage") == "submitted" or (
+            response_count is not None and (state.get("currentCount") or 0) > response_count
+        )
+        if submitted:
+            self.logger.info(f"[{self.req_id}] Submit routine call failed after the prompt was sent; not resubmitting.")
+            return {**result, "ok": True, "version": self.SUBMIT_ROUTINE_VERSION, "responseCount": response_count,
+                    "attached": True}
+        return {**result, "attached": bool(state.get("attached"))}
+
+    async def _submit_prompt_stepwise(self, prompt: str, file_name: str, attached: bool = False) -> None:
+        """Playwright fallback for submit_prompt: one call per step, each with its own timeout."""
+
         textarea = self.page.locator(PROMPT_TEXTAREA_SELECTOR)
         await expect_async(textarea).to_be_visible(timeout=WAIT_FOR_ELEMENT_TIMEOUT_MS)
         try:
@@ -305,31 +593,33 @@ class PageController:
         await self._dismiss_auth_suggestions()
 
         prompt_to_fill = ""
-        self._uploaded_prompt_filename = None
 
-        file_name = f"user_prompt_{self.req_id}.txt"
-        file_payload = FilePayload(
-            name=file_name,
-            mimeType="text/plain",
-            buffer=prompt.encode("utf-8"),
-        )
-
-        file_input = self.page.locator("#filesUpload")
-        try:
-            await file_input.set_input_files(file_payload)
+        if attached:
+            # The submit routine already attached the file; attaching again would add a second copy
             self._uploaded_prompt_filename = file_name
-            self.logger.info(
-                f"[{self.req_id}] Uploaded prompt as attachment {file_name} ({len(prompt)} chars)."
-            )
-        except Exception as upload_err:
-            self.logger.error(
-                f"[{self.req_id}] Failed to upload prompt as file: {upload_err}"
-            )
-            raise HTTPException(
-                status_code=500,
-                detail=f"[{self.req_id}] Prompt file upload failed: {upload_err}"
+        else:
+            file_payload = FilePayload(
+                name=file_name,
+                mimeType="text/plain",
+                buffer=prompt.encode("utf-8"),
             )
 
+            file_input = self.page.locator(PROMPT_FILE_INPUT_SELECTOR)
+            try:
+                await file_input.set_input_files(file_payload)
+                self._uploaded_prompt_filename = file_name
+                self.logger.info(
+                    f"[{self.req_id}] Uploaded prompt as attachment {file_name} ({len(prompt)} chars)."
+                )
+            except Exception as upload_err:
+                self.logger.error(
+                    f"[{self.req_id}] Failed to upload prompt as file: {upload_err}"
+                )
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"[{self.req_id}] Prompt file upload failed: {upload_err}"
+                )
+
         # No additional text; rely solely on the uploaded file.
 
         await self._set_textarea_value(textarea, prompt_to_fill)
@@ -363,9 +653,169 @@ class PageController:
             await self._dismiss_auth_suggestions()
             await textarea.press("Enter")
 
-        self._check_disconnect(check_client_disconnected, "after-submit")
 
     # ------------------------------------------------------------------
+    _RESPONSE_OBSERVER_SCRIPT = """
+    ([binding, token, containerSelector, textSelector, expectedIndex, submitSelector, spinnerSelector, settleMs]) => {
+        const registry = window.__proxyResponseObservers || (window.__proxyResponseObservers = {});
+        for (const stopPrevious of Object.values(registry)) stopPrevious();
+
+        const isVisible = (el) => !!el && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+        const emit = (payload) => {
+            try { window[binding](Object.assign({ token }, payload)); } catch (e) {}
+        };
+        const currentText = () => {
+            const container = document.querySelectorAll(containerSelector)[expectedIndex];
+            if (!container) return null;
+            const el = container.querySelector(textSelector) || container;
+            return el.innerText || '';
+        };
+        const busy = () => {
+            for (const spinner of document.querySelectorAll(spinnerSelector)) {
+                if (isVisible(spinner)) return true;
+            }
+            const button = document.querySelector(submitSelector);
+            return !button || button.getAttribute('aria-busy') === 'true';
+        };
+
+        const holdBack = 16;
+        const markerChars = '*_`~#>[]()!|\\-';
+        let sent = '';
+        let lastText = null;
+        let lastChange = Date.now();
+        let finished = false;
+        let scheduled = false;
+
+        const flush = (final) => {
+            const text = currentText();
+            if (text === null) return;
+            if (text !== lastText) {
+                lastText = text;
+                lastChange = Date.now();
+            }
+            if (!text.startsWith(sent)) {
+                // Markdown re-rendering rewrote text that was already sent
+                if (final) emit({ diverged: true, length: text.length });
+                return;
+            }
+            let upto = text.length;
+            if (!final) {
+                // Hold back only a short tail from the first markdown marker in it: an unfinished
+                // marker is re-rendered once complete. Text without spaces (CJK) still streams.
+                for (let i = Math.max(sent.length, text.length - holdBack); i < text.length; i++) {
+                    if (markerChars.includes(text[i])) {
+                        upto = i;
+                        break;
+                    }
+                }
+                const code = text.charCodeAt(upto - 1);
+                if (code >= 0xD800 && code <= 0xDBFF) upto -= 1;
+            }
+            if (upto > sent.length) {
+                emit({ delta: text.slice(sent.length, upto) });
+                sent = text.slice(0, upto);
+            }
+        };
+        const stop = (complete) => {
+            if (finished) return;
+            finished = true;
+            observer.disconnect();
+            clearInterval(timer);
+            delete registry[token];
+            if (complete) {
+                flush(true);
+                emit({ done: true });
+            }
+        };
+        const observer = new MutationObserver(() => {
+            if (scheduled || finished) return;
+            scheduled = true;
+            Promise.resolve().then(() => { scheduled = false; if (!finished) flush(false); });
+        });
+        observer.observe(document.body, { childList: true, subtree: true, characterData: true });
+        const timer = setInterval(() => {
+            flush(false);
+            if (lastText && lastText.trim() && !busy() && Date.now() - lastChange >= settleMs) stop(true);
+        }, 100);
+        registry[token] = () => stop(false);
+        return true;
+    }
+    """
+
+    async def stream_response(self, check_client_disconnected: Callable) -> AsyncGenerator[str, None]:
+        """Yield the assistant response as text deltas while it is being rendered.
+
+        A MutationObserver injected into the page watches the new response
+        container and pushes each newly rendered piece of text to Python through
+        an exposed binding, so deltas reach the caller as soon as the page shows
+        them. The stream ends once the text has been stable for
+        ``POST_COMPLETION_BUFFER`` ms with no spinner and an idle send button.
+        """
+
+        self.logger.info(f"[{self.req_id}] Streaming Qwen response from the page…")
+        self._check_disconnect(check_client_disconnected, "before-response")
+
+        token = self.req_id
+        sinks = await _ensure_delta_binding(self.page)
+        queue: asyncio.Queue = asyncio.Queue()
+        sinks[token] = queue
+        streamed_chars = 0
+        try:
+            await self.page.evaluate(
+                self._RESPONSE_OBSERVER_SCRIPT,
+                [
+                    RESPONSE_DELTA_BINDING, token,
+                    RESPONSE_CONTAINER_SELECTOR, RESPONSE_TEXT_SELECTOR,
+                    self._response_count_before_submit or 0,
+                    SUBMIT_BUTTON_SELECTOR, LOADING_SPINNER_SELECTOR, POST_COMPLETION_BUFFER,
+                ],
+            )
+            # Before the first delta allow as long as get_response waited for text to appear
+            idle_limit = 120.0
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=idle_limit)
+                except asyncio.TimeoutError:
+                    self.logger.warning(
+                        f"[{self.req_id}] No response progress on the page for {idle_limit:.0f}s; ending stream."
+                    )
+                    await save_error_snapshot(f"response_stream_timeout_{self.req_id}")
+                    break
+                self._check_disconnect(check_client_disconnected, "response-stream")
+                if event.get("delta"):
+                    streamed_chars += len(event["delta"])
+                    idle_limit = SILENCE_TIMEOUT_MS / 1000
+                    yield event["delta"]
+                if event.get("diverged"):
+                    self.logger.warning(
+                        f"[{self.req_id}] Rendered response changed after streaming ({event.get('length')} chars); "
+                        "already sent text is kept."
+                    )
+                if event.get("done"):
+                    break
+        finally:
+            sinks.pop(token, None)
+            try:
+                await self.page.evaluate(
+                    "(token) => { const stop = (window.__proxyResponseObservers || {})[token]; if (stop) stop(); }",
+                    token,
+                )
+            except Exception:
+                pass
+
+        # Close post-response login prompts if they appear (e.g. "Stay logged out");
+        # a single sweep when the overlay suppressor is active.
+        await self._dismiss_auth_suggestions()
+
+        if not streamed_chars:
+            # Nothing rendered as text: let get_response apply its fallbacks and error reporting
+            content = await self.get_response(check_client_disconnected)
+            if content:
+                yield content
+            return
+
+        self.logger.info(f"[{self.req_id}] Streamed response with {streamed_chars} characters.")
+
     async def get_response(self, check_client_disconnected: Callable) -> str:
         """Wait for the assistant response rendered on the page."""
 
@@ -406,7 +856,8 @@ class PageController:
         except Exception:
             pass
 
-        # Close post-response login prompts if they appear (e.g. "Stay logged out").
+        # Close post-response login prompts if they appear (e.g. "Stay logged out");
+        # a single sweep when the overlay suppressor is active.
         await self._dismiss_auth_suggestions()
 
         # Wait for submit button to re-enable as a proxy that streaming finished.
@@ -461,3 +912,171 @@ class PageController:
             f"[{self.req_id}] Retrieved response with {len(content.strip())} characters."
         )
         return content
+
+    # ------------------------------------------------------------------
+    # In-page API mode
+    # ------------------------------------------------------------------
+    _PAGE_API_FETCH_SCRIPT = r"""
+    async ([binding, token, newChatPath, completionsPath, modelId, prompt, noCaptureHeader]) => {
+        const controller = new AbortController();
+        const registry = window.__proxyPageApiRequests = window.__proxyPageApiRequests || {};
+        registry[token] = () => controller.abort();
+        const emit = (payload) => window[binding](Object.assign({ token }, payload));
+        const uuid = () => (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, (c) => {
+                const r = Math.random() * 16 | 0;
+                return (c === 'x' ? r : (r & 0x3) | 0x8).toString(16);
+            });
+        const headers = { 'Content-Type': 'application/json', 'Accept': 'application/json' };
+        const authToken = window.localStorage && localStorage.getItem('token');
+        if (authToken) headers['Authorization'] = 'Bearer ' + authToken;
+        // The response is read here; keep the stream proxy from capturing it a second time
+        if (noCaptureHeader) headers[noCaptureHeader] = '1';
+        const post = (url, body, accept) => fetch(url, {
+            method: 'POST',
+            credentials: 'include',
+            signal: controller.signal,
+            headers: accept ? Object.assign({}, headers, { 'Accept': accept }) : headers,
+            body: JSON.stringify(body),
+        });
+        const failed = async (stage, response) => {
+            let detail = '';
+            try { detail = (await response.text()).slice(0, 500); } catch (e) {}
+            return { ok: false, stage, status: response.status, error: detail };
+        };
+        try {
+            const created = await post(newChatPath, {
+                title: 'New Chat', models: [modelId], chat_mode: 'normal', chat_type: 't2t', timestamp: Date.now(),
+            });
+            if (!created.ok) return await failed('new-chat', created);
+            const chat = await created.json().catch(() => null);
+            const chatId = chat && chat.data && chat.data.id;
+            if (!chatId) return { ok: false, stage: 'new-chat', status: created.status, error: JSON.stringify(chat).slice(0, 500) };
+
+            const now = Math.floor(Date.now() / 1000);
+            const response = await post(completionsPath + '?chat_id=' + encodeURIComponent(chatId), {
+                stream: true, incremental_output: true, chat_id: chatId, chat_mode: 'normal', model: modelId, parent_id: null,
+                messages: [{
+                    fid: uuid(), parentId: null, childrenIds: [], role: 'user', content: prompt, user_action: 'chat',
+                    files: [], timestamp: now, models: [modelId], chat_type: 't2t', sub_chat_type: 't2t',
+                    feature_config: { thinking_enabled: false, output_schema: 'phase' },
+                    extra: { meta: { subChatType: 't2t' } },
+                }],
+                timestamp: now,
+            }, 'text/event-stream');
+            const contentType = response.headers.get('content-type') || '';
+            if (!response.ok || !response.body || !contentType.includes('text/event-stream')) {
+                return await failed('completion', response);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            for (;;) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                const chunk = decoder.decode(value, { stream: true });
+                if (chunk) await emit({ chunk });
+            }
+            const tail = decoder.decode();
+            if (tail) await emit({ chunk: tail });
+            return { ok: true, chatId };
+        } catch (e) {
+            return { ok: false, stage: 'fetch', status: 0, error: String((e && e.message) || e) };
+        } finally {
+            delete registry[token];
+        }
+    }
+    """
+
+    async def stream_completion_via_api(
+        self, prompt: str, model_id: str, check_client_disconnected: Callable
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Run the prompt through the site's own chat API from inside the page.
+
+        ``page.evaluate`` issues the ``fetch`` calls with the page's session, so
+        no textarea, upload or submit-button step is involved. The event-stream
+        body is pushed back through the delta binding as it arrives and parsed
+        with ``QwenSSEParser``; the generator yields the same versioned delta
+        messages as the stream proxy. ``PageApiUnavailableError`` is raised if
+        the API fails before any output, so the caller can use the DOM path.
+        """
+
+        self.logger.info(f"[{self.req_id}] Sending prompt through the in-page API ({model_id})…")
+        self._check_disconnect(check_client_disconnected, "before-page-api")
+
+        token = f"{self.req_id}:api"
+        sinks = await _ensure_delta_binding(self.page)
+        queue: asyncio.Queue = asyncio.Queue()
+        sinks[token] = queue
+        parser = QwenSSEParser()
+        seq = 0
+        error: Optional[str] = None
+        fetch_task = asyncio.ensure_future(self.page.evaluate(
+            self._PAGE_API_FETCH_SCRIPT,
+            [RESPONSE_DELTA_BINDING, token, PAGE_API_NEW_CHAT_PATH, PAGE_API_COMPLETIONS_PATH, model_id, prompt,
+             NO_CAPTURE_HEADER if os.environ.get("STREAM_PORT") != "0" else None],
+        ))
+        try:
+            # Before the first delta allow as long as the DOM path waits for text to appear
+            idle_limit = 120.0
+            while not parser.finished:
+                if fetch_task.done() and queue.empty():
+                    break
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, fetch_task}, timeout=idle_limit, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    if fetch_task.done():
+                        continue  # every chunk was delivered before evaluate returned
+                    if not seq:
+                        raise PageApiUnavailableError(f"no response from the in-page API for {idle_limit:.0f}s")
+                    self.logger.warning(f"[{self.req_id}] In-page API stream stalled for {idle_limit:.0f}s; ending stream.")
+                    error = "in-page API stream stalled"
+                    break
+                self._check_disconnect(check_client_disconnected, "page-api-stream")
+                delta = parser.feed(getter.result().get("chunk", "").encode("utf-8"))
+                if parser.error and not seq:
+                    raise PageApiUnavailableError(f"upstream error: {parser.error}")
+                if delta["reason"] or delta["body"] or delta["function"]:
+                    idle_limit = SILENCE_TIMEOUT_MS / 1000
+                    # seq starts at 0 like the proxy's messages; it also counts the deltas sent so far
+                    yield {"v": STREAM_MESSAGE_VERSION, "seq": seq, **delta, "done": False}
+                    seq += 1
+
+            result = None
+            if fetch_task.done():
+                fetch_error = fetch_task.exception()
+                result = fetch_task.result() if fetch_error is None else {
+                    "ok": False, "stage": "evaluate", "status": 0, "error": str(fetch_error),
+                }
+            if isinstance(result, dict) and not result.get("ok"):
+                detail = f"{result.get('stage')} failed ({result.get('status')}): {result.get('error')}"
+                if not seq:
+                    raise PageApiUnavailableError(detail)
+                error = error or detail
+            elif not seq and not parser.finished:
+                raise PageApiUnavailableError("the in-page API stream ended without output")
+            error = error or parser.error
+        finally:
+            sinks.pop(token, None)
+            if not fetch_task.done():
+                try:
+                    await self.page.evaluate(
+                        "(token) => { const abort = (window.__proxyPageApiRequests || {})[token]; if (abort) abort(); }",
+                        token,
+                    )
+                except Exception:
+                    pass
+                try:
+                    await asyncio.wait_for(fetch_task, timeout=5)
+                except Exception:
+                    fetch_task.cancel()
+            elif not fetch_task.cancelled():
+                fetch_task.exception()  # retrieved here so a failed evaluate is not reported as unhandled
+
+        final = {"v": STREAM_MESSAGE_VERSION, "seq": seq, "reason": "", "body": "", "function": [], "done": True}
+        if error:
+            final["error"] = error
+        self.logger.info(f"[{self.req_id}] In-page API stream finished after {seq} delta messages.")
+        yield final
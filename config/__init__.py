@@ -22,6 +22,7 @@ __all__ = [
     'DEFAULT_STOP_SEQUENCES',
     'AI_STUDIO_URL_PATTERN',
     'MODELS_ENDPOINT_URL_CONTAINS',
+    'STREAM_CAPTURE_URL_GLOBS',
     'USER_INPUT_START_MARKER_SERVER',
     'USER_INPUT_END_MARKER_SERVER',
     'EXCLUDED_MODELS_FILENAME',
@@ -41,6 +42,7 @@ __all__ = [
     'CLICK_TIMEOUT_MS',
     'CLIPBOARD_READ_TIMEOUT_MS',
     'WAIT_FOR_ELEMENT_TIMEOUT_MS',
+    'PAGE_READY_TIMEOUT_MS',
     'PSEUDO_STREAM_DELAY',
     
     # Seçici (selector) yapılandırmaları
@@ -48,6 +50,7 @@ __all__ = [
     'INPUT_SELECTOR',
     'INPUT_SELECTOR2',
     'SUBMIT_BUTTON_SELECTOR',
+    'PROMPT_FILE_INPUT_SELECTOR',
     'CLEAR_CHAT_BUTTON_SELECTOR',
     'CLEAR_CHAT_CONFIRM_BUTTON_SELECTOR',
     'RESPONSE_CONTAINER_SELECTOR',
@@ -84,6 +87,37 @@ __all__ = [
     'ENABLE_SCRIPT_INJECTION',
     'USERSCRIPT_PATH',
     'ENABLE_QWEN_LOGIN_SUPPORT',
+    'PAGE_POOL_MIN_SIZE',
+    'PAGE_POOL_MAX_SIZE',
+    'PAGE_POOL_IDLE_TIMEOUT',
+    'PAGE_POOL_SCALE_INTERVAL',
+    'PAGE_POOL_SPARE_PAGE',
+    'DEFAULT_REQUEST_TIMEOUT_SECONDS',
+    'MODEL_AFFINITY_MAX_SKIPS',
+    'MODEL_PRESWITCH_ENABLED',
+    'MODEL_PRESWITCH_IDLE_SECONDS',
+    'MODEL_DEMAND_DECAY',
+    'ADMISSION_CONTROL_ENABLED',
+    'ADMISSION_MAX_QUEUE_WAIT_SECONDS',
+    'ADMISSION_EWMA_ALPHA',
+    'ADMISSION_DEFAULT_SERVICE_TIME',
+    'PREFETCH_DEPTH',
+    'REQUEST_COALESCING_ENABLED',
+    'RESPONSE_CACHE_ENABLED',
+    'RESPONSE_CACHE_MAX_ENTRIES',
+    'RESPONSE_CACHE_TTL_SECONDS',
+    'RESPONSE_CACHE_DB_PATH',
+    'BATCH_STORAGE_DIR',
+    'BATCH_IDLE_POLL_INTERVAL',
+    'PAGE_API_MODE_ENABLED',
+    'PAGE_API_NEW_CHAT_PATH',
+    'PAGE_API_COMPLETIONS_PATH',
+    'HTTP_BACKEND_ENABLED',
+    'HTTP_BACKEND_BASE_URL',
+    'HTTP_BACKEND_MAX_CONNECTIONS',
+    'HTTP_BACKEND_READ_TIMEOUT_SECONDS',
+    'HTTP_BACKEND_CREDENTIAL_MARGIN_SECONDS',
+    'OVERLAY_SUPPRESSOR_ENABLED',
 
     # Yardımcı fonksiyonlar
     'get_environment_variable',
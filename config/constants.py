@@ -73,6 +73,8 @@ except (json.JSONDecodeError, TypeError):
 # --- URL kalıpları ---
 AI_STUDIO_URL_PATTERN = os.environ.get('AI_STUDIO_URL_PATTERN', 'chat.qwen.ai/')
 MODELS_ENDPOINT_URL_CONTAINS = os.environ.get('MODELS_ENDPOINT_URL_CONTAINS', "api/chat")
+# Yardımcı akış proxy'sinin yakaladığı üretim istekleri; tarayıcı bunlara istek kimliği başlığı ekler
+STREAM_CAPTURE_URL_GLOBS = ["**/*GenerateContent*", "**/api/chat/completions*", "**/api/v2/chat/completions*"]
 
 # --- Girdi belirteçleri ---
 USER_INPUT_START_MARKER_SERVER = os.environ.get('USER_INPUT_START_MARKER_SERVER', "__USER_INPUT_START__")
@@ -13,6 +13,7 @@ SUBMIT_BUTTON_SELECTOR = '#send-message-button'
 CLEAR_CHAT_BUTTON_SELECTOR = '#new-chat-button'
 CLEAR_CHAT_CONFIRM_BUTTON_SELECTOR = '[data-qwen-not-supported]'
 UPLOAD_BUTTON_SELECTOR = 'button.chat-prompt-upload-group-btn'
+PROMPT_FILE_INPUT_SELECTOR = '#filesUpload'
 
 # --- Yanıt ile ilgili seçiciler ---
 RESPONSE_CONTAINER_SELECTOR = '.response-meesage-container, .response-message-body--media'
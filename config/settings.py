@@ -55,3 +55,72 @@ USERSCRIPT_PATH = get_environment_variable('USERSCRIPT_PATH', 'browser_utils/mor
 
 # --- Qwen'e özgü ayarlar ---
 ENABLE_QWEN_LOGIN_SUPPORT = get_boolean_env('ENABLE_QWEN_LOGIN_SUPPORT', False)
+
+# --- Sayfa havuzu (worker pool) ayarları ---
+# Her sayfa kendi tarayıcı bağlamına, PageController'ına ve worker döngüsüne sahiptir.
+PAGE_POOL_MIN_SIZE = max(1, get_int_env('PAGE_POOL_MIN_SIZE', 1))
+PAGE_POOL_MAX_SIZE = max(PAGE_POOL_MIN_SIZE, get_int_env('PAGE_POOL_MAX_SIZE', 1))
+PAGE_POOL_IDLE_TIMEOUT = get_int_env('PAGE_POOL_IDLE_TIMEOUT', 300)  # saniye; fazladan sayfalar bu süre boşta kalırsa kapatılır
+PAGE_POOL_SCALE_INTERVAL = float(os.environ.get('PAGE_POOL_SCALE_INTERVAL', '2.0'))  # saniye
+# Her sayfanın yanında önceden sıfırlanmış bir yedek sekme tutulur; istek sonrası sekmeler takas edilir ve kullanılan sekme arka planda sıfırlanır.
+PAGE_POOL_SPARE_PAGE = get_boolean_env('PAGE_POOL_SPARE_PAGE', False)
+
+# --- İstek son tarihi (deadline) ayarları ---
+# X-Request-Timeout başlığı veya request_timeout alanı verilmediğinde kullanılacak süre (saniye, 0 = son tarih yok).
+DEFAULT_REQUEST_TIMEOUT_SECONDS = float(os.environ.get('DEFAULT_REQUEST_TIMEOUT_SECONDS', '0'))
+
+# --- Model yakınlığı (affinity) ayarları ---
+# Boşta bir sayfanın aktif modelini isteyen kuyruktaki istekler öne alınır; sırası gelen istek en fazla bu kadar atlanabilir (0 = kapalı).
+MODEL_AFFINITY_MAX_SKIPS = max(0, get_int_env('MODEL_AFFINITY_MAX_SKIPS', 0))
+# Kuyruk boşken boşta bir sayfa, yakın geçmişte en çok istenen modele önceden geçirilir (varsayılan kapalı).
+MODEL_PRESWITCH_ENABLED = get_boolean_env('MODEL_PRESWITCH_ENABLED', False)
+MODEL_PRESWITCH_IDLE_SECONDS = float(os.environ.get('MODEL_PRESWITCH_IDLE_SECONDS', '5'))  # saniye; sayfa en az bu kadar boşta kalmalı
+MODEL_DEMAND_DECAY = float(os.environ.get('MODEL_DEMAND_DECAY', '0.9'))  # her dağıtımda eski model taleplerinin azalma katsayısı
+
+# --- Kabul kontrolü (admission control) ayarları ---
+# Etkinse tahmini kuyruk bekleme süresi bütçeyi aşan istek hemen 429 + Retry-After ile reddedilir (varsayılan kapalı).
+ADMISSION_CONTROL_ENABLED = get_boolean_env('ADMISSION_CONTROL_ENABLED', False)
+ADMISSION_MAX_QUEUE_WAIT_SECONDS = float(os.environ.get('ADMISSION_MAX_QUEUE_WAIT_SECONDS', '300'))
+ADMISSION_EWMA_ALPHA = float(os.environ.get('ADMISSION_EWMA_ALPHA', '0.2'))
+ADMISSION_DEFAULT_SERVICE_TIME = float(os.environ.get('ADMISSION_DEFAULT_SERVICE_TIME', '30'))  # saniye; henüz ölçüm yokken kullanılır
+
+# --- İstek ön hazırlık (prefetch) ayarları ---
+# Kuyruktaki ilk K isteğin doğrulama, istem birleştirme ve görsel çözme işleri sayfa kilidi dışında önceden yapılır (0 = kapalı, varsayılan).
+PREFETCH_DEPTH = max(0, get_int_env('PREFETCH_DEPTH', 0))
+
+# --- İstek birleştirme (singleflight) ayarları ---
+# Kuyrukta bekleyen veya işlenen bir istekle aynı olan istekler ona bağlanır ve aynı sonucu alır.
+REQUEST_COALESCING_ENABLED = get_boolean_env('REQUEST_COALESCING_ENABLED', False)
+
+# --- Yanıt önbelleği ayarları ---
+# Birebir aynı isteklerin yanıtları bellekte (LRU + TTL) ve isteğe bağlı olarak SQLite dosyasında saklanır.
+RESPONSE_CACHE_ENABLED = get_boolean_env('RESPONSE_CACHE_ENABLED', False)
+RESPONSE_CACHE_MAX_ENTRIES = max(1, get_int_env('RESPONSE_CACHE_MAX_ENTRIES', 256))
+RESPONSE_CACHE_TTL_SECONDS = get_int_env('RESPONSE_CACHE_TTL_SECONDS', 3600)
+RESPONSE_CACHE_DB_PATH = os.environ.get('RESPONSE_CACHE_DB_PATH', '')  # boş = yalnızca bellek katmanı
+
+# --- Toplu iş (batch) ayarları ---
+# /v1/batches ile yüklenen JSONL istekleri etkileşimli kuyruk boşken çalıştırılır; durum ve çıktılar bu klasörde tutulur.
+BATCH_STORAGE_DIR = os.environ.get('BATCH_STORAGE_DIR', '') or os.path.join(os.path.dirname(__file__), '..', 'batches')
+BATCH_IDLE_POLL_INTERVAL = float(os.environ.get('BATCH_IDLE_POLL_INTERVAL', '1.0'))  # saniye; kuyruk meşgulken en uzun yeniden kontrol aralığı
+
+# --- Sayfa içi API modu ayarları ---
+# Etkinse istem, DOM adımları (textarea, dosya yükleme, gönder düğmesi) yerine sayfanın kendi oturumuyla
+# page.evaluate içinden sitenin sohbet API'sine fetch ile gönderilir; API reddederse DOM yoluna dönülür.
+PAGE_API_MODE_ENABLED = get_boolean_env('PAGE_API_MODE_ENABLED', False)
+PAGE_API_NEW_CHAT_PATH = os.environ.get('PAGE_API_NEW_CHAT_PATH', '/api/v2/chats/new')
+PAGE_API_COMPLETIONS_PATH = os.environ.get('PAGE_API_COMPLETIONS_PATH', '/api/v2/chat/completions')
+
+# --- Başsız HTTP arka uç ayarları ---
+# Etkinse görsel içermeyen istekler tarayıcı sekmesi sürülmeden, tarayıcı bağlamından alınan çerez ve belirteçlerle
+# sohbet API'sine havuzlanmış bir aiohttp oturumu üzerinden gönderilir; tarayıcıya yalnızca kimlik bilgileri yenilenirken dokunulur.
+HTTP_BACKEND_ENABLED = get_boolean_env('HTTP_BACKEND_ENABLED', False)
+HTTP_BACKEND_BASE_URL = os.environ.get('HTTP_BACKEND_BASE_URL', 'https://chat.qwen.ai')
+HTTP_BACKEND_MAX_CONNECTIONS = max(1, get_int_env('HTTP_BACKEND_MAX_CONNECTIONS', 20))
+HTTP_BACKEND_READ_TIMEOUT_SECONDS = float(os.environ.get('HTTP_BACKEND_READ_TIMEOUT_SECONDS', '120'))  # saniye; akışta en uzun sessizlik
+HTTP_BACKEND_CREDENTIAL_MARGIN_SECONDS = float(os.environ.get('HTTP_BACKEND_CREDENTIAL_MARGIN_SECONDS', '60'))  # belirteç bu kadar süre kala yenilenir
+
+# --- Giriş penceresi bastırıcı ayarları ---
+# Etkinse her tarayıcı bağlamına bir init script eklenir; MutationObserver misafir/giriş pencerelerini belirdikleri anda
+# kapatır veya DOM'dan kaldırır, böylece istek yolundaki bekleyen Playwright kapatma döngüleri atlanır (varsayılan kapalı).
+OVERLAY_SUPPRESSOR_ENABLED = get_boolean_env('OVERLAY_SUPPRESSOR_ENABLED', False)
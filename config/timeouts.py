@@ -36,5 +36,8 @@ CLIPBOARD_READ_TIMEOUT_MS = int(os.environ.get('CLIPBOARD_READ_TIMEOUT_MS', '300
 # --- Element bekleme zaman aşımı ---
 WAIT_FOR_ELEMENT_TIMEOUT_MS = int(os.environ.get('WAIT_FOR_ELEMENT_TIMEOUT_MS', '10000'))  # Timeout for waiting for elements like overlays
 
+# --- Sayfa hazır olma (istekler arası tempo) ---
+PAGE_READY_TIMEOUT_MS = int(os.environ.get('PAGE_READY_TIMEOUT_MS', '5000'))  # Bir sonraki istekten önce sayfanın hazır olmasını bekleme üst sınırı
+
 # --- Akışa ilişkin ayarlar ---
 PSEUDO_STREAM_DELAY = float(os.environ.get('PSEUDO_STREAM_DELAY', '0.01'))
@@ -38,4 +38,5 @@ class ChatCompletionRequest(BaseModel):
     stop: Optional[Union[str, List[str]]] = None
     top_p: Optional[float] = None 
     reasoning_effort: Optional[str] = None
-    tools: Optional[List[Dict[str, Any]]] = None
\ No newline at end of file
+    tools: Optional[List[Dict[str, Any]]] = None
+    request_timeout: Optional[float] = None  # saniye; X-Request-Timeout başlığına eşdeğer
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Benchmark for the auxiliary stream response parser.
+
+Replays a recorded, already decoded GenerateContent response body in network-sized
+chunks and reports the average per-chunk parse cost for each quarter of the response.
+The legacy approach re-ran the frame regex over the whole accumulated body on every
+chunk, so its cost grows with the response; the incremental parser stays flat.
+
+Usage: python scripts/bench_stream_parser.py [recorded_body ...] [--chunk-size N]
+Without arguments a synthetic response of the same shape is generated.
+"""
+
+import argparse
+import json
+import pathlib
+import re
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from stream.parsers import GenerateContentParser
+
+LEGACY_PATTERN = re.compile(rb'\[\[\[null,.*?]],"model"]')
+
+
+def synthetic_response(frames: int = 3000) -> bytes:
+    parts = []
+    for index in range(frames):
+        payload = [None, f"token {index} [x] "] + ([None] * 5 if index < frames // 10 else [])
+        frame = '[[%s],"model"]' % json.dumps(payload, separators=(",", ":"))
+        parts.append('[[[%s]],null,[1,%d]]' % (frame, index))
+    return ("[" + ",\n".join(parts) + "]").encode()
+
+
+def legacy_parse(body: bytes) -> dict:
+    resp = {"reason": "", "body": "", "function": []}
+    for match in LEGACY_PATTERN.finditer(body):
+        payload = json.loads(match.group(0))[0][0]
+        if len(payload) == 2:
+            resp["body"] += payload[1]
+        elif len(payload) > 2:
+            resp["reason"] += payload[1]
+    return resp
+
+
+def run_legacy(chunks):
+    body = bytearray()
+    costs = []
+    for chunk in chunks:
+        started = time.perf_counter()
+        body.extend(chunk)
+        legacy_parse(bytes(body))
+        costs.append(time.perf_counter() - started)
+    return costs
+
+
+def run_incremental(chunks):
+    parser = GenerateContentParser()
+    costs = []
+    for chunk in chunks:
+        started = time.perf_counter()
+        parser.feed(chunk)
+        costs.append(time.perf_counter() - started)
+    return costs
+
+
+def quarter_averages(costs):
+    size = max(1, len(costs) // 4)
+    return [sum(costs[i:i + size]) / len(costs[i:i + size]) * 1e6 for i in range(0, size * 4, size)]
+
+
+def report(name: str, data: bytes, chunk_size: int) -> None:
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    print(f"{name}: {len(data)} bytes, {len(chunks)} chunks of {chunk_size} bytes")
+    for label, runner in (("legacy regex", run_legacy), ("incremental", run_incremental)):
+        costs = runner(chunks)
+        quarters = " / ".join(f"{value:8.1f}" for value in quarter_averages(costs))
+        print(f"  {label:<13} per-chunk us by quarter: {quarters}   total {sum(costs) * 1000:8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recordings", nargs="*", help="decoded response bodies captured from the proxy")
+    parser.add_argument("--chunk-size", type=int, default=8192)
+    args = parser.parse_args()
+
+    if not args.recordings:
+        report("synthetic", synthetic_response(), args.chunk_size)
+    for path in args.recordings:
+        report(path, pathlib.Path(path).read_bytes(), args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
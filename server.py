@@ -1,5 +1,4 @@
 import asyncio
-import multiprocessing
 import random
 import time
 import json
@@ -87,7 +86,8 @@ from api_utils import (
 )
 
 # --- stream queue ---
-STREAM_QUEUE:Optional[multiprocessing.Queue] = None
+STREAM_QUEUE:Optional[asyncio.Queue] = None  # STREAM_CHANNEL'in etiketsiz (isteğe bağlanamayan) mesajları
+STREAM_CHANNEL = None  # stream.ipc.StreamChannel
 STREAM_PROCESS = None
 
 # --- Global State ---
@@ -113,7 +113,17 @@ model_switching_lock: Optional[Lock] = None
 excluded_model_ids: Set[str] = set()
 
 request_queue: Optional[Queue] = None
-processing_lock: Optional[Lock] = None
+page_pool = None  # api_utils.page_pool.PagePool
+admission_controller = None  # api_utils.admission.AdmissionController
+request_prefetcher = None  # api_utils.prefetch.RequestPrefetcher
+request_coalescer = None  # api_utils.coalesce.RequestCoalescer
+response_cache = None  # api_utils.response_cache.ResponseCache
+batch_manager = None  # api_utils.batches.BatchManager
+model_affinity = None  # api_utils.model_affinity.ModelAffinity
+deadline_stats = None  # api_utils.deadlines.DeadlineStats
+http_backend = None  # api_utils.http_backend.HttpChatBackend
+overlay_suppressor = None  # browser_utils.overlay_suppressor.OverlaySuppressor
+extra_browsers: List[Tuple[str, AsyncBrowser]] = []  # CAMOUFOX_WS_ENDPOINTS bağlantıları
 worker_task: Optional[Task] = None
 
 page_params_cache: Dict[str, Any] = {}
@@ -1,27 +1,30 @@
 import asyncio
-import multiprocessing
 
 from stream import main
+from stream.ipc import FrameSender
 
 def start(*args, **kwargs):
     """
     Akış proxy sunucusunu başlat, konum bağımsız değişkenleri ve anahtar kelime bağımsız değişkenleri ile uyumlu
 
     Konum bağımsız değişkenleri modu (referans dosya ile uyumlu):
-        start(queue, port, proxy)
+        start(channel_sock, port, proxy)
 
     Anahtar kelime bağımsız değişkenleri modu:
-        start(queue=queue, port=port, proxy=proxy)
+        start(channel=channel_sock, port=port, proxy=proxy)
+
+    channel_sock, stream.ipc.create_channel_pair() ile oluşturulan çiftin proxy tarafıdır.
     """
     if args:
         # Konum bağımsız değişkenleri modu (referans dosya ile uyumlu)
-        queue = args[0] if len(args) > 0 else None
+        channel_sock = args[0] if len(args) > 0 else None
         port = args[1] if len(args) > 1 else None
         proxy = args[2] if len(args) > 2 else None
     else:
         # Anahtar kelime bağımsız değişkenleri modu
-        queue = kwargs.get('queue', None)
+        channel_sock = kwargs.get('channel', None)
         port = kwargs.get('port', None)
         proxy = kwargs.get('proxy', None)
 
-    asyncio.run(main.builtin(queue=queue, port=port, proxy=proxy))
\ No newline at end of file
+    channel = FrameSender(channel_sock) if channel_sock is not None else None
+    asyncio.run(main.builtin(channel=channel, port=port, proxy=proxy))
\ No newline at end of file
@@ -1,8 +1,10 @@
 import json
 import logging
-import re
 import zlib
 
+from stream.ipc import STREAM_MESSAGE_VERSION
+from stream.parsers import GenerateContentParser, QwenSSEParser, is_qwen_completion_path
+
 class HttpInterceptor:
     """
     Class to intercept and process HTTP requests and responses
@@ -31,6 +33,10 @@ class HttpInterceptor:
         # Check if the endpoint contains GenerateContent
         if 'GenerateContent' in path:
             return True
+
+        # Qwen chat completion endpoints stream server-sent events
+        if is_qwen_completion_path(path):
+            return True
         
         # Add more conditions as needed
         return False
@@ -51,112 +57,131 @@ class HttpInterceptor:
             # Not JSON or not UTF-8, just pass through
             return request_data
     
-    async def process_response(self, response_data, host, path, headers):
+    def start_response(self, headers, host, path):
         """
-        Process the response data before sending to the client
+        Create the decoding and parsing state for one intercepted response
         """
-        try:
-            # Handle chunked encoding
-            decoded_data, is_done = self._decode_chunked(bytes(response_data))
-            # Handle gzip encoding
-            decoded_data = self._decompress_zlib_stream(decoded_data)
-            result  = self.parse_response(decoded_data)
-            result["done"] = is_done
-            return result
-        except Exception as e:
-            raise e
-
-    def parse_response(self, response_data):
-        pattern = rb'\[\[\[null,.*?]],"model"]'
-        matches = []
-        for match_obj in re.finditer(pattern, response_data):
-            matches.append(match_obj.group(0))
-
-
-        resp = {
-            "reason": "",
-            "body": "",
-            "function": [],
-        }
-
-        # Print each full match
-        for match in matches:
-            json_data = json.loads(match)
-
-            try:
-                payload = json_data[0][0]
-            except Exception as e:
-                continue
-
-            if len(payload)==2: # body
-                resp["body"] = resp["body"] + payload[1]
-            elif len(payload) == 11 and payload[1] is None and type(payload[10]) == list:  # function
-                array_tool_calls = payload[10]
-                func_name = array_tool_calls[0]
-                params = self.parse_toolcall_params(array_tool_calls[1])
-                resp["function"].append({"name":func_name, "params":params})
-            elif len(payload) > 2: # reason
-                resp["reason"] = resp["reason"] + payload[1]
-
-        return resp
-
-    def parse_toolcall_params(self, args):
-        try:
-            params = args[0]
-            func_params = {}
-            for param in params:
-                param_name = param[0]
-                param_value = param[1]
-
-                if type(param_value)==list:
-                    if len(param_value)==1: # null
-                        func_params[param_name] = None
-                    elif len(param_value) == 2: # number and integer
-                        func_params[param_name] = param_value[1]
-                    elif len(param_value) == 3: # string
-                        func_params[param_name] = param_value[2]
-                    elif len(param_value) == 4: # boolean
-                        func_params[param_name] = param_value[3] == 1
-                    elif len(param_value) == 5: # object
-                        func_params[param_name] = self.parse_toolcall_params(param_value[4])
-            return func_params
-        except Exception as e:
-            raise e
+        parser = QwenSSEParser() if is_qwen_completion_path(path) else GenerateContentParser()
+        return ResponseDecoder(headers, parser=parser)
 
-    @staticmethod
-    def _decompress_zlib_stream(compressed_stream):
-        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)  # zlib header
-        decompressed = decompressor.decompress(compressed_stream)
-        return decompressed
-
-    @staticmethod
-    def _decode_chunked(response_body: bytes) -> tuple[bytes, bool]:
-        chunked_data = bytearray()
-        while True:
-            # print(' '.join(format(x, '02x') for x in response_body))
-
-            length_crlf_idx = response_body.find(b"\r\n")
-            if length_crlf_idx == -1:
-                break
-
-            hex_length = response_body[:length_crlf_idx]
-            try:
-                length = int(hex_length, 16)
-            except ValueError as e:
-                logging.error(f"Parsing chunked length failed: {e}")
-                break
-
-            if length == 0:
-                length_crlf_idx = response_body.find(b"0\r\n\r\n")
-                if length_crlf_idx != -1:
-                    return chunked_data, True
-
-            if length + 2 > len(response_body):
-                break
-
-            chunked_data.extend(response_body[length_crlf_idx + 2:length_crlf_idx + 2 + length])
-            if length_crlf_idx + 2 + length + 2 > len(response_body):
-                break
-
-            response_body = response_body[length_crlf_idx + 2 + length + 2:]
-        return chunked_data, False
+    async def process_response(self, decoder, response_data, host, path):
+        """
+        Feed newly received response bytes to the response's decoder and parser.
+        Returns a delta message, or None when the bytes produced no new content.
+        """
+        new_data = decoder.feed(bytes(response_data))
+        parser = decoder.parser
+        delta = parser.feed(new_data)
+        # SSE streams may signal the end before the HTTP body is complete
+        done = decoder.done or getattr(parser, 'finished', False)
+        if not (delta["reason"] or delta["body"] or delta["function"]) and not done:
+            return None
+        if decoder.finished_sent:
+            return None
+        message = {"v": STREAM_MESSAGE_VERSION, "seq": decoder.seq}
+        message.update(delta)
+        message["done"] = done
+        if getattr(parser, 'error', None):
+            message["error"] = parser.error
+        decoder.seq += 1
+        decoder.finished_sent = done
+        return message
+
+
+class ResponseDecoder:
+    """
+    Incremental decoder for a single intercepted response body.
+    Keeps the chunked-transfer parser state and one persistent decompressor, so each
+    feed() only walks and inflates the bytes that arrived since the previous call.
+    """
+    def __init__(self, headers=None, parser=None):
+        self.parser = parser
+        self.seq = 0
+        self.finished_sent = False
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        self.chunked = 'chunked' in headers.get('transfer-encoding', '').lower()
+        encoding = headers.get('content-encoding', '').strip().lower()
+        if encoding in ('gzip', 'x-gzip', 'deflate'):
+            # MAX_WBITS | 32 accepts both gzip and zlib headers
+            self._decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)
+        else:
+            if encoding not in ('', 'identity'):
+                logging.warning(f"Unsupported content encoding '{encoding}', passing body through undecoded")
+            self._decompressor = None
+        content_length = headers.get('content-length', '').strip()
+        self._remaining = int(content_length) if not self.chunked and content_length.isdigit() else None
+        self._pending = bytearray()
+        self._state = 'size'  # size | data | data_end | trailer
+        self._chunk_left = 0
+        self.body = bytearray()
+        self.done = self._remaining == 0
+
+    def feed(self, data: bytes) -> bytes:
+        """Consume raw body bytes and return the newly decoded (dechunked and decompressed) bytes"""
+        if self.done or not data:
+            return b''
+        raw = self._dechunk(data) if self.chunked else self._take_identity(data)
+        if self._decompressor is not None:
+            decoded = self._decompressor.decompress(raw) if raw else b''
+            if self.done:
+                decoded += self._decompressor.flush()
+        else:
+            decoded = raw
+        self.body.extend(decoded)
+        return decoded
+
+    def _take_identity(self, data: bytes) -> bytes:
+        if self._remaining is None:
+            return data
+        data = data[:self._remaining]
+        self._remaining -= len(data)
+        self.done = self._remaining == 0
+        return data
+
+    def _dechunk(self, data: bytes) -> bytes:
+        buf = self._pending
+        buf.extend(data)
+        out = bytearray()
+        pos = 0
+        while not self.done:
+            if self._state == 'size':
+                end = buf.find(b'\r\n', pos)
+                if end == -1:
+                    break
+                size_field = bytes(buf[pos:end]).split(b';', 1)[0].strip()
+                try:
+                    size = int(size_field, 16)
+                except ValueError as e:
+                    logging.error(f"Parsing chunked length failed: {e}")
+                    self.done = True
+                    break
+                pos = end + 2
+                if size == 0:
+                    self._state = 'trailer'
+                else:
+                    self._chunk_left = size
+                    self._state = 'data'
+            elif self._state == 'data':
+                # Partial chunk data is released immediately instead of waiting for the whole chunk
+                take = min(self._chunk_left, len(buf) - pos)
+                if take == 0:
+                    break
+                out += buf[pos:pos + take]
+                pos += take
+                self._chunk_left -= take
+                if self._chunk_left == 0:
+                    self._state = 'data_end'
+            elif self._state == 'data_end':
+                if len(buf) - pos < 2:
+                    break
+                pos += 2
+                self._state = 'size'
+            else:
+                # Trailer section ends with an empty line
+                end = buf.find(b'\r\n', pos)
+                if end == -1:
+                    break
+                self.done = end == pos
+                pos = end + 2
+        del buf[:pos]
+        return bytes(out)
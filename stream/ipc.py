@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import socket
+import struct
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Each frame is a 2-byte correlation key length and a 4-byte payload length (big-endian),
+# followed by the UTF-8 key and the UTF-8 payload. An empty key marks an unrouted frame.
+FRAME_HEADER = struct.Struct('!HI')
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Injected by the browser into intercepted requests and stripped by the proxy before forwarding
+CORRELATION_HEADER = 'x-stream-correlation-id'
+
+# Set by the in-page API fetch: the proxy strips it and forwards the request without capturing it
+NO_CAPTURE_HEADER = 'x-stream-no-capture'
+
+# Unkeyed frame the proxy sends once it is listening
+READY_SIGNAL = 'READY'
+
+# Schema version of the JSON messages in keyed frames. Each message carries a per-response
+# sequence number and only the text produced since the previous message:
+# {"v": 2, "seq": n, "reason": str, "body": str, "function": [new calls], "done": bool}
+STREAM_MESSAGE_VERSION = 2
+
+logger = logging.getLogger('stream_ipc')
+
+
+def create_channel_pair() -> Tuple[socket.socket, socket.socket]:
+    """
+    Create the connected socket pair used between the API server and the proxy process.
+
+    Returns:
+        tuple: (server_side, proxy_side); pass proxy_side to the child process
+    """
+    return socket.socketpair()
+
+
+def encode_frame(message: str, key: Optional[str] = None) -> bytes:
+    key_bytes = key.encode('utf-8') if key else b''
+    payload = message.encode('utf-8')
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame too large: {len(payload)} bytes")
+    if len(key_bytes) > 0xFFFF:
+        raise ValueError(f"Correlation key too long: {len(key_bytes)} bytes")
+    return FRAME_HEADER.pack(len(key_bytes), len(payload)) + key_bytes + payload
+
+
+class FrameSender:
+    """
+    Proxy-side end of the channel; writes length-prefixed frames without blocking the proxy loop
+    """
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        _, self._writer = await asyncio.open_connection(sock=self._sock)
+
+    async def send(self, message: str, key: Optional[str] = None):
+        if self._writer is None:
+            await self.connect()
+        self._writer.write(encode_frame(message, key))
+        await self._writer.drain()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            self._sock.close()
+
+
+def terminal_message(error: str) -> Dict[str, Any]:
+    """Final stream message that ends a reader without any further content"""
+    return {"v": STREAM_MESSAGE_VERSION, "seq": None, "reason": "", "body": "", "function": [],
+            "done": True, "error": error}
+
+
+class StreamChannel:
+    """
+    API-server-side end of the channel. A single reader task is woken by the event loop
+    as soon as a frame arrives and demultiplexes it by correlation key: keyed frames go to
+    the per-request queue registered with open(), unkeyed frames (e.g. "READY") go to `queue`.
+    Keyed frames for a request that has no open queue are stale and dropped.
+
+    A response frame without a key comes from a request the browser did not tag. When a
+    single stream is open and `adopt_unkeyed` confirms that only one page is generating, it
+    can only belong to that request and is delivered to it; otherwise it cannot be attributed
+    and is left in `queue`.
+    """
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._routes: Dict[str, asyncio.Queue] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_adopted = 0
+        self.frames_unrouted = 0
+        self.adopt_unkeyed: Optional[Callable[[], bool]] = None
+
+    def open(self, key: str) -> asyncio.Queue:
+        """Return the queue receiving frames tagged with key, creating it if needed"""
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = asyncio.Queue()
+        return route
+
+    def release(self, key: str, error: str = "stream_released") -> int:
+        """
+        Stop routing frames for key; returns the number of undelivered frames discarded.
+        A terminal message carrying `error` is pushed to the released queue so a reader
+        still waiting on it wakes up at once instead of running into its idle timeout.
+        """
+        route = self._routes.pop(key, None)
+        if route is None:
+            return 0
+        discarded = route.qsize()
+        route.put_nowait(terminal_message(error))
+        return discarded
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "frames_received": self.frames_received,
+            "frames_dropped": self.frames_dropped,
+            "frames_adopted": self.frames_adopted,
+            "frames_unrouted": self.frames_unrouted,
+            "open_streams": len(self._routes),
+            "unrouted_pending": self.queue.qsize(),
+        }
+
+    async def start(self):
+        reader, self._writer = await asyncio.open_connection(sock=self._sock)
+        self._reader_task = asyncio.create_task(self._read_loop(reader))
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                key_length, length = FRAME_HEADER.unpack(header)
+                if length > MAX_FRAME_SIZE:
+                    logger.error(f"Stream channel frame too large ({length} bytes); closing channel")
+                    break
+                key = (await reader.readexactly(key_length)).decode('utf-8', errors='replace') if key_length else None
+                payload = await reader.readexactly(length)
+                self.frames_received += 1
+                message = payload.decode('utf-8', errors='replace')
+                if key is None:
+                    self._route_unkeyed(message)
+                elif key in self._routes:
+                    self._routes[key].put_nowait(message)
+                else:
+                    self.frames_dropped += 1
+                    logger.debug(f"Dropped stream frame for closed request {key}")
+        except asyncio.IncompleteReadError:
+            logger.info("Stream channel closed by the proxy process")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Stream channel read error: {e}")
+
+    def _route_unkeyed(self, message: str):
+        if message != READY_SIGNAL:
+            if len(self._routes) == 1 and (self.adopt_unkeyed is None or self.adopt_unkeyed()):
+                next(iter(self._routes.values())).put_nowait(message)
+                self.frames_adopted += 1
+                return
+            self.frames_unrouted += 1
+            logger.warning(f"Untagged stream frame with {len(self._routes)} open streams; it cannot be routed")
+        self.queue.put_nowait(message)
+
+    async def close(self):
+        if self._reader_task and not self._reader_task.done():
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            self._sock.close()
@@ -1,11 +1,11 @@
 import argparse
 import asyncio
 import logging
-import multiprocessing
 import sys
 from pathlib import Path
 
 from stream.proxy_server import ProxyServer
+from stream.ipc import FrameSender
 
 def parse_args():
     """Parse command line arguments"""
@@ -55,7 +55,7 @@ async def main():
         port=args.port,
         intercept_domains=args.domains,
         upstream_proxy=args.proxy,
-        queue=None,
+        channel=None,
     )
 
     try:
@@ -67,7 +67,7 @@ async def main():
         sys.exit(1)
 
 
-async def builtin(queue: multiprocessing.Queue = None, port=None, proxy=None):
+async def builtin(channel: FrameSender = None, port=None, proxy=None):
     # Set up logging
     logging.basicConfig(
         level=logging.INFO,
@@ -92,7 +92,7 @@ async def builtin(queue: multiprocessing.Queue = None, port=None, proxy=None):
         port=port,
         intercept_domains=['*.google.com', 'chat.qwen.ai', '*.qwen.ai'],
         upstream_proxy=proxy,
-        queue=queue,
+        channel=channel,
     )
 
     try:
@@ -0,0 +1,231 @@
+import codecs
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('stream_parsers')
+
+# Interesting bytes while scanning: string delimiters and array brackets outside strings,
+# quote and backslash inside strings
+_STRUCTURE_RE = re.compile(rb'["\[\]]')
+_STRING_RE = re.compile(rb'["\\]')
+FRAME_PREFIX = b'[[[null,'
+FRAME_SUFFIX = b',"model"]'
+
+# Qwen chat completion endpoints (v1 is OpenAI-shaped, v2 tags each delta with a phase)
+QWEN_COMPLETION_PATHS = ('/api/chat/completions', '/api/v2/chat/completions')
+QWEN_REASONING_PHASES = ('think', 'thinking', 'thinking_summary', 'reasoning')
+QWEN_ANSWER_PHASES = (None, '', 'answer')
+
+
+def is_qwen_completion_path(path: str) -> bool:
+    return path.split('?', 1)[0].rstrip('/') in QWEN_COMPLETION_PATHS
+
+
+def parse_toolcall_params(args) -> Dict[str, Any]:
+    params = args[0]
+    func_params = {}
+    for param in params:
+        param_name = param[0]
+        param_value = param[1]
+
+        if type(param_value) == list:
+            if len(param_value) == 1:  # null
+                func_params[param_name] = None
+            elif len(param_value) == 2:  # number and integer
+                func_params[param_name] = param_value[1]
+            elif len(param_value) == 3:  # string
+                func_params[param_name] = param_value[2]
+            elif len(param_value) == 4:  # boolean
+                func_params[param_name] = param_value[3] == 1
+            elif len(param_value) == 5:  # object
+                func_params[param_name] = parse_toolcall_params(param_value[4])
+    return func_params
+
+
+class GenerateContentParser:
+    """
+    Incremental parser for the streamed GenerateContent array payload.
+
+    Tracks array nesting (ignoring brackets inside JSON strings) across feed() calls,
+    so every `[[[null,...]],"model"]` frame is decoded exactly once when its closing
+    bracket arrives. feed() returns only the reason/body/function deltas of the new
+    frames; no cumulative text is kept.
+    """
+    def __init__(self):
+        self._buf = bytearray()
+        self._base = 0  # absolute offset of _buf[0]
+        self._pos = 0  # absolute offset of the next unscanned byte
+        self._stack: List[List[Any]] = []  # [absolute start, is_frame_candidate (None = undecided)]
+        self._in_string = False
+        self._escape = False
+        self.frames = 0
+
+    def feed(self, data: bytes) -> Dict[str, Any]:
+        delta = {"reason": "", "body": "", "function": []}
+        if not data:
+            return delta
+        self._buf.extend(data)
+        buf = self._buf
+        base = self._base
+        end = base + len(buf)
+        pos = self._pos
+        reason_parts = []
+        body_parts = []
+
+        while pos < end:
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+            if self._in_string:
+                match = _STRING_RE.search(buf, pos - base)
+                if match is None:
+                    pos = end
+                    break
+                pos = base + match.start()
+                if buf[pos - base] == 0x5C:  # backslash
+                    self._escape = True
+                else:
+                    self._in_string = False
+                pos += 1
+                continue
+            match = _STRUCTURE_RE.search(buf, pos - base)
+            if match is None:
+                pos = end
+                break
+            pos = base + match.start()
+            char = buf[pos - base]
+            if char == 0x22:  # quote
+                self._in_string = True
+            elif char == 0x5B:  # [
+                self._stack.append([pos, None])
+            elif self._stack:  # ]
+                start, candidate = self._stack.pop()
+                if candidate is not False and self._is_frame(start, pos + 1):
+                    self._decode_frame(bytes(buf[start - base:pos + 1 - base]), reason_parts, body_parts, delta)
+            pos += 1
+
+        self._pos = pos
+        self._trim()
+        delta["reason"] = "".join(reason_parts)
+        delta["body"] = "".join(body_parts)
+        return delta
+
+    def _is_frame(self, start: int, stop: int) -> bool:
+        base = self._base
+        return (self._buf.startswith(FRAME_PREFIX, start - base)
+                and self._buf.endswith(FRAME_SUFFIX, 0, stop - base))
+
+    def _decode_frame(self, raw: bytes, reason_parts: List[str], body_parts: List[str], delta: Dict[str, Any]) -> None:
+        try:
+            payload = json.loads(raw)[0][0]
+        except Exception as e:
+            logger.debug(f"Skipping undecodable frame: {e}")
+            return
+        self.frames += 1
+
+        if len(payload) == 2:  # body
+            body_parts.append(payload[1])
+        elif len(payload) == 11 and payload[1] is None and type(payload[10]) == list:  # function
+            array_tool_calls = payload[10]
+            delta["function"].append({"name": array_tool_calls[0], "params": parse_toolcall_params(array_tool_calls[1])})
+        elif len(payload) > 2:  # reason
+            reason_parts.append(payload[1])
+
+    def _trim(self) -> None:
+        """Drop scanned bytes that can no longer be part of an open frame"""
+        buf = self._buf
+        base = self._base
+        keep_from = self._pos
+        for entry in self._stack:
+            if entry[1] is None:
+                offset = entry[0] - base
+                if len(buf) - offset >= len(FRAME_PREFIX):
+                    entry[1] = buf.startswith(FRAME_PREFIX, offset)
+            if entry[1] is not False:
+                keep_from = min(keep_from, entry[0])
+                break
+        if keep_from > base:
+            del buf[:keep_from - base]
+            self._base = keep_from
+
+
+class QwenSSEParser:
+    """
+    Incremental parser for the Qwen chat completion server-sent event stream.
+
+    Keeps the partial line and event between feed() calls, decodes each event's JSON
+    exactly once and maps it to the same reason/body/function deltas as
+    GenerateContentParser. `finished` is set on a finish status, a finish_reason,
+    an error payload or `data: [DONE]`; `error` holds the upstream error message if any.
+    """
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._line = ""
+        self._data_lines: List[str] = []
+        self.events = 0
+        self.finished = False
+        self.error: Optional[str] = None
+
+    def feed(self, data: bytes) -> Dict[str, Any]:
+        delta = {"reason": "", "body": "", "function": []}
+        if not data:
+            return delta
+        reason_parts: List[str] = []
+        body_parts: List[str] = []
+        text = self._line + self._decoder.decode(data)
+        lines = text.split('\n')
+        self._line = lines.pop()
+        for line in lines:
+            line = line.rstrip('\r')
+            if not line:
+                self._dispatch(reason_parts, body_parts)
+            elif line.startswith('data:'):
+                value = line[5:]
+                self._data_lines.append(value[1:] if value.startswith(' ') else value)
+            # event:, id:, retry: and comment lines carry nothing we need
+        delta["reason"] = "".join(reason_parts)
+        delta["body"] = "".join(body_parts)
+        return delta
+
+    def _dispatch(self, reason_parts: List[str], body_parts: List[str]) -> None:
+        if not self._data_lines:
+            return
+        payload = "\n".join(self._data_lines)
+        self._data_lines = []
+        if payload.strip() == '[DONE]':
+            self.finished = True
+            return
+        try:
+            event = json.loads(payload)
+        except json.JSONDecodeError:
+            logger.debug(f"Skipping undecodable SSE event: {payload[:200]}")
+            return
+        if not isinstance(event, dict):
+            return
+        self.events += 1
+
+        error = event.get("error")
+        if error or event.get("success") is False:
+            details = error if error else event.get("data")
+            if isinstance(details, dict):
+                details = details.get("details") or details.get("message") or details.get("code")
+            self.error = str(details or "upstream error")
+            self.finished = True
+            return
+
+        for choice in event.get("choices") or []:
+            choice_delta = choice.get("delta") or choice.get("message") or {}
+            content = choice_delta.get("content") or ""
+            phase = choice_delta.get("phase")
+            if choice_delta.get("reasoning_content"):
+                reason_parts.append(choice_delta["reasoning_content"])
+            if content:
+                if phase in QWEN_REASONING_PHASES:
+                    reason_parts.append(content)
+                elif phase in QWEN_ANSWER_PHASES:
+                    body_parts.append(content)
+            if choice.get("finish_reason") or (choice_delta.get("status") == "finished" and phase in QWEN_ANSWER_PHASES):
+                self.finished = True
@@ -3,23 +3,23 @@ from typing import Optional
 import json
 import logging
 import ssl
-import multiprocessing
 from pathlib import Path
 
 from stream.cert_manager import CertificateManager
 from stream.proxy_connector import ProxyConnector
 from stream.interceptors import HttpInterceptor
+from stream.ipc import CORRELATION_HEADER, NO_CAPTURE_HEADER, READY_SIGNAL, FrameSender
 
 class ProxyServer:
     """
     Asynchronous HTTPS proxy server with SSL inspection capabilities
     """
-    def __init__(self, host='0.0.0.0', port=3120, intercept_domains=None, upstream_proxy=None, queue: Optional[multiprocessing.Queue]=None):
+    def __init__(self, host='0.0.0.0', port=3120, intercept_domains=None, upstream_proxy=None, channel: Optional[FrameSender]=None):
         self.host = host
         self.port = port
         self.intercept_domains = intercept_domains or []
         self.upstream_proxy = upstream_proxy
-        self.queue = queue
+        self.channel = channel
         
         # Initialize components
         self.cert_manager = CertificateManager()
@@ -206,10 +206,16 @@ class ProxyServer:
         client_buffer = bytearray()
         server_buffer = bytearray()
         should_sniff = False
+        # HTTP/1.1 exchanges on one connection are sequential, so the key of the last
+        # sniffed request identifies the response currently being read
+        correlation_key = None
+        # Decoder of the sniffed response currently being read; None until its headers arrive
+        decoder = None
+        sniff_path = ""
 
         # Parse HTTP headers from client
         async def _process_client_data():
-            nonlocal client_buffer, should_sniff
+            nonlocal client_buffer, should_sniff, correlation_key, decoder, sniff_path
             
             try:
                 while True:
@@ -238,9 +244,20 @@ class ProxyServer:
                             client_buffer.clear()
                             continue
                         
+                        # Requests whose response the page reads itself are forwarded without capture
+                        unsniffed_headers = self._strip_no_capture_header(lines)
+                        if unsniffed_headers is not None:
+                            should_sniff = False
+                            server_writer.write(unsniffed_headers)
+                            server_writer.write(body_data)
                         # Check if we should intercept this request
-                        if 'GenerateContent' in path:
+                        elif self.interceptor.should_intercept(host, path):
                             should_sniff = True
+                            sniff_path = path
+                            headers_data, correlation_key = self._prepare_sniffed_headers(lines)
+                            # The previous response on this connection is complete; start a fresh one
+                            decoder = None
+                            server_buffer.clear()
                             # Process the request body
                             processed_body = await self.interceptor.process_request(
                                 body_data, host, path
@@ -268,7 +285,7 @@ class ProxyServer:
         
         # Parse HTTP headers from server
         async def _process_server_data():
-            nonlocal server_buffer, should_sniff
+            nonlocal server_buffer, should_sniff, decoder
             
             try:
                 while True:
@@ -276,44 +293,38 @@ class ProxyServer:
                     if not data:
                         break
 
-                    server_buffer.extend(data)
-                    if b'\r\n\r\n' in server_buffer:
-                        # Split headers and body
-                        headers_end = server_buffer.find(b'\r\n\r\n') + 4
-                        headers_data = server_buffer[:headers_end]
-                        body_data = server_buffer[headers_end:]
-
-                        # Parse status line and headers
-                        lines = headers_data.split(b'\r\n')
-
-                        # Parse headers
-                        headers = {}
-                        for i in range(1, len(lines)):
-                            if not lines[i]:
-                                continue
-                            try:
-                                key, value = lines[i].decode('utf-8').split(':', 1)
-                                headers[key.strip()] = value.strip()
-                            except ValueError:
-                                continue
-
-                        # Check if this is a response to a GenerateContent request
-                        if should_sniff:
+                    # Check if this is a response to a sniffed (GenerateContent / Qwen completion) request
+                    if should_sniff:
+                        body_data = None
+                        if decoder is not None:
+                            body_data = data
+                        else:
+                            server_buffer.extend(data)
+                            if b'\r\n\r\n' in server_buffer:
+                                # Split headers and body
+                                headers_end = server_buffer.find(b'\r\n\r\n') + 4
+                                headers = self._parse_response_headers(server_buffer[:headers_end])
+                                body_data = bytes(server_buffer[headers_end:])
+                                server_buffer.clear()
+                                decoder = self.interceptor.start_response(headers, host, sniff_path)
+
+                        if body_data is not None:
                             try:
+                                # Only the newly arrived bytes are decoded; the decoder keeps the state
                                 resp = await self.interceptor.process_response(
-                                    body_data, host, "", headers
+                                    decoder, body_data, host, sniff_path
                                 )
 
-                                if self.queue is not None:
-                                    self.queue.put(json.dumps(resp))
+                                if resp is not None and self.channel is not None:
+                                    await self.channel.send(json.dumps(resp), correlation_key)
+                                if decoder.done:
+                                    should_sniff = False
+                                    decoder = None
                             except Exception as e:
                                 # --- FIX: Log the unused exception variable ---
                                 self.logger.error(f"Error during response interception: {e}")
 
-                    # Not enough data to parse headers, forward as is
                     client_writer.write(data)
-                    if b"0\r\n\r\n" in server_buffer:
-                        server_buffer.clear()
             except Exception as e:
                 self.logger.error(f"Error processing server data: {e}")
             finally:
@@ -328,6 +339,51 @@ class ProxyServer:
         tasks = [client_to_server, server_to_client]
         await asyncio.gather(*tasks)
     
+    @staticmethod
+    def _parse_response_headers(headers_data):
+        headers = {}
+        for line in headers_data.split(b'\r\n')[1:]:
+            if not line:
+                continue
+            try:
+                key, value = line.decode('utf-8').split(':', 1)
+                headers[key.strip()] = value.strip()
+            except ValueError:
+                continue
+        return headers
+
+    @staticmethod
+    def _strip_no_capture_header(lines):
+        """
+        Remove the marker header set by the in-page API fetch.
+        Returns the rebuilt header block, or None when the request does not carry the marker.
+        """
+        marker = NO_CAPTURE_HEADER.encode('ascii')
+        kept = [line for line in lines if line.partition(b':')[0].strip().lower() != marker]
+        if len(kept) == len(lines):
+            return None
+        return bytearray(b'\r\n'.join(kept))
+
+    @staticmethod
+    def _prepare_sniffed_headers(lines):
+        """
+        Remove the correlation header injected by the browser so it never reaches the upstream server,
+        and restrict Accept-Encoding to encodings the response decoder can inflate.
+        Returns the rebuilt header block and the correlation key (None when the request was not tagged).
+        """
+        key = None
+        kept = []
+        for line in lines:
+            name, sep, value = line.partition(b':')
+            header = name.strip().lower() if sep else b''
+            if header == CORRELATION_HEADER.encode('ascii'):
+                key = value.strip().decode('utf-8', errors='replace') or None
+                continue
+            if header == b'accept-encoding':
+                line = name + b': gzip, deflate'
+            kept.append(line)
+        return bytearray(b'\r\n'.join(kept)), key
+
     async def start(self):
         """
         Start the proxy server
@@ -340,9 +396,9 @@ class ProxyServer:
         self.logger.info(f'Serving on {addr}')
         
         # --- FIX: Send "READY" signal after server starts listening ---
-        if self.queue:
+        if self.channel:
             try:
-                self.queue.put("READY")
+                await self.channel.send(READY_SIGNAL)
                 self.logger.info("Sent 'READY' signal to the main process.")
             except Exception as e:
                 self.logger.error(f"Failed to send 'READY' signal: {e}")
@@ -0,0 +1,67 @@
+import pathlib
+import sys
+from types import SimpleNamespace
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_utils import admission
+from api_utils.admission import AdmissionController, ServiceTimeEstimator
+
+
+def make_request(model="qwen-max", stream=False):
+    return SimpleNamespace(model=model, stream=stream)
+
+
+def queued(*requests):
+    return [{"request_data": request, "cancelled": False} for request in requests]
+
+
+def test_ewma_is_split_by_stream_and_model():
+    estimator = ServiceTimeEstimator(alpha=0.5, default_seconds=30)
+    estimator.record((True, "qwen-max"), 10)
+    estimator.record((True, "qwen-max"), 20)
+    estimator.record((False, "qwen-max"), 4)
+
+    assert estimator.estimate((True, "qwen-max")) == 15
+    assert estimator.estimate((False, "qwen-max")) == 4
+    # Unknown model falls back to the average of the same mode, then to the default
+    assert estimator.estimate((True, "qwen-plus")) == 15
+    assert ServiceTimeEstimator(default_seconds=30).estimate((False, "x")) == 30
+
+
+def test_rejects_with_retry_after_when_budget_exceeded():
+    controller = AdmissionController(enabled=True, max_queue_wait=60,
+                                     estimator=ServiceTimeEstimator(default_seconds=25))
+    items = queued(*[make_request() for _ in range(6)])
+
+    decision = controller.check(make_request(), items, workers=2)
+    assert decision.predicted_wait == 75
+    assert not decision.admitted
+    assert decision.retry_after == 15
+    assert controller.rejected_count == 1
+
+    assert controller.check(make_request(), items, workers=3).admitted
+
+
+def test_cancelled_items_and_inflight_work(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "time", lambda: now[0])
+    controller = AdmissionController(enabled=True, max_queue_wait=100,
+                                     estimator=ServiceTimeEstimator(alpha=1.0, default_seconds=20))
+    items = queued(make_request(), make_request())
+    items[1]["cancelled"] = True
+
+    controller.begin("r1", make_request())
+    now[0] += 5
+    assert controller.predict_wait(items, workers=1) == 35
+
+    controller.finish("r1", make_request(), record=True)
+    assert controller.estimate_request(make_request()) == 5
+    assert controller.predict_wait(items, workers=1) == 5
+
+
+def test_disabled_controller_always_admits():
+    controller = AdmissionController(enabled=False, max_queue_wait=1)
+    assert controller.check(make_request(), queued(make_request()), workers=1).admitted
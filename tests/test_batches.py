@@ -0,0 +1,61 @@
+import asyncio
+import pathlib
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import server
+from api_utils.batches import BatchJob, BatchManager
+from api_utils.fair_queue import FairRequestQueue
+from api_utils.page_pool import PagePool
+from models import ChatCompletionRequest
+
+
+class TextOnlyBackend:
+    def handles(self, request):
+        return True
+
+
+def make_request():
+    return ChatCompletionRequest(messages=[{"role": "user", "content": "hi"}])
+
+
+def test_http_backend_lines_do_not_wait_for_an_idle_page(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(server, "is_initializing", False)
+        monkeypatch.setattr(server, "request_queue", FairRequestQueue())
+        monkeypatch.setattr(server, "page_pool", PagePool())
+        monkeypatch.setattr(server, "http_backend", None)
+        assert not BatchManager._interactive_idle(make_request())
+
+        monkeypatch.setattr(server, "http_backend", TextOnlyBackend())
+        assert BatchManager._interactive_idle(make_request())
+
+    asyncio.run(scenario())
+
+
+def test_runner_wakes_when_a_page_becomes_idle(monkeypatch, tmp_path):
+    async def scenario():
+        pool = PagePool()
+        pool._idle_event = asyncio.Event()
+        monkeypatch.setattr(server, "is_initializing", False)
+        monkeypatch.setattr(server, "request_queue", FairRequestQueue())
+        monkeypatch.setattr(server, "page_pool", pool)
+        monkeypatch.setattr(server, "http_backend", None)
+
+        idle = {"value": False}
+        monkeypatch.setattr(BatchManager, "_interactive_idle", staticmethod(lambda request: idle["value"]))
+        manager = BatchManager(storage_dir=str(tmp_path), poll_interval=60)
+        job = BatchJob("batch_test", str(tmp_path / "batch_test"))
+
+        waiter = asyncio.create_task(manager._wait_until_idle(job, make_request()))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        idle["value"] = True
+        pool._notify_idle()
+        assert await asyncio.wait_for(waiter, timeout=1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+import asyncio
+import pathlib
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_utils.coalesce import RequestCoalescer
+from api_utils.disconnect import ClientDisconnectWatcher
+from models import ChatCompletionRequest
+
+
+def make_request():
+    return ChatCompletionRequest(messages=[{"role": "user", "content": "hi"}], stream=True)
+
+
+async def read_body(response):
+    return "".join([chunk async for chunk in response.body_iterator])
+
+
+def test_leader_disconnect_does_not_truncate_followers():
+    async def scenario():
+        coalescer = RequestCoalescer(enabled=True)
+        leader_flight, is_leader = coalescer.acquire(make_request(), "leader")
+        watcher = ClientDisconnectWatcher("leader", None)
+        coalescer.bind(leader_flight, watcher)
+        follower_flight, follower_is_leader = coalescer.acquire(make_request(), "follower")
+        assert is_leader and not follower_is_leader
+        assert coalescer.snapshot()["followers_waiting"] == 1
+
+        async def source():
+            # Stands in for the worker's generator, which stops once the leader's event is set
+            for chunk in ("data: a\n\n", "data: b\n\n", "data: [DONE]\n\n"):
+                await asyncio.sleep(0)
+                if watcher.disconnected:
+                    return
+                yield chunk
+
+        raw = StreamingResponse(source(), media_type="text/event-stream", headers={"X-Request-Id": "leader"})
+        coalescer.publish(leader_flight, raw)
+        follower_response = await coalescer.follow(follower_flight, timeout=1)
+        watcher._fire()  # the leader's client goes away mid-stream
+
+        body = await read_body(follower_response)
+        assert body.endswith("data: [DONE]\n\n")
+        assert follower_response.headers["x-request-id"] == "leader"
+        # The deferred disconnect is applied once the last follower is done
+        assert watcher.disconnected
+        assert coalescer.snapshot()["followers_waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_followers_receive_leader_headers_for_plain_responses():
+    async def scenario():
+        coalescer = RequestCoalescer(enabled=True)
+        request = make_request().model_copy(update={"stream": False})
+        leader_flight, _ = coalescer.acquire(request, "leader")
+        follower_flight, _ = coalescer.acquire(request, "follower")
+        coalescer.publish(leader_flight, JSONResponse({"ok": True}, headers={"X-Cache": "MISS"}))
+        response = await coalescer.follow(follower_flight, timeout=1)
+        assert response.body == b'{"ok":true}'
+        assert response.headers["x-cache"] == "MISS"
+        assert follower_flight.followers == 0
+
+    asyncio.run(scenario())
+
+
+def test_model_less_requests_coalesce_per_active_model():
+    async def scenario():
+        coalescer = RequestCoalescer(enabled=True)
+        request = make_request()
+        _, first_is_leader = coalescer.acquire(request, "a", default_model="model-a")
+        _, other_model_is_leader = coalescer.acquire(request, "b", default_model="model-b")
+        _, same_model_is_leader = coalescer.acquire(request, "c", default_model="model-a")
+        assert first_is_leader and other_model_is_leader and not same_model_is_leader
+
+    asyncio.run(scenario())
+
+
+def test_follower_deadline_ends_its_wait_and_stream():
+    async def scenario():
+        coalescer = RequestCoalescer(enabled=True)
+        leader_flight, _ = coalescer.acquire(make_request(), "leader")
+        follower_flight, _ = coalescer.acquire(make_request(), "follower")
+        waiting = ClientDisconnectWatcher("follower", None).set_deadline(time.time() + 0.05)
+        with pytest.raises(HTTPException) as exc_info:
+            await coalescer.follow(follower_flight, timeout=5, watcher=waiting)
+        assert exc_info.value.status_code == 504
+        assert leader_flight.followers == 0
+
+        streaming_flight, _ = coalescer.acquire(make_request(), "late-follower")
+        release = asyncio.Event()
+
+        async def source():
+            yield "data: a\n\n"
+            await release.wait()
+            yield "data: [DONE]\n\n"
+
+        coalescer.publish(leader_flight, StreamingResponse(source(), media_type="text/event-stream"))
+        watcher = ClientDisconnectWatcher("late-follower", None).set_deadline(time.time() + 0.05)
+        response = await coalescer.follow(streaming_flight, timeout=5, watcher=watcher)
+        body = await asyncio.wait_for(read_body(response), timeout=1)
+        assert body == "data: a\n\n" and watcher.deadline_exceeded
+        assert streaming_flight.followers == 0
+        release.set()
+
+    asyncio.run(scenario())
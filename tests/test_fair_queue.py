@@ -0,0 +1,188 @@
+import asyncio
+import pathlib
+import sys
+
+import pytest
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_utils import auth_utils
+from api_utils.fair_queue import FairRequestQueue
+
+
+def make_item(req_id, client_key, enqueue_time=0.0):
+    return {"req_id": req_id, "client_key": client_key, "enqueue_time": enqueue_time, "cancelled": False}
+
+
+def drain(queue):
+    order = []
+    while not queue.empty():
+        order.append(queue.get_nowait()["req_id"])
+    return order
+
+
+def test_single_heavy_client_does_not_starve_others():
+    queue = FairRequestQueue(weight_resolver=lambda key: 1.0)
+    for i in range(5):
+        queue.put_nowait(make_item(f"a{i}", "key-a", i))
+    queue.put_nowait(make_item("b0", "key-b", 10))
+    queue.put_nowait(make_item("c0", "key-c", 11))
+
+    assert drain(queue) == ["a0", "b0", "c0", "a1", "a2", "a3", "a4"]
+
+
+def test_weights_control_share_per_round():
+    weights = {"heavy": 3.0, "light": 1.0}
+    queue = FairRequestQueue(weight_resolver=weights.get)
+    for i in range(6):
+        queue.put_nowait(make_item(f"h{i}", "heavy", i))
+        queue.put_nowait(make_item(f"l{i}", "light", i))
+
+    order = drain(queue)
+    assert order[:8] == ["h0", "h1", "h2", "l0", "h3", "h4", "h5", "l1"]
+
+
+def test_fractional_weight_accumulates_across_rounds():
+    weights = {"batch": 0.5, "chat": 1.0}
+    queue = FairRequestQueue(weight_resolver=weights.get)
+    for i in range(3):
+        queue.put_nowait(make_item(f"b{i}", "batch", i))
+        queue.put_nowait(make_item(f"c{i}", "chat", i))
+
+    order = drain(queue)
+    assert order[:4] == ["c0", "b0", "c1", "c2"]
+
+
+def test_items_and_task_accounting():
+    async def scenario():
+        queue = FairRequestQueue(weight_resolver=lambda key: 1.0)
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        await queue.put(make_item("r1", "key-a", 2))
+        await queue.put(make_item("r2", "key-b", 1))
+
+        first = await getter
+        assert first["req_id"] == "r1"
+        assert [item["req_id"] for item in queue.items()] == ["r2"]
+        assert queue.qsize() == 1
+
+        await queue.get()
+        queue.task_done()
+        queue.task_done()
+        await asyncio.wait_for(queue.join(), timeout=1)
+        with pytest.raises(ValueError):
+            queue.task_done()
+
+    asyncio.run(scenario())
+
+
+def test_parse_key_line_metadata():
+    assert auth_utils.parse_key_line("abc123456 weight=2.5 note=x\n") == ("abc123456", {"weight": "2.5", "note": "x"})
+    assert auth_utils.parse_key_line("# comment") == (None, {})
+    assert auth_utils.parse_key_line("   ") == (None, {})
+    assert auth_utils._parse_weight("bad") == auth_utils.DEFAULT_KEY_WEIGHT
+    assert auth_utils._parse_weight("-1") == auth_utils.DEFAULT_KEY_WEIGHT
+
+
+def test_cancel_tombstones_without_reordering():
+    queue = FairRequestQueue(weight_resolver=lambda key: 1.0)
+    for i in range(3):
+        queue.put_nowait(make_item(f"a{i}", "key-a", i))
+    queue.put_nowait(make_item("b0", "key-b", 5))
+
+    assert queue.cancel("a1")
+    assert not queue.cancel("a1")
+    assert queue.get_entry("a1")["state"] == "cancelled"
+    assert queue.qsize() == 3
+    assert queue.tombstone_count == 1
+    assert [item["req_id"] for item in queue.items()] == ["a0", "a2", "b0"]
+
+    assert drain(queue) == ["a0", "b0", "a2"]
+    assert queue.tombstone_count == 0
+    assert queue.get_entry("a1") is None
+
+
+def test_cancel_states_and_index_lifecycle():
+    async def scenario():
+        queue = FairRequestQueue(weight_resolver=lambda key: 1.0)
+        await queue.put(make_item("r1", "key-a"))
+        await queue.put(make_item("r2", "key-a"))
+
+        first = await queue.get()
+        assert first["state"] == "dispatched"
+        assert queue.cancel("r1")
+        assert first["cancelled"]
+
+        await queue.get()
+        queue.mark_processing("r2", page_slot_id=3)
+        assert queue.get_entry("r2")["page_slot_id"] == 3
+        assert not queue.cancel("r2")
+
+        for req_id in ("r1", "r2"):
+            queue.complete(req_id)
+            queue.task_done()
+        assert queue.get_entry("r2") is None
+        await asyncio.wait_for(queue.join(), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_preferred_items_jump_ahead_with_bounded_skips():
+    queue = FairRequestQueue(weight_resolver=lambda key: 1.0)
+    models = {"x0": "other", "p0": "active", "p1": "active", "p2": "active", "x1": "other"}
+    for i, req_id in enumerate(models):
+        queue.put_nowait(make_item(req_id, "key-a", i))
+
+    def prefer(item):
+        return models[item["req_id"]] == "active"
+
+    order = []
+    while not queue.empty():
+        order.append(queue.get_nowait(prefer, max_skips=2)["req_id"])
+    assert order == ["p0", "p1", "x0", "p2", "x1"]
+
+
+def test_iter_oldest_merges_flows_in_arrival_order():
+    queue = FairRequestQueue(weight_resolver=lambda key: 1.0)
+    for req_id, key, at in [("a0", "key-a", 1), ("b0", "key-b", 2), ("a1", "key-a", 3), ("c0", "key-c", 4), ("b1", "key-b", 5)]:
+        queue.put_nowait(make_item(req_id, key, at))
+    queue.cancel("a1")
+
+    assert [item["req_id"] for item in queue.iter_oldest()] == ["a0", "b0", "c0", "b1"]
+    assert [item["req_id"] for item in queue.items()] == ["a0", "b0", "c0", "b1"]
+
+
+def test_cancelled_items_do_not_block_join_or_come_back():
+    async def scenario():
+        queue = FairRequestQueue(weight_resolver=lambda key: 1.0)
+        for req_id in ("a0", "a1", "a2"):
+            await queue.put(make_item(req_id, "key-a"))
+        # A tombstone in the middle of the flow is already accounted for
+        assert queue.cancel("a1")
+        dispatched = await queue.get()
+        assert queue.cancel(dispatched["req_id"])
+
+        # A dispatched item cancelled and requeued (e.g. by a closing page) is dropped
+        await queue.put(dispatched)
+        queue.task_done()
+        assert queue.qsize() == 1 and queue.get_entry("a0") is None
+        assert [item["req_id"] for item in queue.items()] == ["a2"]
+
+        await queue.get()
+        queue.task_done()
+        await asyncio.wait_for(queue.join(), timeout=1)
+        assert queue.empty()
+
+        # A tombstone nobody dequeues any more must not keep join() waiting
+        for req_id in ("b0", "b1", "b2"):
+            await queue.put(make_item(req_id, "key-b"))
+        assert queue.cancel("b1")
+        assert queue.get_matching_nowait(lambda item: item["req_id"] == "b2")["req_id"] == "b2"
+        assert queue.cancel("b0")
+        queue.task_done()
+        assert queue.empty()
+        await asyncio.wait_for(queue.join(), timeout=1)
+
+    asyncio.run(scenario())
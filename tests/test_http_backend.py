@@ -0,0 +1,206 @@
+import asyncio
+import base64
+import importlib
+import json
+import pathlib
+import sys
+import time
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import server
+from api_utils.fair_queue import FairRequestQueue
+from api_utils.http_backend import HttpChatBackend, SessionCredentials
+from api_utils.page_pool import PagePool
+from models import ChatCompletionRequest
+
+queue_worker = importlib.import_module("api_utils.queue_worker")
+
+
+def make_token(name: str, expires_in: float = 3600) -> str:
+    def part(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{part({'alg': 'HS256'})}.{part({'id': name, 'exp': int(time.time() + expires_in)})}.sig"
+
+
+def storage_state(token: str, host: str = "127.0.0.1") -> dict:
+    return {
+        "cookies": [
+            {"name": "ssxmod", "value": "abc", "domain": host, "path": "/", "expires": -1},
+            {"name": "other", "value": "x", "domain": ".example.org", "path": "/", "expires": -1},
+        ],
+        "origins": [{"origin": f"http://{host}", "localStorage": [{"name": "token", "value": token}]}],
+    }
+
+
+class FakeContext:
+    def __init__(self, tokens):
+        self.tokens = list(tokens)
+        self.reads = 0
+
+    async def storage_state(self):
+        token = self.tokens[min(self.reads, len(self.tokens) - 1)]
+        self.reads += 1
+        return storage_state(token)
+
+
+class FakePage:
+    def __init__(self, tokens):
+        self.context = FakeContext(tokens)
+        self.reloads = 0
+        self.borrows = 0
+
+    @asynccontextmanager
+    async def borrow(self):
+        self.borrows += 1
+        yield self
+
+    def is_closed(self):
+        return False
+
+    async def evaluate(self, script, arg=None):
+        return "FakeBrowser/1.0"
+
+    async def reload(self, **kwargs):
+        self.reloads += 1
+
+
+def make_upstream(valid_token: str):
+    seen = {"completions": 0, "headers": []}
+
+    def authorized(request):
+        seen["headers"].append(dict(request.headers))
+        return request.headers.get("Authorization") == f"Bearer {valid_token}"
+
+    async def new_chat(request):
+        if not authorized(request):
+            return web.json_response({"success": False, "data": {"code": "Unauthorized"}}, status=401)
+        return web.json_response({"success": True, "data": {"id": "chat-9"}})
+
+    async def completions(request):
+        seen["completions"] += 1
+        payload = await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = ["Hi ", "from ", payload["model"]]
+        for index, word in enumerate(words):
+            event = {"choices": [{"delta": {"content": word, "phase": "answer",
+                                            "status": "finished" if index == len(words) - 1 else "typing"}}]}
+            await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/v2/chats/new", new_chat)
+    app.router.add_post("/api/v2/chat/completions", completions)
+    return app, seen
+
+
+async def run_requests(page, valid_token, count=1):
+    app, seen = make_upstream(valid_token)
+    server = TestServer(app, host="127.0.0.1")
+    await server.start_server()
+    backend = HttpChatBackend(enabled=True, base_url=str(server.make_url("")))
+    try:
+        results = []
+        for index in range(count):
+            results.append([message async for message in backend.stream_messages("hello", "qwen-test", page.borrow, f"req-{index}")])
+        return results, seen, backend
+    finally:
+        await backend.close()
+        await server.close()
+
+
+def test_credentials_from_storage_state():
+    token = make_token("user", expires_in=600)
+    credentials = SessionCredentials.from_storage_state(storage_state(token), "http://127.0.0.1:8080")
+
+    assert credentials.token == token
+    assert credentials.cookies == {"ssxmod": "abc"}
+    assert not credentials.expired(margin=60)
+    assert credentials.expired(margin=900)
+    assert credentials.headers()["Authorization"] == f"Bearer {token}"
+
+
+def test_streams_and_reuses_credentials_across_requests():
+    token = make_token("user")
+    page = FakePage([token])
+    results, seen, backend = asyncio.run(run_requests(page, token, count=2))
+
+    for messages in results:
+        assert "".join(message["body"] for message in messages) == "Hi from qwen-test"
+        assert messages[-1]["done"] is True and "error" not in messages[-1]
+        assert [message["seq"] for message in messages] == list(range(len(messages)))
+    assert seen["headers"][0]["Cookie"] == "ssxmod=abc"
+    assert seen["headers"][0]["User-Agent"] == "FakeBrowser/1.0"
+    # The browser is read once; later requests reuse the pooled session and cached credentials
+    assert page.context.reads == 1 and page.borrows == 1
+    assert backend.snapshot()["credential_refreshes"] == 1
+
+
+def test_rejected_credentials_are_refreshed_once():
+    stale, fresh = make_token("stale"), make_token("fresh")
+    page = FakePage([stale, fresh])
+    results, seen, backend = asyncio.run(run_requests(page, fresh))
+
+    assert "".join(message["body"] for message in results[0]) == "Hi from qwen-test"
+    assert page.context.reads == 2
+    assert page.reloads == 0
+    assert backend.auth_retries == 1
+    assert seen["completions"] == 1
+
+
+def test_http_requests_are_dispatched_without_page_slots(monkeypatch):
+    started, releases = [], {}
+
+    async def fake_worker(request_item):
+        started.append(request_item["req_id"])
+        releases[request_item["req_id"]] = asyncio.Event()
+        await releases[request_item["req_id"]].wait()
+        server.request_queue.task_done()
+
+    class TextOnlyBackend:
+        enabled = True
+        max_connections = 2
+
+        def handles(self, request):
+            return request.model != "needs-page"
+
+    def item(req_id, model="qwen-test"):
+        request = ChatCompletionRequest(messages=[{"role": "user", "content": "hi"}], model=model)
+        return {"req_id": req_id, "request_data": request, "enqueue_time": time.time()}
+
+    async def scenario():
+        monkeypatch.setattr(queue_worker, "http_backend_worker", fake_worker)
+        monkeypatch.setattr(server, "http_backend", TextOnlyBackend())
+        monkeypatch.setattr(server, "request_queue", FairRequestQueue(weight_resolver=lambda key: 1.0))
+        monkeypatch.setattr(server, "model_affinity", None)
+        monkeypatch.setattr(server, "request_prefetcher", None)
+        pool = PagePool()
+        pool._idle_event = asyncio.Event()
+        dispatcher = asyncio.create_task(pool._dispatch_loop())
+        try:
+            # No page slot exists at all: text requests still start, up to the connection limit
+            for entry in (item("page", "needs-page"), item("http-1"), item("http-2"), item("http-3")):
+                server.request_queue.put_nowait(entry)
+            await asyncio.sleep(0.05)
+            assert started == ["http-1", "http-2"]
+            assert server.request_queue.qsize() == 2
+
+            releases["http-1"].set()
+            await asyncio.sleep(0.05)
+            assert started == ["http-1", "http-2", "http-3"]
+            assert [entry["req_id"] for entry in server.request_queue.items()] == ["page"]
+        finally:
+            dispatcher.cancel()
+            for task in list(pool._http_tasks):
+                task.cancel()
+            await asyncio.gather(dispatcher, *pool._http_tasks, return_exceptions=True)
+
+    asyncio.run(scenario())
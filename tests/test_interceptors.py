@@ -0,0 +1,146 @@
+import asyncio
+import gzip
+import json
+import pathlib
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from stream.interceptors import HttpInterceptor, ResponseDecoder
+from stream.parsers import GenerateContentParser, QwenSSEParser
+
+
+def chunked(payload: bytes, size: int) -> bytes:
+    out = bytearray()
+    for start in range(0, len(payload), size):
+        piece = payload[start:start + size]
+        out += f"{len(piece):x}\r\n".encode() + piece + b"\r\n"
+    return bytes(out + b"0\r\n\r\n")
+
+
+def test_decoder_handles_chunked_gzip_split_at_any_byte():
+    text = b"".join(b'[[[null,"token %d "]],"model"]' % i for i in range(200))
+    wire = chunked(gzip.compress(text), 97)
+    headers = {"Transfer-Encoding": "chunked", "Content-Encoding": "gzip"}
+
+    for step in (1, 7, 8192):
+        decoder = ResponseDecoder(headers)
+        decoded = bytearray()
+        for start in range(0, len(wire), step):
+            decoded += decoder.feed(wire[start:start + step])
+        assert bytes(decoded) == text
+        assert bytes(decoder.body) == text
+        assert decoder.done
+
+
+def test_decoder_identity_body_with_content_length():
+    decoder = ResponseDecoder({"Content-Length": "10"})
+    assert decoder.feed(b"hello") == b"hello"
+    assert not decoder.done
+    assert decoder.feed(b"worldEXTRA") == b"world"
+    assert decoder.done
+    assert decoder.feed(b"more") == b""
+
+
+def test_process_response_skips_feeds_without_new_data():
+    interceptor = HttpInterceptor()
+    decoder = interceptor.start_response({"Transfer-Encoding": "chunked"}, "host", "")
+    frame = b'[[[null,"Hi"]],"model"]'
+    wire = chunked(frame, len(frame))
+
+    async def run():
+        first = await interceptor.process_response(decoder, wire[:2], "host", "")
+        second = await interceptor.process_response(decoder, wire[2:], "host", "")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is None
+    assert second == {"v": 2, "seq": 0, "reason": "", "body": "Hi", "function": [], "done": True}
+
+
+def frame(text, reason=False):
+    payload = [None, text] + ([None] * 5 if reason else [])
+    return ('[[%s],"model"]' % json.dumps(payload, separators=(",", ":"))).encode()
+
+
+def recorded_response():
+    frames = [frame("thinking [about] it", reason=True), frame('Hello "[world]"'), frame(" and \\ more")]
+    tool = [None, None, None, None, None, None, None, None, None, None,
+            ["lookup", [[["query", [None, None, "qwen"]], ["limit", [None, 3]]]]]]
+    frames.append(('[[%s],"model"]' % json.dumps(tool, separators=(",", ":"))).encode())
+    return b"[" + b",".join(b"[[[%s]],null]" % f for f in frames) + b"]"
+
+
+def test_parser_yields_each_frame_once_regardless_of_split():
+    data = recorded_response()
+    whole = GenerateContentParser().feed(data)
+    assert whole["reason"] == "thinking [about] it"
+    assert whole["body"] == 'Hello "[world]" and \\ more'
+    assert whole["function"] == [{"name": "lookup", "params": {"query": "qwen", "limit": 3}}]
+
+    split = GenerateContentParser()
+    reasons, bodies, functions = [], [], []
+    for index in range(len(data)):
+        delta = split.feed(data[index:index + 1])
+        reasons.append(delta["reason"])
+        bodies.append(delta["body"])
+        functions.extend(delta["function"])
+    assert "".join(reasons) == whole["reason"]
+    assert "".join(bodies) == whole["body"]
+    assert functions == whole["function"]
+    assert split.frames == 4
+
+
+def test_parser_buffer_stays_bounded():
+    parser = GenerateContentParser()
+    parser.feed(b"[")
+    bodies = [parser.feed(b"[[[%s]],null]," % frame("chunk %d " % index))["body"] for index in range(500)]
+    assert bodies[:2] == ["chunk 0 ", "chunk 1 "]
+    assert len(parser._buf) < 200
+
+
+def qwen_event(phase, content, status="typing"):
+    delta = {"role": "assistant", "content": content, "phase": phase, "status": status}
+    return ("data: %s\n\n" % json.dumps({"choices": [{"delta": delta}]}, ensure_ascii=False)).encode()
+
+
+def test_qwen_parser_splits_thinking_and_answer_at_any_byte():
+    stream = (b'data: {"response.created":{"chat_id":"c1"}}\n\n'
+              + qwen_event("think", "Düşünüyorum") + qwen_event("think", "", "finished")
+              + qwen_event("answer", "Merhaba ") + qwen_event("answer", "dünya 🌍")
+              + qwen_event("answer", "", "finished"))
+    parser = QwenSSEParser()
+    reasons, bodies = [], []
+    for index in range(len(stream)):
+        delta = parser.feed(stream[index:index + 1])
+        reasons.append(delta["reason"])
+        bodies.append(delta["body"])
+        assert parser.finished == (index == len(stream) - 1)
+    assert "".join(reasons) == "Düşünüyorum"
+    assert "".join(bodies) == "Merhaba dünya 🌍"
+
+
+def test_qwen_parser_reports_upstream_error():
+    parser = QwenSSEParser()
+    parser.feed(b'data: {"success":false,"data":{"code":"RateLimited","details":"too many requests"}}\r\n\r\n')
+    assert parser.finished
+    assert parser.error == "too many requests"
+
+
+def test_qwen_completion_is_sniffed_and_finishes_before_body_end():
+    interceptor = HttpInterceptor()
+    path = "/api/v2/chat/completions?chat_id=c1"
+    assert interceptor.should_intercept("chat.qwen.ai", path)
+    decoder = interceptor.start_response({"Transfer-Encoding": "chunked"}, "chat.qwen.ai", path)
+    wire = chunked(qwen_event("answer", "Hi") + qwen_event("answer", "", "finished"), 1000)
+
+    async def run():
+        first = await interceptor.process_response(decoder, wire[:-5], "chat.qwen.ai", path)
+        second = await interceptor.process_response(decoder, wire[-5:], "chat.qwen.ai", path)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {"v": 2, "seq": 0, "reason": "", "body": "Hi", "function": [], "done": True}
+    assert second is None
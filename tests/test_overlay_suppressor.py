@@ -0,0 +1,84 @@
+import asyncio
+import pathlib
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from browser_utils.model_management import _dismiss_dropdown_blockers
+from browser_utils.operations import AUTH_OVERLAY_BUTTON_TEXTS
+from browser_utils.overlay_suppressor import OVERLAY_SUPPRESSOR_BINDING, OverlaySuppressor, sweep_overlays
+
+
+class FakePage:
+    def __init__(self, sweep_result=None):
+        self.sweep_result = sweep_result
+        self.evaluated = []
+        self.escapes = 0
+        self.keyboard = self
+
+    def is_closed(self):
+        return False
+
+    async def evaluate(self, script, arg=None):
+        self.evaluated.append((script, arg))
+        return self.sweep_result
+
+    async def press(self, key):
+        self.escapes += key == "Escape"
+
+    def locator(self, selector):
+        raise AssertionError("the suppressor path must not probe selectors")
+
+
+class FakeContext:
+    def __init__(self, pages=()):
+        self.pages = list(pages)
+        self.bindings = {}
+        self.init_scripts = []
+
+    async def expose_binding(self, name, callback):
+        self.bindings[name] = callback
+
+    async def add_init_script(self, script):
+        self.init_scripts.append(script)
+
+
+def test_install_registers_script_and_counts_reports():
+    open_page = FakePage()
+    context = FakeContext([open_page])
+    suppressor = OverlaySuppressor(enabled=True)
+
+    assert asyncio.run(suppressor.install(context)) is True
+    script = context.init_scripts[0]
+    assert "MutationObserver" in script and AUTH_OVERLAY_BUTTON_TEXTS[0] in script
+    # The tab that was already open gets the script in its current document
+    assert open_page.evaluated == [(script, None)]
+
+    report = context.bindings[OVERLAY_SUPPRESSOR_BINDING]
+    report(None, {"kind": "clicked", "label": "Stay logged out"})
+    report(None, {"kind": "removed", "label": "sign up to qwen"})
+    report(None, {"kind": "unknown"})
+    snapshot = suppressor.snapshot()
+    assert (snapshot["contexts"], snapshot["clicked"], snapshot["removed"]) == (1, 1, 1)
+    assert snapshot["last_label"] == "sign up to qwen"
+
+
+def test_disabled_suppressor_is_not_installed():
+    context = FakeContext()
+    assert asyncio.run(OverlaySuppressor(enabled=False).install(context)) is False
+    assert context.init_scripts == [] and context.bindings == {}
+
+
+def test_dropdown_blockers_use_a_single_sweep():
+    assert asyncio.run(sweep_overlays(FakePage(sweep_result=None))) is None
+
+    page = FakePage(sweep_result=2)
+    assert asyncio.run(_dismiss_dropdown_blockers(page, "req-1")) is True
+    assert len(page.evaluated) == 1 and page.evaluated[0][1] is True
+    assert page.escapes == 0
+
+    idle = FakePage(sweep_result=0)
+    assert asyncio.run(_dismiss_dropdown_blockers(idle, "req-2")) is False
+    assert idle.escapes == 1
@@ -0,0 +1,121 @@
+import asyncio
+import codecs
+import json
+import logging
+import pathlib
+import sys
+
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from browser_utils.page_controller import PageApiUnavailableError, PageController
+
+
+def sse(payload) -> bytes:
+    return f"data: {json.dumps(payload)}\n\n".encode()
+
+
+def make_endpoint(events, new_chat_status=200):
+    """Fake upstream: the new-chat endpoint and a completion endpoint streaming the given SSE bytes."""
+    seen = {}
+
+    async def new_chat(request):
+        seen["new_chat"] = await request.json()
+        if new_chat_status != 200:
+            return web.json_response({"success": False}, status=new_chat_status)
+        return web.json_response({"success": True, "data": {"id": "chat-1"}})
+
+    async def completions(request):
+        seen["chat_id"] = request.query.get("chat_id")
+        seen["completion"] = await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for piece in events:
+            await response.write(piece)
+            await asyncio.sleep(0.01)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/v2/chats/new", new_chat)
+    app.router.add_post("/api/v2/chat/completions", completions)
+    return app, seen
+
+
+class FakeApiPage:
+    """Stands in for the browser tab: performs the fetch script's requests against the fake endpoint."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.bindings = {}
+        self.aborted = []
+
+    async def expose_binding(self, name, callback):
+        self.bindings[name] = callback
+
+    async def evaluate(self, script, arg=None):
+        if isinstance(arg, str):  # abort helper
+            self.aborted.append(arg)
+            return None
+        binding, token, new_chat_path, completions_path, model_id, prompt, _ = arg
+        emit = self.bindings[binding]
+        async with ClientSession(self.base_url) as session:
+            async with session.post(new_chat_path, json={"models": [model_id]}) as response:
+                if response.status != 200:
+                    return {"ok": False, "stage": "new-chat", "status": response.status, "error": await response.text()}
+                chat_id = (await response.json())["data"]["id"]
+            body = {"model": model_id, "messages": [{"role": "user", "content": prompt}]}
+            async with session.post(completions_path, params={"chat_id": chat_id}, json=body) as response:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+                async for chunk in response.content.iter_any():
+                    text = decoder.decode(chunk)
+                    if text:
+                        emit(None, {"token": token, "chunk": text})
+        return {"ok": True, "chatId": chat_id}
+
+
+async def collect(app):
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        page = FakeApiPage(str(server.make_url("/")))
+        controller = PageController(page, logging.getLogger("test_page_api"), "req-1")
+        return [message async for message in controller.stream_completion_via_api("hello", "qwen-test", lambda stage: False)]
+    finally:
+        await server.close()
+
+
+def test_page_api_streams_versioned_deltas():
+    events = [
+        sse({"choices": [{"delta": {"content": "thinking", "phase": "think"}}]}),
+        sse({"choices": [{"delta": {"content": "Hel", "phase": "answer"}}]})[:20],
+        sse({"choices": [{"delta": {"content": "Hel", "phase": "answer"}}]})[20:],
+        sse({"choices": [{"delta": {"content": "lo", "phase": "answer", "status": "finished"}}]}),
+    ]
+    app, seen = make_endpoint(events)
+    messages = asyncio.run(collect(app))
+
+    assert seen["chat_id"] == "chat-1"
+    assert seen["completion"]["messages"][0]["content"] == "hello"
+    assert [message["seq"] for message in messages] == list(range(len(messages)))
+    assert all(message["v"] == 2 for message in messages)
+    assert "".join(message["reason"] for message in messages) == "thinking"
+    assert "".join(message["body"] for message in messages) == "Hello"
+    assert messages[-1]["done"] is True and "error" not in messages[-1]
+
+
+def test_page_api_rejection_before_output_allows_fallback():
+    app, _ = make_endpoint([], new_chat_status=401)
+    with pytest.raises(PageApiUnavailableError):
+        asyncio.run(collect(app))
+
+
+def test_page_api_upstream_error_before_output_allows_fallback():
+    app, _ = make_endpoint([sse({"success": False, "data": {"code": "Unauthorized", "details": "login required"}})])
+    with pytest.raises(PageApiUnavailableError, match="login required"):
+        asyncio.run(collect(app))
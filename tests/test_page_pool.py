@@ -0,0 +1,47 @@
+import asyncio
+import pathlib
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import server
+from api_utils.page_pool import PagePool
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message, *args, **kwargs):
+        self.errors.append(message)
+
+    def info(self, message, *args, **kwargs):
+        pass
+
+
+def test_endpoint_drop_task_is_kept_until_it_finishes(monkeypatch):
+    logger = RecordingLogger()
+    monkeypatch.setattr(server, "logger", logger)
+    monkeypatch.setattr(server, "is_browser_connected", True)
+
+    async def scenario():
+        pool = PagePool()
+        endpoint = pool._register_endpoint("ws://extra", None)
+        release = asyncio.Event()
+
+        async def failing_drop(dropped):
+            await release.wait()
+            raise RuntimeError("page already gone")
+
+        monkeypatch.setattr(pool, "_drop_endpoint", failing_drop)
+        pool._on_browser_disconnected(endpoint)
+        assert len(pool._drop_tasks) == 1 and not endpoint.healthy
+
+        release.set()
+        await asyncio.sleep(0.01)
+        assert not pool._drop_tasks
+        assert "page already gone" in logger.errors[-1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import asyncio
+import pathlib
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_utils.disconnect import ClientDisconnectWatcher
+from api_utils.prefetch import RequestPrefetcher
+
+
+def test_expired_request_cancels_its_prefetch_task(monkeypatch):
+    async def scenario():
+        prefetcher = RequestPrefetcher(depth=2)
+        release = asyncio.Event()
+
+        async def slow_prepare(request_item):
+            await release.wait()
+
+        monkeypatch.setattr(prefetcher, "_prepare", slow_prepare)
+        watcher = ClientDisconnectWatcher("expired", None).set_deadline(time.time() + 0.02)
+        request_item = {"req_id": "expired", "disconnect_watcher": watcher}
+        prefetcher.ensure(request_item)
+        task = request_item["prepared_task"]
+
+        await asyncio.sleep(0.05)
+        assert "prepared_task" not in request_item
+        assert task.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_dropped_prefetch_failures_are_consumed(monkeypatch):
+    unhandled = []
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        prefetcher = RequestPrefetcher(depth=1)
+
+        async def failing_prepare(request_item):
+            raise ValueError("bad request")
+
+        monkeypatch.setattr(prefetcher, "_prepare", failing_prepare)
+        request_item = {"req_id": "dropped"}
+        prefetcher.ensure(request_item)
+        await asyncio.sleep(0.01)
+        request_item.clear()
+
+    asyncio.run(scenario())
+    assert not unhandled
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import pathlib
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from api_utils.response_cache import ResponseCache, SSEResponseCollector, parse_cache_control
+from api_utils.utils import generate_sse_chunk, generate_sse_stop_chunk
+from models import ChatCompletionRequest
+
+
+def make_request(content, **kwargs):
+    return ChatCompletionRequest(messages=[{"role": "user", "content": content}], **kwargs)
+
+
+def make_entry(text):
+    return {"model": "qwen-test", "message": {"role": "assistant", "content": text}, "finish_reason": "stop", "usage": None}
+
+
+async def collect(iterator):
+    return [chunk async for chunk in iterator]
+
+
+def test_key_ignores_stream_flag_and_text_part_shape():
+    plain = make_request("hello")
+    parts = ChatCompletionRequest(messages=[{"role": "user", "content": [{"type": "text", "text": "hello"}]}], stream=True)
+    assert ResponseCache.key_for(plain) == ResponseCache.key_for(parts)
+    assert ResponseCache.key_for(plain) != ResponseCache.key_for(make_request("hello", temperature=0.5))
+    assert ResponseCache.key_for(plain, default_model="a") != ResponseCache.key_for(plain, default_model="b")
+
+
+def test_cache_control_directives():
+    assert parse_cache_control(None) == (True, True)
+    assert parse_cache_control("max-age=0, no-cache") == (False, True)
+    assert parse_cache_control("no-store") == (False, False)
+
+
+def test_memory_tier_lru_and_ttl():
+    async def scenario():
+        cache = ResponseCache(enabled=True, max_entries=2, ttl_seconds=60, db_path=None)
+        await cache.put("a", make_entry("A"))
+        await cache.put("b", make_entry("B"))
+        assert (await cache.get("a"))["message"]["content"] == "A"
+        await cache.put("c", make_entry("C"))
+        assert await cache.get("b") is None
+        assert await cache.get("a") is not None
+
+        expired = ResponseCache(enabled=True, max_entries=2, ttl_seconds=-1, db_path=None)
+        await expired.put("a", make_entry("A"))
+        assert await expired.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache" / "responses.sqlite3")
+
+    async def scenario():
+        first = ResponseCache(enabled=True, max_entries=4, ttl_seconds=60, db_path=db_path)
+        await first.put("key", make_entry("persisted"))
+        first.close()
+
+        second = ResponseCache(enabled=True, max_entries=4, ttl_seconds=60, db_path=db_path)
+        entry = await second.get("key")
+        assert entry["message"]["content"] == "persisted"
+        assert second.disk_hits == 1
+        second.close()
+
+    asyncio.run(scenario())
+
+
+def test_stream_capture_and_replay_roundtrip():
+    async def scenario():
+        cache = ResponseCache(enabled=True, max_entries=4, ttl_seconds=60, db_path=None)
+
+        async def source():
+            yield generate_sse_chunk("Hel", "r1", "qwen-test")
+            yield generate_sse_chunk("lo", "r1", "qwen-test")
+            yield generate_sse_stop_chunk("r1", "qwen-test", "stop", {"total_tokens": 3})
+
+        captured = cache.capture("k", StreamingResponse(source(), media_type="text/event-stream"))
+        await collect(captured.body_iterator)
+        entry = await cache.get("k")
+        assert entry["message"]["content"] == "Hello"
+        assert entry["usage"] == {"total_tokens": 3}
+
+        replay = cache.build_response(entry, "r2", stream=True)
+        collector = SSEResponseCollector()
+        for chunk in await collect(replay.body_iterator):
+            collector.feed(chunk)
+        assert collector.to_entry()["message"]["content"] == "Hello"
+
+        as_json = json.loads(cache.build_response(entry, "r3", stream=False).body)
+        assert as_json["choices"][0]["message"]["content"] == "Hello"
+
+    asyncio.run(scenario())
+
+
+def test_errored_or_truncated_stream_is_not_stored():
+    async def scenario():
+        cache = ResponseCache(enabled=True, max_entries=4, ttl_seconds=60, db_path=None)
+
+        async def errored():
+            yield generate_sse_chunk("\n\n[hata: boom]", "r1", "qwen-test")
+            yield generate_sse_stop_chunk("r1", "qwen-test")
+
+        async def truncated():
+            yield generate_sse_chunk("partial", "r2", "qwen-test")
+
+        await collect(cache.capture("e", StreamingResponse(errored())).body_iterator)
+        await collect(cache.capture("t", StreamingResponse(truncated())).body_iterator)
+        await collect(cache.capture("d", StreamingResponse(truncated()), should_store=lambda: False).body_iterator)
+        assert cache.stores == 0
+
+        cache.capture("j", JSONResponse(content={"model": "m", "choices": [{"message": {"role": "assistant", "content": "ok"}}]}))
+        await asyncio.sleep(0)
+        assert (await cache.get("j"))["finish_reason"] == "stop"
+
+    asyncio.run(scenario())
+
+
+def test_stream_capture_keeps_tool_calls_and_response_headers():
+    async def scenario():
+        cache = ResponseCache(enabled=True, max_entries=4, ttl_seconds=60, db_path=None)
+
+        def delta_chunk(delta, finish_reason=None):
+            payload = {"id": "r1", "object": "chat.completion.chunk", "model": "qwen-test",
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def source():
+            yield delta_chunk({"tool_calls": [{"index": 0, "id": "call_1", "type": "function",
+                                               "function": {"name": "lookup", "arguments": '{"q":'}}]})
+            yield delta_chunk({"tool_calls": [{"index": 0, "function": {"arguments": ' "x"}'}}]})
+            yield delta_chunk({}, finish_reason="tool_calls")
+            yield generate_sse_stop_chunk("r1", "qwen-test", "stop", {"total_tokens": 3})
+
+        original = StreamingResponse(source(), status_code=201, media_type="text/event-stream",
+                                     headers={"X-Request-Id": "r1"})
+        captured = cache.capture("k", original)
+        assert captured.status_code == 201
+        assert captured.headers["x-request-id"] == "r1"
+        await collect(captured.body_iterator)
+
+        entry = await cache.get("k")
+        assert entry["finish_reason"] == "tool_calls"
+        assert entry["message"]["tool_calls"] == [
+            {"index": 0, "id": "call_1", "type": "function", "function": {"name": "lookup", "arguments": '{"q": "x"}'}}
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_json_capture_keeps_the_background_write_alive():
+    async def scenario():
+        cache = ResponseCache(enabled=True, max_entries=4, ttl_seconds=60, db_path=None)
+        body = {"model": "qwen-test", "choices": [{"message": {"role": "assistant", "content": "hi"}, "finish_reason": "stop"}]}
+        cache.capture("k", JSONResponse(body))
+        assert len(cache._pending_writes) == 1
+        await asyncio.gather(*cache._pending_writes)
+        assert not cache._pending_writes
+        assert (await cache.get("k"))["message"]["content"] == "hi"
+
+    asyncio.run(scenario())
@@ -0,0 +1,168 @@
+import asyncio
+import pathlib
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import server
+from api_utils.utils import use_stream_response
+from stream.ipc import (
+    CORRELATION_HEADER,
+    NO_CAPTURE_HEADER,
+    READY_SIGNAL,
+    FrameSender,
+    StreamChannel,
+    create_channel_pair,
+)
+from stream.proxy_server import ProxyServer
+
+
+async def open_channel():
+    server_sock, proxy_sock = create_channel_pair()
+    channel = StreamChannel(server_sock)
+    await channel.start()
+    sender = FrameSender(proxy_sock)
+    await sender.connect()
+    return channel, sender
+
+
+async def settle(channel, frames):
+    for _ in range(100):
+        if channel.frames_received >= frames:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"only {channel.frames_received} of {frames} frames arrived")
+
+
+def test_keyed_frames_are_routed_per_request_and_ready_stays_unrouted():
+    async def scenario():
+        channel, sender = await open_channel()
+        first, second = channel.open("req-a"), channel.open("req-b")
+        await sender.send(READY_SIGNAL)
+        await sender.send('{"body": "a"}', "req-a")
+        await sender.send('{"body": "b"}', "req-b")
+        await settle(channel, 3)
+
+        assert channel.queue.get_nowait() == READY_SIGNAL
+        assert first.get_nowait() == '{"body": "a"}' and first.empty()
+        assert second.get_nowait() == '{"body": "b"}' and second.empty()
+        sender.close()
+        await channel.close()
+
+    asyncio.run(scenario())
+
+
+def test_frames_for_released_requests_are_dropped():
+    async def scenario():
+        channel, sender = await open_channel()
+        channel.open("req-a")
+        await sender.send("pending", "req-a")
+        await settle(channel, 1)
+        assert channel.release("req-a") == 1
+
+        await sender.send("late", "req-a")
+        await settle(channel, 2)
+        assert channel.frames_dropped == 1
+        assert channel.queue.empty()
+        assert channel.release("req-a") == 0
+        sender.close()
+        await channel.close()
+
+    asyncio.run(scenario())
+
+
+def test_untagged_frames_are_adopted_only_by_a_sole_generating_request():
+    async def scenario():
+        channel, sender = await open_channel()
+        generating = {"pages": 1}
+        channel.adopt_unkeyed = lambda: generating["pages"] <= 1
+        route = channel.open("req-a")
+        await sender.send("untagged-1")
+        await settle(channel, 1)
+        assert route.get_nowait() == "untagged-1"
+
+        generating["pages"] = 2
+        await sender.send("untagged-2")
+        await settle(channel, 2)
+        assert route.empty() and channel.queue.get_nowait() == "untagged-2"
+        assert channel.snapshot()["frames_adopted"] == 1
+        assert channel.snapshot()["frames_unrouted"] == 1
+        sender.close()
+        await channel.close()
+
+    asyncio.run(scenario())
+
+
+def test_correlation_header_is_stripped_before_forwarding():
+    lines = [
+        b"POST /api/v2/chat/completions?chat_id=1 HTTP/1.1",
+        b"Host: chat.qwen.ai",
+        f"{CORRELATION_HEADER}: req-42".encode(),
+        b"Accept-Encoding: gzip, deflate, br, zstd",
+        b"",
+        b"",
+    ]
+    headers, key = ProxyServer._prepare_sniffed_headers(lines)
+
+    assert key == "req-42"
+    assert CORRELATION_HEADER.encode() not in bytes(headers).lower()
+    assert b"Accept-Encoding: gzip, deflate\r\n" in bytes(headers)
+    assert bytes(headers).endswith(b"\r\n\r\n")
+
+    untagged, no_key = ProxyServer._prepare_sniffed_headers([b"GET / HTTP/1.1", b"Host: x", b"", b""])
+    assert no_key is None and bytes(untagged) == b"GET / HTTP/1.1\r\nHost: x\r\n\r\n"
+
+
+def test_no_capture_marker_is_stripped_and_only_marked_requests_match():
+    lines = [
+        b"POST /api/v2/chat/completions?chat_id=1 HTTP/1.1",
+        b"Host: chat.qwen.ai",
+        f"{NO_CAPTURE_HEADER}: 1".encode(),
+        b"",
+        b"",
+    ]
+    headers = ProxyServer._strip_no_capture_header(lines)
+
+    assert bytes(headers) == b"POST /api/v2/chat/completions?chat_id=1 HTTP/1.1\r\nHost: chat.qwen.ai\r\n\r\n"
+    assert ProxyServer._strip_no_capture_header([b"GET / HTTP/1.1", b"Host: x", b"", b""]) is None
+
+
+def test_released_route_wakes_a_waiting_reader(monkeypatch):
+    async def scenario():
+        channel, sender = await open_channel()
+        monkeypatch.setattr(server, "STREAM_CHANNEL", channel)
+        messages = use_stream_response("req-a")
+        first = asyncio.ensure_future(messages.__anext__())
+        await asyncio.sleep(0.01)
+        assert channel.release("req-a", "deadline_exceeded") == 0
+
+        message = await asyncio.wait_for(first, timeout=1)
+        assert message["done"] is True and message["error"] == "deadline_exceeded"
+        await messages.aclose()
+        sender.close()
+        await channel.close()
+
+    asyncio.run(scenario())
+
+
+def test_reader_stops_when_the_stop_event_is_set(monkeypatch):
+    async def scenario():
+        channel, sender = await open_channel()
+        monkeypatch.setattr(server, "STREAM_CHANNEL", channel)
+        stop_event = asyncio.Event()
+        messages = use_stream_response("req-a", stop_event=stop_event)
+        await sender.send('{"body": "a", "done": false}', "req-a")
+        assert (await asyncio.wait_for(messages.__anext__(), timeout=1))["body"] == "a"
+
+        pending = asyncio.ensure_future(messages.__anext__())
+        await asyncio.sleep(0.01)
+        stop_event.set()
+        message = await asyncio.wait_for(pending, timeout=1)
+        assert message["done"] is True and message["error"] == "stream_stopped"
+        await messages.aclose()
+        sender.close()
+        await channel.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import pathlib
+import sys
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from browser_utils.page_controller import PageController
+
+
+class RoutinePage:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    async def evaluate(self, script, arg=None):
+        self.calls.append(arg)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def submit(page, monkeypatch):
+    controller = PageController(page, logging.getLogger("test_submit_prompt"), "req-7")
+    fallbacks = []
+
+    async def stepwise(prompt, file_name, attached=False):
+        fallbacks.append((file_name, attached))
+
+    monkeypatch.setattr(controller, "_submit_prompt_stepwise", stepwise)
+    asyncio.run(controller.submit_prompt("hello", [], lambda stage: False))
+    return controller, fallbacks
+
+
+def test_routine_submits_in_one_roundtrip(monkeypatch):
+    page = RoutinePage({"version": 1, "ok": True, "stage": "submitted", "responseCount": 4, "dismissed": 1})
+    controller, fallbacks = submit(page, monkeypatch)
+
+    assert len(page.calls) == 1
+    version, options = page.calls[0]
+    assert version == PageController.SUBMIT_ROUTINE_VERSION
+    assert options["prompt"] == "hello" and options["fileName"] == "user_prompt_req-7.txt"
+    assert controller._response_count_before_submit == 4
+    assert controller._uploaded_prompt_filename == "user_prompt_req-7.txt"
+    assert fallbacks == []
+
+
+def test_fallback_does_not_attach_the_prompt_twice(monkeypatch):
+    page = RoutinePage({"version": 1, "ok": False, "stage": "submit", "attached": True, "error": "disabled"})
+    _, fallbacks = submit(page, monkeypatch)
+    assert fallbacks == [("user_prompt_req-7.txt", True)]
+
+
+def test_fallback_runs_when_routine_cannot_be_evaluated(monkeypatch):
+    _, fallbacks = submit(RoutinePage(RuntimeError("page crashed")), monkeypatch)
+    assert fallbacks == [("user_prompt_req-7.txt", False)]
+
+
+class BrokenRoutinePage(RoutinePage):
+    """The routine call fails, but the in-page probe reports how far it got."""
+
+    def __init__(self, probe_state):
+        super().__init__(probe_state)
+        self.routine_failed = False
+
+    async def evaluate(self, script, arg=None):
+        self.calls.append(arg)
+        if not self.routine_failed:
+            self.routine_failed = True
+            raise RuntimeError("Execution context was destroyed")
+        return self.result
+
+
+def test_probe_skips_resubmitting_a_sent_prompt(monkeypatch):
+    page = BrokenRoutinePage({"stage": "submit", "attached": True, "responseCount": 2, "currentCount": 3})
+    controller, fallbacks = submit(page, monkeypatch)
+
+    assert page.calls[1]["fileName"] == "user_prompt_req-7.txt"
+    assert fallbacks == []
+    assert controller._response_count_before_submit == 2
+    assert controller._uploaded_prompt_filename == "user_prompt_req-7.txt"
+
+
+def test_probe_keeps_the_attachment_for_the_fallback(monkeypatch):
+    page = BrokenRoutinePage({"stage": "fill", "attached": True, "responseCount": None, "currentCount": 2})
+    _, fallbacks = submit(page, monkeypatch)
+    assert fallbacks == [("user_prompt_req-7.txt", True)]